@@ -3,6 +3,7 @@ from flask import Flask, send_from_directory
 from flask_cors import CORS
 from app.routes import register_blueprints
 from app.config import Config
+from app.utils.compression import init_compression
 
 def create_app():
     base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -19,6 +20,7 @@ def create_app():
     )
 
     register_blueprints(app)
+    init_compression(app)
 
     @app.route("/static/<path:filename>")
     def legacy_static_files(filename):
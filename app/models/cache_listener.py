@@ -0,0 +1,99 @@
+# Сброс кэшей каталога во всех процессах: триггеры из schema.sql отправляют
+# NOTIFY при записи в bike_models/bike_sizes/anthropometry, а каждый процесс
+# слушает канал на отдельном соединении и сбрасывает затронутые модели у себя.
+# Свои записи процесс уже применил через хуки каталога, повторное уведомление
+# стоит лишь лишнего обновления.
+import json
+import logging
+import threading
+
+import psycopg
+
+from app.config import Config
+from app.models import catalog
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "bikefit_cache"
+# Уведомления собираются пачками за это время, чтобы массовые записи
+# обрабатывались одним сбросом
+BATCH_WINDOW = 0.5
+# Больше моделей в пачке — дешевле сбросить кэши целиком
+FULL_INVALIDATION_THRESHOLD = 50
+RECONNECT_DELAY_MIN = 1
+RECONNECT_DELAY_MAX = 30
+
+_CATALOG_TABLES = {"bike_models", "bike_sizes"}
+
+
+def handle_events(payloads):
+    """Применение пачки уведомлений к локальным кэшам.
+
+    События антропометрии пропускаются: в процессе она пока не кэшируется.
+    """
+    model_ids = set()
+    full = False
+    for payload in payloads:
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.warning(f"Некорректное уведомление кэша: {payload!r}")
+            continue
+        if event.get("table") not in _CATALOG_TABLES:
+            continue
+        if event.get("bike_model_id") is None:
+            full = True
+        else:
+            model_ids.add(int(event["bike_model_id"]))
+
+    if full or len(model_ids) > FULL_INVALIDATION_THRESHOLD:
+        catalog.invalidate()
+        return
+    for bike_model_id in model_ids:
+        catalog.model_changed(bike_model_id)
+
+
+class CacheListener:
+    def __init__(self, conninfo=None, channel=CHANNEL):
+        self.conninfo = conninfo or Config.DATABASE_URL
+        self.channel = channel
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cache-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        delay = RECONNECT_DELAY_MIN
+        while not self._stop.is_set():
+            try:
+                with psycopg.connect(self.conninfo, autocommit=True) as conn:
+                    conn.execute(f"LISTEN {self.channel}")
+                    # Пока соединения не было, уведомления могли потеряться
+                    catalog.invalidate()
+                    delay = RECONNECT_DELAY_MIN
+                    while not self._stop.is_set():
+                        payloads = [n.payload for n in conn.notifies(timeout=BATCH_WINDOW)]
+                        if payloads:
+                            handle_events(payloads)
+            except Exception as e:
+                logger.error(f"Слушатель инвалидации кэша: {e}; переподключение через {delay} с")
+                self._stop.wait(delay)
+                delay = min(delay * 2, RECONNECT_DELAY_MAX)
+
+
+listener = CacheListener()
+
+
+def start_cache_listener():
+    listener.start()
+    return listener
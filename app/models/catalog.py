@@ -0,0 +1,390 @@
+# Копии каталога велосипедов в памяти для запросов по всем размерам:
+# матрица геометрий (подбор посадки по каталогу) перестраивается лениво
+# после записи, индекс похожести (соседи по stack/reach) обновляется по
+# модели. Геометрия одного размера читается через ограниченный LRU-кэш,
+# сбрасываемый по модели, а публичные модели хранятся отсортированными
+# для /bikes/list.
+import bisect
+import hashlib
+import heapq
+import math
+import os
+import threading
+import logging
+from itertools import islice
+
+import numpy as np
+
+from app.models import dao
+from app.utils.cache import LRUCache
+from app.utils.geometry_calc import FIT_GEOMETRY_FIELDS, SCORE_GEOMETRY_FIELDS, geometry_columns
+
+GEOMETRY_CACHE_SIZE = int(os.environ.get("GEOMETRY_CACHE_SIZE", 4096))
+GEOMETRY_CACHE_TTL = int(os.environ.get("GEOMETRY_CACHE_TTL", 600))
+
+logger = logging.getLogger(__name__)
+
+
+class GeometryMatrix:
+    """Снимок всех размеров каталога по столбцам вместе с видимостью их моделей."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._snapshot = None
+        self._generation = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._snapshot = None
+
+    def snapshot(self):
+        """Текущий снимок (загружается при необходимости); None при ошибке БД."""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        with self._load_lock:
+            snapshot = self._snapshot
+            if snapshot is not None:
+                return snapshot
+            generation = self._generation
+            rows = dao.get_catalog_geometries()
+            if rows is None:
+                return None
+            snapshot = self._build(rows)
+            with self._lock:
+                if generation == self._generation:
+                    self._snapshot = snapshot
+            return snapshot
+
+    @staticmethod
+    def _build(rows):
+        return {
+            "size_id":       np.array([r["id"] for r in rows], dtype=np.int64),
+            "bike_model_id": np.array([r["bike_model_id"] for r in rows], dtype=np.int64),
+            "owner_id":      np.array([r["owner_id"] for r in rows], dtype=np.int64),
+            "is_public":     np.array([r["status"] == "public" for r in rows], dtype=bool),
+            "model":         [r["model"] for r in rows],
+            "size":          [r["size"] for r in rows],
+            "geometry":      geometry_columns(rows, FIT_GEOMETRY_FIELDS + SCORE_GEOMETRY_FIELDS),
+        }
+
+    @staticmethod
+    def visible_mask(snapshot, user_id):
+        return snapshot["is_public"] | (snapshot["owner_id"] == (user_id or -1))
+
+
+class SimilarityIndex:
+    """Сеточный индекс по (stack, reach) для поиска K ближайших рам.
+
+    Расстояние евклидово по stack, reach, seatAngle и headAngle; углы
+    умножаются на ANGLE_WEIGHT мм на градус. Ячейки шириной CELL_MM по stack
+    и reach, поэтому кольцо ячеек на r шагов от запроса не ближе
+    (r - 1) * CELL_MM, и поиск останавливается, когда эта граница больше
+    K-го лучшего расстояния.
+    """
+
+    CELL_MM = 20.0
+    ANGLE_WEIGHT = 10.0
+    FIELDS = ("stack", "reach", "seatAngle", "headAngle")
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._entries = {}
+        self._model_sizes = {}
+        self._models = {}
+        self._cells = {}
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded = False
+            self._entries, self._model_sizes, self._models, self._cells = {}, {}, {}, {}
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            rows = dao.get_catalog_geometries()
+            if rows is None:
+                return False
+            for row in rows:
+                self._add_row(row)
+            self._loaded = True
+        return True
+
+    def ready(self):
+        """Загружает индекс при необходимости; False при ошибке БД."""
+        with self._lock:
+            return self._ensure_loaded()
+
+    def _cell(self, vector):
+        return (math.floor(vector[0] / self.CELL_MM), math.floor(vector[1] / self.CELL_MM))
+
+    def _add_row(self, row):
+        self._models[row["bike_model_id"]] = {
+            "model": row["model"], "owner_id": row["owner_id"], "status": row["status"],
+        }
+        self._model_sizes.setdefault(row["bike_model_id"], set())
+        if any(row.get(f) is None for f in self.FIELDS):
+            return
+        vector = tuple(float(row[f]) for f in self.FIELDS)
+        self._entries[row["id"]] = {
+            "bike_model_id": row["bike_model_id"], "size": row["size"], "vector": vector,
+        }
+        self._model_sizes[row["bike_model_id"]].add(row["id"])
+        self._cells.setdefault(self._cell(vector), set()).add(row["id"])
+
+    def _remove_model(self, bike_model_id):
+        for size_id in self._model_sizes.pop(bike_model_id, ()):
+            entry = self._entries.pop(size_id)
+            cell = self._cell(entry["vector"])
+            self._cells[cell].discard(size_id)
+            if not self._cells[cell]:
+                del self._cells[cell]
+        self._models.pop(bike_model_id, None)
+
+    def refresh_model(self, bike_model_id):
+        with self._lock:
+            if not self._loaded:
+                return
+            rows = dao.get_catalog_geometries(bike_model_id)
+            if rows is None:
+                # Состояние модели неизвестно — индекс перечитается целиком
+                self.invalidate()
+                return
+            self._remove_model(bike_model_id)
+            for row in rows:
+                self._add_row(row)
+
+    def remove_model(self, bike_model_id):
+        with self._lock:
+            if self._loaded:
+                self._remove_model(bike_model_id)
+
+    def set_model_status(self, bike_model_id, status):
+        with self._lock:
+            model = self._models.get(bike_model_id)
+            if model is not None:
+                model["status"] = status
+
+    def get(self, size_id):
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._entries.get(size_id)
+            if entry is None:
+                return None
+            return {**entry, **self._models[entry["bike_model_id"]]}
+
+    def _distance(self, a, b):
+        w = self.ANGLE_WEIGHT
+        return math.sqrt(
+            (a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2
+            + (w * (a[2] - b[2])) ** 2 + (w * (a[3] - b[3])) ** 2
+        )
+
+    def _ring(self, cx, cy, r):
+        if r == 0:
+            yield (cx, cy)
+            return
+        for dx in range(-r, r + 1):
+            yield (cx + dx, cy - r)
+            yield (cx + dx, cy + r)
+        for dy in range(-r + 1, r):
+            yield (cx - r, cy + dy)
+            yield (cx + r, cy + dy)
+
+    def nearest(self, size_id, k, visible):
+        """K размеров, ближайших к size_id, среди моделей, для которых visible(model) истинно."""
+        with self._lock:
+            self._ensure_loaded()
+            origin = self._entries.get(size_id)
+            if origin is None or not self._cells:
+                return []
+            vector = origin["vector"]
+            cx, cy = self._cell(vector)
+            max_r = max(
+                max(abs(x - cx), abs(y - cy)) for x, y in self._cells
+            )
+
+            best = []
+            for r in range(max_r + 1):
+                if len(best) == k and (r - 1) * self.CELL_MM > -best[0][0]:
+                    break
+                for cell in self._ring(cx, cy, r):
+                    for other_id in self._cells.get(cell, ()):
+                        if other_id == size_id:
+                            continue
+                        other = self._entries[other_id]
+                        if not visible(self._models[other["bike_model_id"]]):
+                            continue
+                        item = (-self._distance(vector, other["vector"]), -other_id)
+                        if len(best) < k:
+                            heapq.heappush(best, item)
+                        elif item > best[0]:
+                            heapq.heapreplace(best, item)
+
+            results = []
+            for neg_dist, neg_id in sorted(best, reverse=True):
+                entry = self._entries[-neg_id]
+                model = self._models[entry["bike_model_id"]]
+                results.append({
+                    "size_id": -neg_id,
+                    "bike_model_id": entry["bike_model_id"],
+                    "model": model["model"],
+                    "size": entry["size"],
+                    **dict(zip(self.FIELDS, entry["vector"])),
+                    "distance": -neg_dist,
+                })
+            return results
+
+
+class GeometryCache:
+    """LRU-кэш перед dao.get_bike_geometry_with_model.
+
+    Записи общие для всех вызывающих, изменять их нельзя. Каждый сброс
+    увеличивает поколение, чтобы строка, прочитанная из БД до сброса, не
+    попала в кэш после него.
+    """
+
+    def __init__(self, maxsize=GEOMETRY_CACHE_SIZE, ttl=GEOMETRY_CACHE_TTL):
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def get(self, size_id):
+        entry = self._cache.get(size_id)
+        if entry is not None:
+            return entry
+        generation = self._generation
+        entry = dao.get_bike_geometry_with_model(size_id)
+        if entry is not None:
+            with self._lock:
+                if generation == self._generation:
+                    self._cache.set(size_id, entry)
+        return entry
+
+    def peek(self, size_id):
+        """Запись из кэша или None — без обращения к БД и без учёта в статистике."""
+        return self._cache.peek(size_id)
+
+    def invalidate_model(self, bike_model_id):
+        with self._lock:
+            self._generation += 1
+            self._cache.discard_if(lambda _, entry: entry["geometry"]["bike_model_id"] == bike_model_id)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+
+def model_sort_key(model):
+    return (model["model"].casefold(), model["id"])
+
+
+class PublicCatalog:
+    """Публичные модели, отсортированные по названию; снимок перестраивается
+    лениво после записи в каталог.
+
+    Непубличные модели пользователя подмешиваются на каждый запрос, поэтому
+    список не сортирует публичный каталог и не фильтрует его условием OR.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._snapshot = None  # (модели, ключи сортировки, версия)
+        self._generation = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._snapshot = None
+
+    def _get_snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        with self._load_lock:
+            snapshot = self._snapshot
+            if snapshot is not None:
+                return snapshot
+            generation = self._generation
+            rows = dao.get_public_bike_models()
+            if rows is None:
+                return [], [], None
+            models = sorted(rows, key=model_sort_key)
+            digest = hashlib.sha1()
+            for m in models:
+                digest.update(f"{m['id']}:{m['version']};".encode("ascii"))
+            snapshot = (models, [model_sort_key(m) for m in models], digest.hexdigest())
+            with self._lock:
+                if generation == self._generation:
+                    self._snapshot = snapshot
+            return snapshot
+
+    def models(self):
+        return self._get_snapshot()[0]
+
+    def version(self):
+        """Хэш (id, version) публичных моделей; None, если снимок не загрузился."""
+        return self._get_snapshot()[2]
+
+    def iter_visible(self, user_id, after=None, q=None, own=None):
+        """Публичные модели и непубличные модели пользователя в порядке ключа
+        сортировки, начиная после ключа after; q — фильтр по подстроке без
+        учёта регистра. own — уже прочитанные модели пользователя."""
+        public, keys, _ = self._get_snapshot()
+        start = bisect.bisect_right(keys, tuple(after)) if after is not None else 0
+        if own is None:
+            own = dao.get_user_bike_models(user_id) if user_id else []
+        own = [m for m in own if m["status"] != "public"]
+        if after is not None:
+            own = [m for m in own if model_sort_key(m) > tuple(after)]
+        own.sort(key=model_sort_key)
+
+        rows = heapq.merge(islice(public, start, None), own, key=model_sort_key)
+        if q:
+            needle = q.casefold()
+            rows = (m for m in rows if needle in m["model"].casefold())
+        return rows
+
+    def visible_to(self, user_id, own=None):
+        return list(self.iter_visible(user_id, own=own))
+
+
+geometry_matrix = GeometryMatrix()
+similarity_index = SimilarityIndex()
+geometry_cache = GeometryCache()
+public_catalog = PublicCatalog()
+
+
+def invalidate():
+    geometry_matrix.invalidate()
+    similarity_index.invalidate()
+    geometry_cache.invalidate()
+    public_catalog.invalidate()
+
+
+def model_changed(bike_model_id):
+    geometry_matrix.invalidate()
+    similarity_index.refresh_model(bike_model_id)
+    geometry_cache.invalidate_model(bike_model_id)
+    public_catalog.invalidate()
+
+
+def model_deleted(bike_model_id):
+    geometry_matrix.invalidate()
+    similarity_index.remove_model(bike_model_id)
+    geometry_cache.invalidate_model(bike_model_id)
+    public_catalog.invalidate()
+
+
+def model_status_changed(bike_model_id, status):
+    geometry_matrix.invalidate()
+    similarity_index.set_model_status(bike_model_id, status)
+    geometry_cache.invalidate_model(bike_model_id)
+    public_catalog.invalidate()
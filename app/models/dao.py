@@ -1,6 +1,7 @@
 from psycopg.rows import dict_row
 from .db import get_conn
 from werkzeug.security import generate_password_hash, check_password_hash
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,6 +17,12 @@ _BIKE_SIZE_COLUMNS = frozenset({
     "minseatpostLen", "maxseatpostLen",
 })
 
+# Числовые колонки размера в фиксированном порядке для COPY массового импорта
+_IMPORT_SIZE_COLUMNS = tuple(sorted(_BIKE_SIZE_COLUMNS - {"bike_model_id", "size"}))
+
+# Сколько строк серверный курсор выгрузки забирает за один сетевой обмен
+_EXPORT_FETCH_SIZE = 2000
+
 
 def create_user_account(username, password):
     try:
@@ -111,6 +118,162 @@ def add_user_bike(user_id: int, bike: dict) -> dict:
         return {"success": False, "errors": [{"field": "general", "message": "Не удалось добавить велосипед"}]}
 
 
+def add_user_bike_models(user_id: int, models: dict) -> dict:
+    """Upsert моделей и всех их размеров в одной транзакции.
+
+    models — словарь «название модели → список размеров». Размеры с
+    одинаковым набором колонок вставляются одним многострочным
+    INSERT ... ON CONFLICT; повторяющиеся размеры — побеждает последний.
+    Ошибка в любой модели откатывает весь запрос.
+    """
+    if not models or any(
+        not model_name or not sizes or any(not s.get("size") for s in sizes)
+        for model_name, sizes in models.items()
+    ):
+        return {"success": False, "errors": [{"field": "data", "message": "Необходимо указать модель и размер велосипеда"}]}
+
+    try:
+        with get_conn() as conn, conn.cursor() as cur:
+            bike_model_ids = []
+            for model_name, sizes in models.items():
+                # DO UPDATE, а не DO NOTHING: RETURNING отдаёт id и тогда,
+                # когда модель одновременно вставила другая транзакция
+                cur.execute(
+                    """
+                    INSERT INTO bike_models (user_id, model)
+                    VALUES (%s, %s)
+                    ON CONFLICT (user_id, model) DO UPDATE SET model = EXCLUDED.model
+                    RETURNING id
+                    """,
+                    (user_id, model_name),
+                )
+                bike_model_id = cur.fetchone()[0]
+                bike_model_ids.append(bike_model_id)
+
+                by_size = {}
+                for bike in sizes:
+                    fields = {k: v for k, v in bike.items() if k in _BIKE_SIZE_COLUMNS and k != "bike_model_id"}
+                    by_size[fields["size"]] = fields
+
+                groups = {}
+                for fields in by_size.values():
+                    groups.setdefault(tuple(sorted(fields)), []).append(fields)
+
+                for columns, rows in groups.items():
+                    columns = ("bike_model_id",) + columns
+                    col_names = ", ".join(f'"{c}"' for c in columns)
+                    row_placeholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
+                    update_clause = ", ".join(
+                        f'"{c}" = EXCLUDED."{c}"'
+                        for c in columns
+                        if c not in ("bike_model_id", "size")
+                    )
+                    params = [
+                        value
+                        for fields in rows
+                        for value in (bike_model_id, *(fields[c] for c in columns[1:]))
+                    ]
+                    cur.execute(
+                        f"""
+                        INSERT INTO bike_sizes ({col_names})
+                        VALUES {", ".join([row_placeholder] * len(rows))}
+                        ON CONFLICT (bike_model_id, size) DO {"UPDATE SET " + update_clause if update_clause else "NOTHING"}
+                        """,
+                        params,
+                    )
+            conn.commit()
+            return {"success": True, "bike_model_ids": bike_model_ids}
+
+    except Exception as e:
+        logger.error(f"add_user_bike_models: {e}", exc_info=True)
+        return {"success": False, "errors": [{"field": "general", "message": "Не удалось добавить велосипед"}]}
+
+
+def import_bike_sizes(user_id: int, rows, defaults=None) -> dict:
+    """Массовый импорт размеров через COPY во временную таблицу и слияние одним INSERT.
+
+    rows — итератор пар (номер строки, проверенный словарь с model/size и
+    параметрами геометрии); читается потоково. Незаполненные параметры не
+    затирают уже сохранённые значения, а для новых размеров берутся из
+    defaults. Дубликаты (модель, размер) — побеждает более поздняя строка.
+    """
+    defaults = defaults or {}
+    numeric_cols = ", ".join(f'"{c}"' for c in _IMPORT_SIZE_COLUMNS)
+    numeric_defs = ", ".join(f'"{c}" NUMERIC(10, 2)' for c in _IMPORT_SIZE_COLUMNS)
+    insert_values = ", ".join(
+        f'COALESCE(l."{c}", %s::numeric)' if c in defaults else f'l."{c}"' for c in _IMPORT_SIZE_COLUMNS
+    )
+    # EXCLUDED уже содержит значения по умолчанию, поэтому при обновлении
+    # берём исходную строку импорта
+    update_values = ", ".join(f'COALESCE(l."{c}", bike_sizes."{c}")' for c in _IMPORT_SIZE_COLUMNS)
+    try:
+        with get_conn() as conn, conn.cursor() as cur:
+            cur.execute(
+                f"""
+                CREATE TEMP TABLE bike_import (
+                    line INTEGER NOT NULL,
+                    model VARCHAR(255) NOT NULL,
+                    size VARCHAR(50) NOT NULL,
+                    {numeric_defs}
+                ) ON COMMIT DROP
+                """
+            )
+            with cur.copy(f"COPY bike_import (line, model, size, {numeric_cols}) FROM STDIN") as copy:
+                for line, bike in rows:
+                    copy.write_row((line, bike["model"], bike["size"], *(bike.get(c) for c in _IMPORT_SIZE_COLUMNS)))
+
+            cur.execute(
+                """
+                INSERT INTO bike_models (user_id, model)
+                SELECT DISTINCT %s::integer, model FROM bike_import
+                ON CONFLICT (user_id, model) DO NOTHING
+                """,
+                (user_id,),
+            )
+            cur.execute(
+                f"""
+                CREATE TEMP TABLE bike_import_latest (
+                    bike_model_id INTEGER NOT NULL,
+                    size VARCHAR(50) NOT NULL,
+                    {numeric_defs},
+                    PRIMARY KEY (bike_model_id, size)
+                ) ON COMMIT DROP
+                """
+            )
+            cur.execute(
+                f"""
+                INSERT INTO bike_import_latest (bike_model_id, size, {numeric_cols})
+                SELECT DISTINCT ON (bm.id, i.size) bm.id, i.size, {", ".join(f'i."{c}"' for c in _IMPORT_SIZE_COLUMNS)}
+                FROM bike_import i
+                JOIN bike_models bm ON bm.user_id = %s AND bm.model = i.model
+                ORDER BY bm.id, i.size, i.line DESC
+                """,
+                (user_id,),
+            )
+            cur.execute(
+                f"""
+                INSERT INTO bike_sizes (bike_model_id, size, {numeric_cols})
+                SELECT l.bike_model_id, l.size, {insert_values}
+                FROM bike_import_latest l
+                ON CONFLICT (bike_model_id, size) DO UPDATE SET ({numeric_cols}) = (
+                    SELECT {update_values}
+                    FROM bike_import_latest l
+                    WHERE l.bike_model_id = EXCLUDED.bike_model_id AND l.size = EXCLUDED.size
+                )
+                """,
+                [defaults[c] for c in _IMPORT_SIZE_COLUMNS if c in defaults],
+            )
+            sizes = cur.rowcount
+            cur.execute("SELECT DISTINCT bike_model_id FROM bike_import_latest")
+            model_ids = [row[0] for row in cur.fetchall()]
+            conn.commit()
+            return {"success": True, "models": len(model_ids), "sizes": sizes, "bike_model_ids": model_ids}
+
+    except Exception as e:
+        logger.error(f"import_bike_sizes: {e}", exc_info=True)
+        return {"success": False, "error": "Не удалось импортировать каталог"}
+
+
 def get_bike_geometry(size_id):
     try:
         with get_conn() as conn:
@@ -122,6 +285,166 @@ def get_bike_geometry(size_id):
         return None
 
 
+_GEOMETRY_WITH_MODEL_SELECT = """
+    SELECT bs.*, bm.status AS "_model_status", bm.user_id AS "_model_owner_id",
+           bm.version AS "_model_version"
+    FROM bike_sizes bs
+    JOIN bike_models bm ON bs.bike_model_id = bm.id
+"""
+_GEOMETRY_WITH_MODEL_SQL = _GEOMETRY_WITH_MODEL_SELECT + "WHERE bs.id = %s"
+
+
+def _geometry_entry(row):
+    if row is None:
+        return None
+    return {
+        "geometry": row,
+        "model_status": row.pop("_model_status"),
+        "model_owner_id": row.pop("_model_owner_id"),
+        "model_version": row.pop("_model_version"),
+    }
+
+
+def get_bike_geometry_with_model(size_id):
+    """Геометрия размера вместе со статусом и владельцем модели — одним запросом."""
+    try:
+        with get_conn() as conn:
+            with conn.cursor(row_factory=dict_row) as cur:
+                cur.execute(_GEOMETRY_WITH_MODEL_SQL, (size_id,))
+                return _geometry_entry(cur.fetchone())
+    except Exception as e:
+        logger.error(f"get_bike_geometry_with_model: {e}", exc_info=True)
+        return None
+
+
+def get_bike_geometries_with_model(size_ids):
+    """То же, что get_bike_geometry_with_model, для нескольких размеров одним
+    запросом: {size_id: запись}; None при ошибке БД."""
+    try:
+        with get_conn() as conn:
+            with conn.cursor(row_factory=dict_row) as cur:
+                cur.execute(_GEOMETRY_WITH_MODEL_SELECT + "WHERE bs.id = ANY(%s)", (list(size_ids),))
+                return {row["id"]: _geometry_entry(row) for row in cur.fetchall()}
+    except Exception as e:
+        logger.error(f"get_bike_geometries_with_model: {e}", exc_info=True)
+        return None
+
+
+def get_bike_size_version(size_id):
+    """Модель размера, её статус, владелец и версия — без строки геометрии."""
+    try:
+        with get_conn() as conn:
+            with conn.cursor(row_factory=dict_row) as cur:
+                cur.execute(
+                    """
+                    SELECT bs.bike_model_id, bm.status AS model_status,
+                           bm.user_id AS model_owner_id, bm.version AS model_version
+                    FROM bike_sizes bs
+                    JOIN bike_models bm ON bs.bike_model_id = bm.id
+                    WHERE bs.id = %s
+                    """,
+                    (size_id,),
+                )
+                return cur.fetchone()
+    except Exception as e:
+        logger.error(f"get_bike_size_version: {e}", exc_info=True)
+        return None
+
+
+def get_bike_model_version(bike_model_id):
+    """Статус, владелец и версия модели; None, если модели нет."""
+    try:
+        with get_conn() as conn:
+            with conn.cursor(row_factory=dict_row) as cur:
+                cur.execute(
+                    "SELECT status, user_id, version FROM bike_models WHERE id = %s",
+                    (bike_model_id,),
+                )
+                return cur.fetchone()
+    except Exception as e:
+        logger.error(f"get_bike_model_version: {e}", exc_info=True)
+        return None
+
+
+def get_model_fit_data(bike_model_id, user_id, check_access=True):
+    """Последняя антропометрия пользователя и все размеры модели — конвейером
+    (pipeline) за один сетевой обмен. При check_access размеры отдаются,
+    только если модель видна пользователю. None при ошибке БД."""
+    try:
+        with get_conn() as conn:
+            with conn.pipeline():
+                anthro_cur = conn.cursor(row_factory=dict_row)
+                anthro_cur.execute(
+                    "SELECT * FROM anthropometry WHERE user_id=%s ORDER BY created_at DESC LIMIT 1",
+                    (user_id,),
+                )
+                access_user_id = user_id if check_access else None
+                sizes_cur = conn.cursor(row_factory=dict_row)
+                sizes_cur.execute(
+                    """
+                    SELECT bs.* FROM bike_sizes bs
+                    JOIN bike_models bm ON bs.bike_model_id = bm.id
+                    WHERE bm.id = %s
+                      AND (%s::integer IS NULL OR bm.status = 'public' OR bm.user_id = %s)
+                    ORDER BY bs."seatTube"
+                    """,
+                    (bike_model_id, access_user_id, access_user_id),
+                )
+                anthro = anthro_cur.fetchone()
+                sizes = sizes_cur.fetchall()
+            if anthro:
+                for key in ("id", "user_id", "created_at"):
+                    anthro.pop(key, None)
+            return {"anthropometry": anthro, "sizes": sizes}
+    except Exception as e:
+        logger.error(f"get_model_fit_data: {e}", exc_info=True)
+        return None
+
+
+def get_catalog_geometries(bike_model_id=None):
+    """Размеры каталога (или одной модели) с названием, владельцем и статусом
+    модели; None при ошибке БД."""
+    try:
+        with get_conn() as conn:
+            with conn.cursor(row_factory=dict_row) as cur:
+                cur.execute(
+                    """
+                    SELECT bs.*, bm.model, bm.user_id AS owner_id, bm.status
+                    FROM bike_sizes bs
+                    JOIN bike_models bm ON bs.bike_model_id = bm.id
+                    WHERE %s::integer IS NULL OR bm.id = %s
+                    ORDER BY bs.id
+                    """,
+                    (bike_model_id, bike_model_id),
+                )
+                return cur.fetchall()
+    except Exception as e:
+        logger.error(f"get_catalog_geometries: {e}", exc_info=True)
+        return None
+
+
+def iter_catalog_export(user_id):
+    """Генератор строк каталога (модель + размер) через серверный курсор."""
+    try:
+        with get_conn() as conn:
+            with conn.cursor(name="catalog_export", row_factory=dict_row) as cur:
+                cur.itersize = _EXPORT_FETCH_SIZE
+                cur.execute(
+                    """
+                    SELECT bm.model, bm.status, bs.*
+                    FROM bike_models bm
+                    JOIN bike_sizes bs ON bs.bike_model_id = bm.id
+                    WHERE bm.status = 'public' OR bm.user_id = %s
+                    ORDER BY bm.model, bm.id, bs.size
+                    """,
+                    (user_id,),
+                )
+                yield from cur
+    except Exception as e:
+        logger.error(f"iter_catalog_export: {e}", exc_info=True)
+        raise
+
+
 def get_visible_bike_models(user_id):
     try:
         with get_conn() as conn:
@@ -136,6 +459,18 @@ def get_visible_bike_models(user_id):
         return []
 
 
+def get_public_bike_models():
+    """Все публичные модели (для снимка каталога); None при ошибке БД."""
+    try:
+        with get_conn() as conn:
+            with conn.cursor(row_factory=dict_row) as cur:
+                cur.execute("SELECT * FROM bike_models WHERE status = 'public'")
+                return cur.fetchall()
+    except Exception as e:
+        logger.error(f"get_public_bike_models: {e}", exc_info=True)
+        return None
+
+
 def get_user_bike_models(user_id):
     try:
         with get_conn() as conn:
@@ -147,6 +482,69 @@ def get_user_bike_models(user_id):
         return []
 
 
+def _like_pattern(q):
+    escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _keyset_models_page(where, params, order, after, limit, q):
+    """Страница bike_models по ключу order (два столбца, второй — id) после after."""
+    conditions = [where]
+    params = list(params)
+    if after is not None:
+        conditions.append(f"({order}) > (%s, %s)")
+        params.extend(after)
+    if q:
+        conditions.append("model ILIKE %s")
+        params.append(_like_pattern(q))
+    params.append(limit)
+    try:
+        with get_conn() as conn:
+            with conn.cursor(row_factory=dict_row) as cur:
+                cur.execute(
+                    f"SELECT * FROM bike_models WHERE {' AND '.join(conditions)} ORDER BY {order} LIMIT %s",
+                    params,
+                )
+                return cur.fetchall()
+    except Exception as e:
+        logger.error(f"_keyset_models_page: {e}", exc_info=True)
+        return []
+
+
+def get_user_bike_models_page(user_id, after=None, limit=50, q=None):
+    """Модели пользователя по (model, id) после курсора after, не больше limit."""
+    return _keyset_models_page("user_id = %s", (user_id,), "model, id", after, limit, q)
+
+
+def get_pending_bikes_page(after=None, limit=50, q=None):
+    """Очередь модерации по (created_at, id) после курсора after, не больше limit."""
+    return _keyset_models_page("status = 'pending'", (), "created_at, id", after, limit, q)
+
+
+def search_bike_models(user_id, q, limit=20):
+    """Модели, видимые пользователю, по убыванию word_similarity(q, model).
+
+    Отбор идёт оператором <% по триграммному GIN-индексу (порог
+    pg_trgm.word_similarity_threshold, по умолчанию 0.6)."""
+    try:
+        with get_conn() as conn:
+            with conn.cursor(row_factory=dict_row) as cur:
+                cur.execute(
+                    """
+                    SELECT *, word_similarity(%s, model) AS score
+                    FROM bike_models
+                    WHERE %s <%% model AND (status = 'public' OR user_id = %s)
+                    ORDER BY score DESC, model, id
+                    LIMIT %s
+                    """,
+                    (q, q, user_id or -1, limit),
+                )
+                return cur.fetchall()
+    except Exception as e:
+        logger.error(f"search_bike_models: {e}", exc_info=True)
+        return []
+
+
 def get_pending_bikes():
     try:
         with get_conn() as conn:
@@ -276,6 +674,44 @@ def get_latest_user_anthropometry(user_id):
         return None
 
 
+def get_fit_bootstrap(size_id, user_id, with_geometry=True):
+    """Данные для открытия холста: геометрия размера с моделью (если
+    with_geometry), последняя антропометрия и сохранённые посадки
+    пользователя для размера. Запросы идут конвейером (pipeline) в одной
+    транзакции — за один сетевой обмен; None при ошибке БД."""
+    try:
+        with get_conn() as conn:
+            with conn.pipeline():
+                geometry_cur = conn.cursor(row_factory=dict_row)
+                if with_geometry:
+                    geometry_cur.execute(_GEOMETRY_WITH_MODEL_SQL, (size_id,))
+                anthro_cur = conn.cursor(row_factory=dict_row)
+                anthro_cur.execute(
+                    "SELECT * FROM anthropometry WHERE user_id=%s ORDER BY created_at DESC LIMIT 1",
+                    (user_id,),
+                )
+                fits_cur = conn.cursor(row_factory=dict_row)
+                fits_cur.execute(
+                    """
+                    SELECT name, "seatHight", "stemHight", "saddleOffset", "torsoAngle", "shifterAngle", created_at
+                    FROM fit_settings
+                    WHERE user_id=%s AND bike_id=%s
+                    ORDER BY name
+                    """,
+                    (user_id, size_id),
+                )
+                geometry = _geometry_entry(geometry_cur.fetchone()) if with_geometry else None
+                anthro = anthro_cur.fetchone()
+                fits = fits_cur.fetchall()
+            if anthro:
+                for key in ("id", "user_id", "created_at"):
+                    anthro.pop(key, None)
+            return {"geometry": geometry, "anthropometry": anthro, "fits": fits}
+    except Exception as e:
+        logger.error(f"get_fit_bootstrap: {e}", exc_info=True)
+        return None
+
+
 def save_fit_settings(user_id, data):
     try:
         with get_conn() as conn:
@@ -332,6 +768,51 @@ def get_user_fits(user_id, size_id):
         return []
 
 
+def get_user_fits_by_names(user_id, pairs):
+    """Сохранённые посадки пользователя по парам (size_id, имя) одним запросом."""
+    if not pairs:
+        return []
+    size_ids, names = zip(*pairs)
+    try:
+        with get_conn() as conn:
+            with conn.cursor(row_factory=dict_row) as cur:
+                cur.execute(
+                    """
+                    SELECT * FROM fit_settings
+                    WHERE user_id = %s
+                      AND (bike_id, name) IN (SELECT * FROM unnest(%s::integer[], %s::text[]))
+                    """,
+                    (user_id, list(size_ids), list(names)),
+                )
+                return cur.fetchall()
+    except Exception as e:
+        logger.error(f"get_user_fits_by_names: {e}", exc_info=True)
+        return []
+
+
+def iter_user_fits_export(user_id):
+    """Генератор сохранённых посадок пользователя через серверный курсор."""
+    try:
+        with get_conn() as conn:
+            with conn.cursor(name="fits_export", row_factory=dict_row) as cur:
+                cur.itersize = _EXPORT_FETCH_SIZE
+                cur.execute(
+                    """
+                    SELECT fs.*, bm.model, bs.size
+                    FROM fit_settings fs
+                    JOIN bike_sizes bs ON fs.bike_id = bs.id
+                    JOIN bike_models bm ON bs.bike_model_id = bm.id
+                    WHERE fs.user_id = %s
+                    ORDER BY bm.model, bs.size, fs.name
+                    """,
+                    (user_id,),
+                )
+                yield from cur
+    except Exception as e:
+        logger.error(f"iter_user_fits_export: {e}", exc_info=True)
+        raise
+
+
 def delete_fit(user_id, fit_name, size_id):
     try:
         with get_conn() as conn:
@@ -345,3 +826,58 @@ def delete_fit(user_id, fit_name, size_id):
     except Exception as e:
         logger.error(f"delete_fit: {e}", exc_info=True)
         return {"success": False, "error": "Не удалось удалить посадку"}
+
+
+def create_parse_job(job_id, user_id, url, ttl):
+    """Новое задание разбора страницы; заодно удаляет задания старше ttl секунд."""
+    try:
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "DELETE FROM parse_jobs WHERE created_at < NOW() - make_interval(secs => %s)",
+                    (ttl,),
+                )
+                cur.execute(
+                    "INSERT INTO parse_jobs (id, user_id, url) VALUES (%s, %s, %s)",
+                    (job_id, user_id, url),
+                )
+                conn.commit()
+                return True
+    except Exception as e:
+        logger.error(f"create_parse_job: {e}", exc_info=True)
+        return False
+
+
+def finish_parse_job(job_id, status, result=None, error=None):
+    """Итог задания: status done с result или failed с error."""
+    try:
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "UPDATE parse_jobs SET status = %s, result = %s::jsonb, error = %s WHERE id = %s",
+                    (status, None if result is None else json.dumps(result, ensure_ascii=False), error, job_id),
+                )
+                conn.commit()
+                return True
+    except Exception as e:
+        logger.error(f"finish_parse_job: {e}", exc_info=True)
+        return False
+
+
+def get_parse_job(job_id, user_id, ttl):
+    """Задание пользователя не старше ttl секунд; None, если его нет."""
+    try:
+        with get_conn() as conn:
+            with conn.cursor(row_factory=dict_row) as cur:
+                cur.execute(
+                    """
+                    SELECT id, status, result, error FROM parse_jobs
+                    WHERE id = %s AND user_id = %s
+                      AND created_at >= NOW() - make_interval(secs => %s)
+                    """,
+                    (job_id, user_id, ttl),
+                )
+                return cur.fetchone()
+    except Exception as e:
+        logger.error(f"get_parse_job: {e}", exc_info=True)
+        return None
@@ -1,7 +1,44 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
 from psycopg_pool import ConnectionPool
 from app.config import Config
 
 pool = ConnectionPool(conninfo=Config.DATABASE_URL, max_size=10, timeout=30)
 
+# Соединение, выданное shared_connection(): get_conn() внутри блока
+# возвращает его, а не берёт новое из пула
+_shared_conn = ContextVar("shared_conn", default=None)
+
+
+@contextmanager
+def _borrowed(conn):
+    try:
+        yield conn
+    except Exception:
+        # Ошибка запроса оставляет транзакцию прерванной — откатываем,
+        # чтобы следующие запросы на этом соединении выполнялись
+        conn.rollback()
+        raise
+
+
 def get_conn():
+    conn = _shared_conn.get()
+    if conn is not None:
+        return _borrowed(conn)
     return pool.connection()
+
+
+@contextmanager
+def shared_connection():
+    """Одно соединение пула на все get_conn() внутри блока (в текущем потоке)."""
+    conn = _shared_conn.get()
+    if conn is not None:
+        yield conn
+        return
+    with pool.connection() as conn:
+        token = _shared_conn.set(conn)
+        try:
+            yield conn
+        finally:
+            _shared_conn.reset(token)
@@ -1,6 +1,8 @@
+import copy
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from datetime import datetime, timedelta
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
@@ -10,6 +12,7 @@ _mock_db = {
     "bike_sizes": [],
     "anthropometry": [],
     "fit_settings": [],
+    "parse_jobs": [],
 }
 
 _counters = {
@@ -81,9 +84,12 @@ def add_user_bike(user_id: int, bike: dict) -> dict:
                 "model": model_name,
                 "status": "private",
                 "is_moderated": False,
+                "version": 1,
                 "created_at": datetime.now(),
             }
             _mock_db["bike_models"].append(bike_model)
+        else:
+            bike_model["version"] += 1
 
         bike_model_id = bike_model["id"]
         fields = {k: v for k, v in bike.items() if k != "model"}
@@ -107,18 +113,182 @@ def add_user_bike(user_id: int, bike: dict) -> dict:
         return {"success": False, "errors": [{"field": "general", "message": "Не удалось добавить велосипед"}]}
 
 
+def add_user_bike_models(user_id: int, models: dict) -> dict:
+    if not models or any(
+        not model_name or not sizes or any(not s.get("size") for s in sizes)
+        for model_name, sizes in models.items()
+    ):
+        return {"success": False, "errors": [{"field": "data", "message": "Необходимо указать модель и размер велосипеда"}]}
+    bike_model_ids = []
+    for model_name, sizes in models.items():
+        for bike in sizes:
+            result = add_user_bike(user_id, {**bike, "model": model_name})
+            if not result.get("success"):
+                return result
+        bike_model_ids.append(result["bike_model_id"])
+    return {"success": True, "bike_model_ids": bike_model_ids}
+
+
+def import_bike_sizes(user_id: int, rows, defaults=None) -> dict:
+    latest = {}
+    for line, bike in rows:
+        latest[(bike["model"], bike["size"])] = bike
+    model_ids = set()
+    for (model_name, size), bike in latest.items():
+        fields = {k: v for k, v in bike.items() if v is not None}
+        bike_model = next(
+            (bm for bm in _mock_db["bike_models"] if bm["user_id"] == user_id and bm["model"] == model_name),
+            None,
+        )
+        is_new = bike_model is None or not any(
+            bs["bike_model_id"] == bike_model["id"] and bs["size"] == size for bs in _mock_db["bike_sizes"]
+        )
+        if is_new:
+            fields = {**(defaults or {}), **fields}
+        result = add_user_bike(user_id, fields)
+        if not result.get("success"):
+            return {"success": False, "error": "Не удалось импортировать каталог"}
+        model_ids.add(result["bike_model_id"])
+    return {"success": True, "models": len(model_ids), "sizes": len(latest), "bike_model_ids": sorted(model_ids)}
+
+
 def get_bike_geometry(size_id):
     return next((bs for bs in _mock_db["bike_sizes"] if bs["id"] == size_id), None)
 
 
+def get_bike_geometry_with_model(size_id):
+    row = get_bike_geometry(size_id)
+    if row is None:
+        return None
+    model = next((bm for bm in _mock_db["bike_models"] if bm["id"] == row["bike_model_id"]), None)
+    if model is None:
+        return None
+    return {
+        "geometry": row,
+        "model_status": model["status"],
+        "model_owner_id": model["user_id"],
+        "model_version": model["version"],
+    }
+
+
+def get_bike_geometries_with_model(size_ids):
+    entries = {size_id: get_bike_geometry_with_model(size_id) for size_id in set(size_ids)}
+    return {size_id: entry for size_id, entry in entries.items() if entry is not None}
+
+
+def get_bike_size_version(size_id):
+    entry = get_bike_geometry_with_model(size_id)
+    if entry is None:
+        return None
+    return {
+        "bike_model_id": entry["geometry"]["bike_model_id"],
+        "model_status": entry["model_status"],
+        "model_owner_id": entry["model_owner_id"],
+        "model_version": entry["model_version"],
+    }
+
+
+def get_bike_model_version(bike_model_id):
+    model = next((bm for bm in _mock_db["bike_models"] if bm["id"] == bike_model_id), None)
+    if model is None:
+        return None
+    return {"status": model["status"], "user_id": model["user_id"], "version": model["version"]}
+
+
+def get_model_fit_data(bike_model_id, user_id, check_access=True):
+    model = next((bm for bm in _mock_db["bike_models"] if bm["id"] == bike_model_id), None)
+    sizes = []
+    if model and (not check_access or model["status"] == "public" or model["user_id"] == user_id):
+        sizes = sorted(
+            (bs for bs in _mock_db["bike_sizes"] if bs["bike_model_id"] == bike_model_id),
+            key=lambda bs: bs.get("seatTube") or 0,
+        )
+    return {"anthropometry": get_latest_user_anthropometry(user_id), "sizes": sizes}
+
+
+def get_catalog_geometries(bike_model_id=None):
+    models = {bm["id"]: bm for bm in _mock_db["bike_models"]}
+    return [
+        {**bs, "model": models[bs["bike_model_id"]]["model"],
+         "owner_id": models[bs["bike_model_id"]]["user_id"],
+         "status": models[bs["bike_model_id"]]["status"]}
+        for bs in sorted(_mock_db["bike_sizes"], key=lambda bs: bs["id"])
+        if bs["bike_model_id"] in models
+        and (bike_model_id is None or bs["bike_model_id"] == bike_model_id)
+    ]
+
+
+def iter_catalog_export(user_id):
+    models = sorted(
+        (bm for bm in _mock_db["bike_models"] if bm["status"] == "public" or bm["user_id"] == user_id),
+        key=lambda bm: (bm["model"], bm["id"]),
+    )
+    for bm in models:
+        for bs in sorted((bs for bs in _mock_db["bike_sizes"] if bs["bike_model_id"] == bm["id"]), key=lambda bs: bs["size"]):
+            yield {"model": bm["model"], "status": bm["status"], **bs}
+
+
 def get_visible_bike_models(user_id):
     return [bm for bm in _mock_db["bike_models"] if bm["status"] == "public" or bm["user_id"] == user_id]
 
 
+def get_public_bike_models():
+    return [bm for bm in _mock_db["bike_models"] if bm["status"] == "public"]
+
+
 def get_user_bike_models(user_id):
     return [bm for bm in _mock_db["bike_models"] if bm["user_id"] == user_id]
 
 
+def _models_page(rows, key, after, limit, q):
+    if q:
+        rows = [bm for bm in rows if q.casefold() in bm["model"].casefold()]
+    rows = sorted(rows, key=key)
+    if after is not None:
+        rows = [bm for bm in rows if key(bm) > tuple(after)]
+    return rows[:limit]
+
+
+def get_user_bike_models_page(user_id, after=None, limit=50, q=None):
+    rows = [bm for bm in _mock_db["bike_models"] if bm["user_id"] == user_id]
+    return _models_page(rows, lambda bm: (bm["model"], bm["id"]), after, limit, q)
+
+
+def get_pending_bikes_page(after=None, limit=50, q=None):
+    rows = [bm for bm in _mock_db["bike_models"] if bm["status"] == "pending"]
+    return _models_page(rows, lambda bm: (bm["created_at"], bm["id"]), after, limit, q)
+
+
+# Порог оператора <% в pg_trgm (pg_trgm.word_similarity_threshold)
+_WORD_SIMILARITY_THRESHOLD = 0.6
+
+
+def _trigrams(text):
+    trigrams = set()
+    for word in re.findall(r"[^\W_]+", text.lower()):
+        padded = f"  {word} "
+        trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return trigrams
+
+
+def _word_similarity(q, model):
+    # Упрощение word_similarity: доля триграмм запроса, найденных в названии
+    query = _trigrams(q)
+    return len(query & _trigrams(model)) / len(query) if query else 0.0
+
+
+def search_bike_models(user_id, q, limit=20):
+    rows = []
+    for bm in _mock_db["bike_models"]:
+        if bm["status"] != "public" and bm["user_id"] != user_id:
+            continue
+        score = _word_similarity(q, bm["model"])
+        if score >= _WORD_SIMILARITY_THRESHOLD:
+            rows.append({**bm, "score": score})
+    rows.sort(key=lambda bm: (-bm["score"], bm["model"], bm["id"]))
+    return rows[:limit]
+
+
 def get_pending_bikes():
     return [bm for bm in _mock_db["bike_models"] if bm["status"] == "pending"]
 
@@ -129,6 +299,7 @@ def set_bike_visibility(bike_id, is_public):
         return {"success": False, "error": "Велосипед не найден"}
     bike_model["status"] = "public" if is_public else "private"
     bike_model["is_moderated"] = True
+    bike_model["version"] += 1
     return {"success": True}
 
 
@@ -174,6 +345,7 @@ def set_bike_pending(bike_id, user_id):
     if not bike_model:
         return {"success": False, "error": "Велосипед не найден"}
     bike_model["status"] = "pending"
+    bike_model["version"] += 1
     return {"success": True}
 
 
@@ -230,6 +402,41 @@ def get_user_fits(user_id, size_id):
     return [fs["name"] for fs in _mock_db["fit_settings"] if fs["user_id"] == user_id and fs["bike_id"] == size_id]
 
 
+def get_fit_bootstrap(size_id, user_id, with_geometry=True):
+    fits = sorted(
+        (fs for fs in _mock_db["fit_settings"] if fs["user_id"] == user_id and fs["bike_id"] == size_id),
+        key=lambda fs: fs["name"],
+    )
+    return {
+        "geometry": get_bike_geometry_with_model(size_id) if with_geometry else None,
+        "anthropometry": get_latest_user_anthropometry(user_id),
+        "fits": [
+            {k: fs[k] for k in ("name", "seatHight", "stemHight", "saddleOffset", "torsoAngle", "shifterAngle", "created_at")}
+            for fs in fits
+        ],
+    }
+
+
+def get_user_fits_by_names(user_id, pairs):
+    wanted = set(pairs)
+    return [
+        fs for fs in _mock_db["fit_settings"]
+        if fs["user_id"] == user_id and (fs["bike_id"], fs["name"]) in wanted
+    ]
+
+
+def iter_user_fits_export(user_id):
+    sizes = {bs["id"]: bs for bs in _mock_db["bike_sizes"]}
+    models = {bm["id"]: bm for bm in _mock_db["bike_models"]}
+    rows = []
+    for fs in _mock_db["fit_settings"]:
+        bs = sizes.get(fs["bike_id"])
+        if fs["user_id"] != user_id or bs is None or bs["bike_model_id"] not in models:
+            continue
+        rows.append({**fs, "model": models[bs["bike_model_id"]]["model"], "size": bs["size"]})
+    yield from sorted(rows, key=lambda r: (r["model"], r["size"], r["name"]))
+
+
 def delete_fit(user_id, fit_name, size_id):
     try:
         _mock_db["fit_settings"] = [
@@ -240,3 +447,30 @@ def delete_fit(user_id, fit_name, size_id):
     except Exception as e:
         logger.error(f"delete_fit: {e}", exc_info=True)
         return {"success": False, "error": "Не удалось удалить посадку"}
+
+
+def create_parse_job(job_id, user_id, url, ttl):
+    expired = datetime.now() - timedelta(seconds=ttl)
+    _mock_db["parse_jobs"] = [j for j in _mock_db["parse_jobs"] if j["created_at"] >= expired]
+    _mock_db["parse_jobs"].append({
+        "id": job_id, "user_id": user_id, "url": url, "status": "pending",
+        "result": None, "error": None, "created_at": datetime.now(),
+    })
+    return True
+
+
+def finish_parse_job(job_id, status, result=None, error=None):
+    job = next((j for j in _mock_db["parse_jobs"] if j["id"] == job_id), None)
+    if job is not None:
+        job.update(status=status, result=copy.deepcopy(result), error=error)
+    return True
+
+
+def get_parse_job(job_id, user_id, ttl):
+    expired = datetime.now() - timedelta(seconds=ttl)
+    job = next(
+        (j for j in _mock_db["parse_jobs"]
+         if j["id"] == job_id and j["user_id"] == user_id and j["created_at"] >= expired),
+        None,
+    )
+    return None if job is None else {k: copy.deepcopy(job[k]) for k in ("id", "status", "result", "error")}
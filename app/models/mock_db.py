@@ -1,5 +1,6 @@
 # Mock database implementation for testing
 # This replaces the PostgreSQL connection pool with in-memory data structures
+from contextlib import contextmanager
 
 class MockConnection:
     """Mock connection object that mimics psycopg connection behavior"""
@@ -20,6 +21,10 @@ class MockConnection:
         """Mock commit - does nothing since we're using in-memory storage"""
         pass
 
+    def rollback(self):
+        """Mock rollback - does nothing since we're using in-memory storage"""
+        pass
+
 
 class MockCursor:
     """Mock cursor object that mimics psycopg cursor behavior"""
@@ -52,3 +57,9 @@ class MockCursor:
 def get_conn():
     """Returns a mock connection instead of a real database connection"""
     return MockConnection()
+
+
+@contextmanager
+def shared_connection():
+    """Mirrors db.shared_connection: yields one mock connection for the block"""
+    yield MockConnection()
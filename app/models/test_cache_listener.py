@@ -0,0 +1,83 @@
+import json
+import types
+
+from app.models import cache_listener
+
+
+def _event(table, **fields):
+    return json.dumps({"table": table, **fields})
+
+
+class TestHandleEvents:
+    def _record(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(cache_listener.catalog, "model_changed", lambda i: calls.append(("model", i)))
+        monkeypatch.setattr(cache_listener.catalog, "invalidate", lambda: calls.append(("all",)))
+        return calls
+
+    def test_models_deduplicated(self, monkeypatch):
+        calls = self._record(monkeypatch)
+        cache_listener.handle_events([
+            _event("bike_sizes", bike_model_id=3),
+            _event("bike_sizes", bike_model_id=3),
+            _event("bike_models", bike_model_id=5),
+            _event("anthropometry", user_id=1),
+            "not json",
+        ])
+        assert sorted(calls) == [("model", 3), ("model", 5)]
+
+    def test_large_batch_invalidates_everything(self, monkeypatch):
+        calls = self._record(monkeypatch)
+        limit = cache_listener.FULL_INVALIDATION_THRESHOLD
+        cache_listener.handle_events([_event("bike_sizes", bike_model_id=i) for i in range(limit + 1)])
+        assert calls == [("all",)]
+
+
+class _FakeConnection:
+    def __init__(self, batches, listener):
+        self.batches = list(batches)
+        self.listener = listener
+        self.executed = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query):
+        self.executed.append(query)
+
+    def notifies(self, timeout=None):
+        if not self.batches:
+            self.listener._stop.set()
+            return iter(())
+        return iter(types.SimpleNamespace(payload=p) for p in self.batches.pop(0))
+
+
+class TestCacheListener:
+    def test_reconnects_and_applies_notifications(self, monkeypatch):
+        listener = cache_listener.CacheListener(conninfo="postgresql://test")
+        connections = []
+        attempts = []
+
+        def connect(conninfo, autocommit):
+            attempts.append(conninfo)
+            if len(attempts) == 1:
+                raise OSError("connection refused")
+            conn = _FakeConnection([[_event("bike_sizes", bike_model_id=7)]], listener)
+            connections.append(conn)
+            return conn
+
+        events = []
+        monkeypatch.setattr(cache_listener.psycopg, "connect", connect, raising=False)
+        monkeypatch.setattr(cache_listener, "RECONNECT_DELAY_MIN", 0.01)
+        monkeypatch.setattr(cache_listener.catalog, "invalidate", lambda: events.append("all"))
+        monkeypatch.setattr(cache_listener.catalog, "model_changed", lambda i: events.append(i))
+
+        listener.start()
+        listener._thread.join(5)
+        assert not listener._thread.is_alive()
+        assert len(attempts) == 2
+        assert connections[0].executed == ["LISTEN bikefit_cache"]
+        assert events == ["all", 7]
@@ -0,0 +1,237 @@
+import random
+
+import pytest
+
+from app.models import catalog
+
+
+def _row(size_id, model_id, stack, reach, seat_angle=73.0, head_angle=72.0, status="public", owner_id=1):
+    return {
+        "id": size_id, "bike_model_id": model_id, "size": str(size_id),
+        "stack": stack, "reach": reach, "seatAngle": seat_angle, "headAngle": head_angle,
+        "model": f"Model {model_id}", "owner_id": owner_id, "status": status,
+    }
+
+
+class TestGeometryMatrix:
+    def test_database_error_not_cached(self, monkeypatch):
+        matrix = catalog.GeometryMatrix()
+        monkeypatch.setattr(catalog.dao, "get_catalog_geometries", lambda: None)
+        assert matrix.snapshot() is None
+        monkeypatch.setattr(catalog.dao, "get_catalog_geometries", lambda: [_row(1, 1, 560, 390)])
+        assert matrix.snapshot()["size_id"].tolist() == [1]
+
+    def test_rows_read_before_invalidation_not_stored(self, monkeypatch):
+        matrix = catalog.GeometryMatrix()
+        rows = [_row(1, 1, 560, 390)]
+
+        def fake():
+            loaded = list(rows)
+            rows.append(_row(2, 2, 570, 395))
+            matrix.invalidate()
+            return loaded
+
+        monkeypatch.setattr(catalog.dao, "get_catalog_geometries", fake)
+        assert matrix.snapshot()["size_id"].tolist() == [1]
+        monkeypatch.setattr(catalog.dao, "get_catalog_geometries", lambda: list(rows))
+        assert matrix.snapshot()["size_id"].tolist() == [1, 2]
+
+
+class TestSimilarityIndex:
+    def setup_method(self):
+        self.rows = []
+        self.index = catalog.SimilarityIndex()
+
+    def _load(self, monkeypatch):
+        def fake(bike_model_id=None):
+            return [r for r in self.rows if bike_model_id is None or r["bike_model_id"] == bike_model_id]
+        monkeypatch.setattr(catalog.dao, "get_catalog_geometries", fake)
+
+    def test_nearest_matches_brute_force(self, monkeypatch):
+        rng = random.Random(7)
+        self.rows = [
+            _row(i, i // 5, rng.uniform(480, 680), rng.uniform(340, 460),
+                 rng.uniform(70, 76), rng.uniform(68, 74))
+            for i in range(1, 600)
+        ]
+        self._load(monkeypatch)
+        origin = self.rows[42]
+        result = self.index.nearest(origin["id"], 8, lambda m: True)
+
+        vec = lambda r: (r["stack"], r["reach"], r["seatAngle"], r["headAngle"])
+        expected = sorted(
+            (self.index._distance(vec(origin), vec(r)), r["id"]) for r in self.rows if r["id"] != origin["id"]
+        )[:8]
+        assert [item["size_id"] for item in result] == [size_id for _, size_id in expected]
+        assert result[0]["distance"] == pytest.approx(expected[0][0])
+
+    def test_visibility_filter_and_incremental_updates(self, monkeypatch):
+        self.rows = [
+            _row(1, 1, 560, 390),
+            _row(2, 2, 562, 391, status="private", owner_id=2),
+            _row(3, 3, 600, 420),
+        ]
+        self._load(monkeypatch)
+        public_only = lambda m: m["status"] == "public"
+        assert [r["size_id"] for r in self.index.nearest(1, 5, public_only)] == [3]
+
+        self.index.set_model_status(2, "public")
+        assert [r["size_id"] for r in self.index.nearest(1, 5, public_only)] == [2, 3]
+
+        self.rows.append(_row(4, 3, 561, 390))
+        self.index.refresh_model(3)
+        assert [r["size_id"] for r in self.index.nearest(1, 5, public_only)] == [4, 2, 3]
+
+        self.index.remove_model(3)
+        assert [r["size_id"] for r in self.index.nearest(1, 5, public_only)] == [2]
+
+    def test_database_error_not_marked_loaded(self, monkeypatch):
+        monkeypatch.setattr(catalog.dao, "get_catalog_geometries", lambda bike_model_id=None: None)
+        assert self.index.ready() is False
+        assert self.index.get(1) is None
+
+        self.rows = [_row(1, 1, 560, 390), _row(2, 2, 562, 391)]
+        self._load(monkeypatch)
+        assert self.index.ready() is True
+        assert [r["size_id"] for r in self.index.nearest(1, 5, lambda m: True)] == [2]
+
+    def test_failed_refresh_reloads_index(self, monkeypatch):
+        self.rows = [_row(1, 1, 560, 390)]
+        self._load(monkeypatch)
+        assert self.index.ready()
+        monkeypatch.setattr(catalog.dao, "get_catalog_geometries", lambda bike_model_id=None: None)
+        self.index.refresh_model(2)
+        self.rows.append(_row(2, 2, 562, 391))
+        self._load(monkeypatch)
+        assert [r["size_id"] for r in self.index.nearest(1, 5, lambda m: True)] == [2]
+
+    def test_sizes_without_stack_are_not_indexed(self, monkeypatch):
+        self.rows = [_row(1, 1, 560, 390), {**_row(2, 1, 560, 390), "stack": None}]
+        self._load(monkeypatch)
+        assert self.index.get(2) is None
+        assert self.index.nearest(1, 3, lambda m: True) == []
+
+
+class TestGeometryCache:
+    def setup_method(self):
+        self.calls = []
+        self.cache = catalog.GeometryCache(maxsize=2, ttl=None)
+
+    def _load(self, monkeypatch, on_read=None):
+        def fake(size_id):
+            self.calls.append(size_id)
+            if on_read:
+                on_read()
+            if size_id > 100:
+                return None
+            return {"geometry": {"id": size_id, "bike_model_id": size_id // 10},
+                    "model_status": "public", "model_owner_id": 1}
+        monkeypatch.setattr(catalog.dao, "get_bike_geometry_with_model", fake)
+
+    def test_hits_and_misses(self, monkeypatch):
+        self._load(monkeypatch)
+        self.cache.get(11)
+        self.cache.get(11)
+        self.cache.get(12)
+        self.cache.get(31)
+        self.cache.get(11)
+        assert self.calls == [11, 12, 31, 11]
+        stats = self.cache.stats()
+        assert (stats["hits"], stats["misses"], stats["size"]) == (1, 4, 2)
+
+    def test_missing_size_not_cached(self, monkeypatch):
+        self._load(monkeypatch)
+        assert self.cache.get(500) is None
+        assert self.cache.get(500) is None
+        assert self.calls == [500, 500]
+
+    def test_invalidate_model_drops_only_its_sizes(self, monkeypatch):
+        self.cache = catalog.GeometryCache(maxsize=10, ttl=None)
+        self._load(monkeypatch)
+        for size_id in (11, 12, 21):
+            self.cache.get(size_id)
+        self.cache.invalidate_model(1)
+        for size_id in (11, 12, 21):
+            self.cache.get(size_id)
+        assert self.calls == [11, 12, 21, 11, 12]
+
+    def test_row_read_before_invalidation_not_stored(self, monkeypatch):
+        self._load(monkeypatch, on_read=lambda: self.cache.invalidate_model(1))
+        self.cache.get(11)
+        assert self.cache.stats()["size"] == 0
+
+
+class TestPublicCatalog:
+    def _load(self, monkeypatch, models):
+        calls = []
+
+        def public():
+            calls.append("public")
+            return [m for m in models if m["status"] == "public"]
+
+        monkeypatch.setattr(catalog.dao, "get_public_bike_models", public)
+        monkeypatch.setattr(catalog.dao, "get_user_bike_models",
+                            lambda user_id: [m for m in models if m["user_id"] == user_id])
+        return calls
+
+    def test_merges_own_models_in_order(self, monkeypatch):
+        models = [
+            {"id": 1, "user_id": 1, "model": "Trek", "status": "public", "version": 1},
+            {"id": 2, "user_id": 1, "model": "cannondale", "status": "public", "version": 1},
+            {"id": 3, "user_id": 2, "model": "Giant", "status": "private", "version": 1},
+            {"id": 4, "user_id": 2, "model": "Zeta", "status": "pending", "version": 1},
+            {"id": 5, "user_id": 2, "model": "Argon", "status": "public", "version": 1},
+            {"id": 6, "user_id": 3, "model": "Bianchi", "status": "private", "version": 1},
+        ]
+        calls = self._load(monkeypatch, models)
+        public_catalog = catalog.PublicCatalog()
+
+        assert [m["id"] for m in public_catalog.visible_to(2)] == [5, 2, 3, 1, 4]
+        assert [m["id"] for m in public_catalog.visible_to(None)] == [5, 2, 1]
+        assert calls == ["public"]
+
+        models[5]["status"] = "public"
+        public_catalog.invalidate()
+        assert [m["id"] for m in public_catalog.visible_to(1)] == [5, 6, 2, 1]
+        assert calls == ["public", "public"]
+
+    def test_version_tracks_public_models(self, monkeypatch):
+        models = [
+            {"id": 1, "user_id": 1, "model": "Trek", "status": "public", "version": 1},
+            {"id": 2, "user_id": 1, "model": "Giant", "status": "private", "version": 1},
+        ]
+        self._load(monkeypatch, models)
+        public_catalog = catalog.PublicCatalog()
+        version = public_catalog.version()
+
+        models[1]["version"] = 2
+        public_catalog.invalidate()
+        assert public_catalog.version() == version
+
+        models[0]["version"] = 2
+        public_catalog.invalidate()
+        assert public_catalog.version() != version
+
+    def test_database_error_not_cached(self, monkeypatch):
+        monkeypatch.setattr(catalog.dao, "get_public_bike_models", lambda: None)
+        public_catalog = catalog.PublicCatalog()
+        assert public_catalog.models() == []
+        assert public_catalog.version() is None
+        monkeypatch.setattr(catalog.dao, "get_public_bike_models",
+                            lambda: [{"id": 1, "user_id": 1, "model": "Trek", "status": "public", "version": 1}])
+        assert [m["id"] for m in public_catalog.models()] == [1]
+
+    def test_models_read_before_invalidation_not_stored(self, monkeypatch):
+        public_catalog = catalog.PublicCatalog()
+        models = [{"id": 1, "user_id": 1, "model": "Trek", "status": "public", "version": 1}]
+
+        def public():
+            loaded = [dict(m) for m in models]
+            models[0]["version"] = 2
+            public_catalog.invalidate()
+            return loaded
+
+        monkeypatch.setattr(catalog.dao, "get_public_bike_models", public)
+        stale = public_catalog.version()
+        monkeypatch.setattr(catalog.dao, "get_public_bike_models", lambda: [dict(m) for m in models])
+        assert public_catalog.version() != stale
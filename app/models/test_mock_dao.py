@@ -243,3 +243,62 @@ class TestMockDaoUnit:
         self.dao.set_bike_visibility(models[0]["id"], True)
         visible = self.dao.get_visible_bike_models(u2["id"])
         assert len(visible) == 1
+
+    def test_get_public_bike_models(self):
+        self.dao.create_user_account("u1", "p")
+        u1 = self.dao.get_user_by_username("u1")
+        self.dao.add_user_bike(u1["id"], {**VALID_BIKE})
+        self.dao.add_user_bike(u1["id"], {**VALID_BIKE, "model": "Giant TCR"})
+        models = self.dao.get_user_bike_models(u1["id"])
+        self.dao.set_bike_visibility(models[0]["id"], True)
+        assert [m["id"] for m in self.dao.get_public_bike_models()] == [models[0]["id"]]
+
+    def test_search_bike_models(self):
+        self.dao.create_user_account("u1", "p")
+        self.dao.create_user_account("u2", "p")
+        u1 = self.dao.get_user_by_username("u1")
+        u2 = self.dao.get_user_by_username("u2")
+        public_id = self.dao.add_user_bike(u1["id"], {**VALID_BIKE, "model": "Specialized Tarmac SL7"})["bike_model_id"]
+        self.dao.set_bike_visibility(public_id, True)
+        self.dao.add_user_bike(u1["id"], {**VALID_BIKE, "model": "Private Tarmac"})
+        self.dao.add_user_bike(u1["id"], {**VALID_BIKE, "model": "Giant TCR"})
+
+        assert [m["id"] for m in self.dao.search_bike_models(u2["id"], "tarmac sl7")] == [public_id]
+        assert [m["model"] for m in self.dao.search_bike_models(u2["id"], "Tarmak")] == ["Specialized Tarmac SL7"]
+        found = self.dao.search_bike_models(u1["id"], "tarmac sl7")
+        assert found[0]["id"] == public_id and found[0]["score"] == 1.0
+        assert {m["model"] for m in self.dao.search_bike_models(u1["id"], "tarmac")} == {
+            "Specialized Tarmac SL7", "Private Tarmac",
+        }
+        assert self.dao.search_bike_models(u1["id"], "tarmac", limit=1)[0]["model"] == "Private Tarmac"
+        assert self.dao.search_bike_models(u1["id"], "canyon") == []
+
+    def test_get_bike_geometry_with_model(self):
+        self.dao.create_user_account("u", "p")
+        user = self.dao.get_user_by_username("u")
+        self.dao.add_user_bike(user["id"], {**VALID_BIKE})
+        entry = self.dao.get_bike_geometry_with_model(1)
+        assert entry["geometry"]["size"] == VALID_BIKE["size"]
+        assert entry["model_status"] == "private"
+        assert entry["model_owner_id"] == user["id"]
+        assert self.dao.get_bike_geometry_with_model(999) is None
+
+    def test_add_user_bike_models(self):
+        self.dao.create_user_account("u", "p")
+        user = self.dao.get_user_by_username("u")
+        result = self.dao.add_user_bike_models(user["id"], {
+            "Model": [{**VALID_BIKE, "size": "52"}, {**VALID_BIKE, "size": "56"}],
+            "Other": [{**VALID_BIKE, "size": "54"}],
+        })
+        assert result["success"] is True
+        model_id, other_id = result["bike_model_ids"]
+        assert {s["size"] for s in self.dao.get_bike_sizes(model_id)} == {"52", "56"}
+        assert {s["size"] for s in self.dao.get_bike_sizes(other_id)} == {"54"}
+
+    def test_add_user_bike_models_requires_size(self):
+        result = self.dao.add_user_bike_models(1, {
+            "Model": [{**VALID_BIKE, "size": "52"}],
+            "Other": [{**VALID_BIKE, "size": ""}],
+        })
+        assert result["success"] is False
+        assert self.dao.get_user_bike_models(1) == []
@@ -0,0 +1,106 @@
+from flask import Blueprint, current_app, jsonify, request, session
+from flask.ctx import RequestContext
+from werkzeug.exceptions import HTTPException
+from werkzeug.test import EnvironBuilder
+
+from app.models.db import shared_connection
+from app.utils.error_handler import handle_errors, validate_request_data, ValidationError
+
+batch_bp = Blueprint("batch", __name__)
+
+BATCH_MAX_ITEMS = 20
+
+# Маршруты только для чтения, которые можно вызывать внутри /batch
+BATCH_ENDPOINTS = {
+    "bikes.list_visible_bikes",
+    "bikes.list_user_bikes",
+    "bikes.search_bikes",
+    "bikes.get_bike_sizes",
+    "bikes.get_bike_size_id",
+    "bikes.get_bike_geometry",
+    "bikes.get_similar_sizes",
+    "fits.get_fit",
+    "fits.list_user_fits",
+    "fits.get_basic_fit",
+    "fits.get_fit_bootstrap",
+    "fits.compare_fits",
+    "fits.recommend_sizes",
+    "fits.search_sizes",
+    "fits.get_latest_user_anthropometry",
+}
+
+# Заголовки исходного запроса, которые получает каждый подзапрос. Cookie не
+# передаётся: подзапросы получают уже загруженную сессию пакета
+_FORWARDED_HEADERS = ("Accept-Language", "User-Agent")
+
+
+def _validate_items(items):
+    if not isinstance(items, list) or not items:
+        raise ValidationError([{"field": "requests", "message": "Укажите список запросов"}])
+    if len(items) > BATCH_MAX_ITEMS:
+        raise ValidationError([{"field": "requests", "message": f"Не больше {BATCH_MAX_ITEMS} запросов в пакете"}])
+    errors = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get("path"), str) or not item["path"].startswith("/"):
+            errors.append({"field": f"requests[{i}].path", "message": "Путь запроса должен начинаться с /"})
+        elif not isinstance(item.get("method", "GET"), str):
+            errors.append({"field": f"requests[{i}].method", "message": "Некорректный метод запроса"})
+    if errors:
+        raise ValidationError(errors)
+
+
+def _error(status, message):
+    return {"status": status, "body": {"success": False, "error": message}}
+
+
+def _dispatch(item):
+    method = item.get("method", "GET").upper()
+    path, _, query_string = item["path"].partition("?")
+    try:
+        endpoint, _ = current_app.url_map.bind("").match(path, method)
+    except HTTPException:
+        endpoint = None
+    if endpoint not in BATCH_ENDPOINTS:
+        return _error(404, "Маршрут недоступен в пакетном запросе")
+
+    builder = EnvironBuilder(
+        path=path,
+        method=method,
+        query_string=query_string,
+        json=item.get("body") if method != "GET" else None,
+        headers={
+            "Accept": "application/json",
+            **{h: request.headers[h] for h in _FORWARDED_HEADERS if h in request.headers},
+        },
+        environ_base={"REMOTE_ADDR": request.remote_addr},
+    )
+    # Сессия пакета уже загружена: push() не открывает её повторно, если она
+    # передана в контекст
+    ctx = RequestContext(
+        current_app._get_current_object(), builder.get_environ(), session=session._get_current_object()
+    )
+    try:
+        with ctx:
+            response = current_app.full_dispatch_request()
+    except Exception:
+        current_app.logger.exception("Ошибка подзапроса %s %s", method, path)
+        return _error(500, "Произошла внутренняя ошибка сервера")
+    return {"status": response.status_code, "body": response.get_json(silent=True)}
+
+
+@batch_bp.route("/batch", methods=["POST"])
+@handle_errors
+def batch():
+    """Несколько запросов на чтение одним HTTP-запросом.
+
+    Подзапросы выполняются по порядку через обычные маршруты (с их
+    проверками доступа) на одном соединении с БД; статус каждого
+    возвращается в его элементе results."""
+    data = request.json
+    validate_request_data(data, ["requests"])
+    items = data["requests"]
+    _validate_items(items)
+
+    with shared_connection():
+        results = [_dispatch(item) for item in items]
+    return jsonify({"success": True, "results": results})
@@ -1,12 +1,10 @@
-from flask import Blueprint, request, jsonify, session
-from app.services import bike_service
-from app.models import dao
+from flask import Blueprint, Response, request, jsonify, session, stream_with_context
+from app.services import bike_service, bikeinsights_service
 from app.utils.decorators import role_required, auth_required
-from app.utils.error_handler import handle_errors, validate_request_data
-from app.utils.bikeinsights_parser import parse_bikeinsights_html
-import urllib.request
-import urllib.error
-import urllib.parse
+from app.utils.error_handler import handle_errors, validate_request_data, ValidationError
+from app.utils.catalog_io import EXPORT_FORMATS
+from app.utils.conditional import conditional_json, is_revalidation, make_etag
+from app.utils.response_formats import render
 
 bikes_bp = Blueprint("bikes", __name__, url_prefix="/bikes")
 
@@ -21,11 +19,53 @@ def add_bike():
     return jsonify(bike_service.add_user_bike(user_id, data))
 
 
+@bikes_bp.route("/import", methods=["POST"])
+@auth_required
+@handle_errors
+def import_bikes():
+    user_id = session.get("user_id")
+    upload = request.files.get("file")
+    if upload is None:
+        raise ValidationError([{"field": "file", "message": "Файл для импорта не передан"}])
+    fmt = request.form.get("format") or request.args.get("format")
+    if not fmt and upload.filename:
+        fmt = upload.filename.rsplit(".", 1)[-1].lower()
+    if fmt == "ndjson":
+        fmt = "jsonl"
+    return jsonify(bike_service.import_bikes(user_id, upload.stream, fmt))
+
+
+@bikes_bp.route("/export", methods=["GET"])
+@auth_required
+@handle_errors
+def export_catalog():
+    user_id = session.get("user_id")
+    fmt = request.args.get("format", "ndjson")
+    chunks = bike_service.export_catalog(user_id, fmt)
+    return Response(
+        stream_with_context(chunks),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f"attachment; filename=catalog.{fmt}"},
+    )
+
+
 @bikes_bp.route("/list", methods=["GET"])
 @handle_errors
 def list_visible_bikes():
     user_id = session.get("user_id")
-    return jsonify(bike_service.get_visible_bike_models(user_id))
+    own = bike_service.get_own_bike_models(user_id)
+    version = bike_service.get_visible_bike_models_version(user_id, own)
+    return conditional_json(
+        make_etag("list", version, request.query_string) if version else None,
+        lambda: bike_service.get_visible_bike_models(user_id, request.args, own),
+    )
+
+
+@bikes_bp.route("/search", methods=["GET"])
+@handle_errors
+def search_bikes():
+    user_id = session.get("user_id")
+    return render(bike_service.search_bike_models(user_id, request.args))
 
 
 @bikes_bp.route("/user_bikes", methods=["GET"])
@@ -33,25 +73,38 @@ def list_visible_bikes():
 @handle_errors
 def list_user_bikes():
     user_id = session.get("user_id")
-    return jsonify(bike_service.get_user_bike_models(user_id))
+    return render(bike_service.get_user_bike_models(user_id, request.args))
+
 
+def _request_params():
+    # GET-варианты читают параметры из строки запроса, чтобы ответы
+    # можно было кэшировать и перепроверять по ETag
+    return request.args if request.method == "GET" else request.json
 
-@bikes_bp.route("/sizes", methods=["POST"])
+
+def _int_param(data, field):
+    try:
+        return int(data[field])
+    except (TypeError, ValueError):
+        raise ValidationError([{"field": field, "message": f"Поле {field} должно быть целым числом"}])
+
+
+@bikes_bp.route("/sizes", methods=["GET", "POST"])
 @auth_required
 @handle_errors
 def get_bike_sizes():
     user_id = session.get("user_id")
     role = session.get("user_role")
-    data = request.json
+    data = _request_params()
     validate_request_data(data, ["bike_model_id"])
 
-    bike_model_id = data.get("bike_model_id")
-    if role != "moderator":
-        accessible = any(bm["id"] == bike_model_id for bm in dao.get_visible_bike_models(user_id))
-        if not accessible:
-            return jsonify({"success": False, "error": "Модель велосипеда не найдена или недоступна"}), 404
-
-    return jsonify(bike_service.get_bike_sizes(bike_model_id))
+    bike_model_id = _int_param(data, "bike_model_id")
+    version, is_public = bike_service.get_bike_sizes_version(bike_model_id, user_id, role)
+    return conditional_json(
+        make_etag("sizes", bike_model_id, version),
+        lambda: bike_service.get_bike_sizes(bike_model_id),
+        public=is_public,
+    )
 
 
 @bikes_bp.route("/id", methods=["POST"])
@@ -62,33 +115,52 @@ def get_bike_size_id():
     return jsonify(bike_service.get_bike_size_id(data.get("bike_model"), data.get("size")))
 
 
-@bikes_bp.route("/geometry", methods=["POST"])
+@bikes_bp.route("/geometry", methods=["GET", "POST"])
 @auth_required
 @handle_errors
 def get_bike_geometry():
     user_id = session.get("user_id")
     role = session.get("user_role")
-    data = request.json
+    data = _request_params()
     validate_request_data(data, ["size_id"])
 
-    size_id = data.get("size_id")
-    size_row = dao.get_bike_geometry(size_id)
-    if size_row is None:
-        return jsonify({"success": False, "error": "Размер велосипеда не найден"}), 404
+    size_id = _int_param(data, "size_id")
+    if is_revalidation():
+        # Сначала дешёвая проверка версии: при совпадении строка размера не читается
+        version, is_public = bike_service.get_bike_geometry_version(size_id, user_id, role)
+        build = lambda: bike_service.get_accessible_bike_geometry(size_id, user_id, role)
+    else:
+        result, version, is_public = bike_service.get_versioned_bike_geometry(size_id, user_id, role)
+        build = lambda: result
+    return conditional_json(make_etag("geometry", size_id, version), build, public=is_public)
 
-    if role != "moderator":
-        accessible = any(bm["id"] == size_row.get("bike_model_id") for bm in dao.get_visible_bike_models(user_id))
-        if not accessible:
-            return jsonify({"success": False, "error": "Доступ к данному велосипеду запрещён"}), 403
 
-    return jsonify(bike_service.get_bike_geometry(size_id))
+@bikes_bp.route("/similar", methods=["POST"])
+@auth_required
+@handle_errors
+def get_similar_sizes():
+    user_id = session.get("user_id")
+    role = session.get("user_role")
+    data = request.json
+    validate_request_data(data, ["size_id"])
+    return jsonify(bike_service.get_similar_sizes(data.get("size_id"), user_id, role, data.get("k")))
 
 
 @bikes_bp.route("/pending", methods=["GET"])
 @role_required("moderator")
 @handle_errors
 def get_pending_bikes():
-    return jsonify(bike_service.get_pending_bikes())
+    return render(bike_service.get_pending_bikes(request.args))
+
+
+@bikes_bp.route("/cache_stats", methods=["GET"])
+@role_required("moderator")
+@handle_errors
+def get_cache_stats():
+    return jsonify({"success": True, "data": {
+        "geometry": bike_service.get_geometry_cache_stats(),
+        "bikeinsights": bikeinsights_service.cache_stats(),
+    }})
 
 
 @bikes_bp.route("/set_visibility", methods=["PATCH"])
@@ -128,30 +200,29 @@ def parse_bike_url():
     validate_request_data(data, ["url"])
 
     url = data.get("url", "").strip()
-    if not url:
-        return jsonify({"error": "URL не указан"}), 400
+    bikeinsights_service.ensure_supported_url(url)
+    if data.get("async"):
+        return jsonify(bikeinsights_service.submit_parse_job(session.get("user_id"), url)), 202
+    return jsonify(bikeinsights_service.parse_bike_url(url))
 
-    try:
-        parsed = urllib.parse.urlparse(url)
-    except Exception:
-        return jsonify({"error": "Некорректный URL"}), 400
 
-    hostname = parsed.hostname or ""
-    if hostname != "bikeinsights.com" and not hostname.endswith(".bikeinsights.com"):
-        return jsonify({"error": "Поддерживаются только ссылки с bikeinsights.com"}), 400
+@bikes_bp.route("/parse_urls", methods=["POST"])
+@auth_required
+@handle_errors
+def parse_bike_urls():
+    data = request.json
+    validate_request_data(data, ["urls"])
+    return jsonify(bikeinsights_service.import_urls(
+        session.get("user_id"), data.get("urls"), save=bool(data.get("save")),
+    ))
 
-    try:
-        req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0 (compatible; Bikefit/1.0)"})
-        with urllib.request.urlopen(req, timeout=10) as resp:
-            html = resp.read().decode("utf-8", errors="replace")
-    except urllib.error.HTTPError as e:
-        return jsonify({"error": f"Страница недоступна (HTTP {e.code})"}), 502
-    except urllib.error.URLError as e:
-        return jsonify({"error": f"Не удалось загрузить страницу: {e.reason}"}), 502
-    except Exception as e:
-        return jsonify({"error": f"Ошибка при загрузке страницы: {str(e)}"}), 502
 
+@bikes_bp.route("/parse_url/<job_id>", methods=["GET"])
+@auth_required
+@handle_errors
+def get_parse_job(job_id):
     try:
-        return jsonify(parse_bikeinsights_html(html))
-    except ValueError as e:
-        return jsonify({"error": str(e)}), 422
+        wait_seconds = float(request.args.get("wait", 0))
+    except ValueError:
+        raise ValidationError([{"field": "wait", "message": "wait должен быть числом"}])
+    return jsonify(bikeinsights_service.get_parse_job(session.get("user_id"), job_id, wait_seconds))
@@ -1,7 +1,8 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, Response, request, jsonify, session, stream_with_context
 from app.services import fit_service
 from app.utils.decorators import auth_required
 from app.utils.error_handler import handle_errors, validate_request_data, ValidationError
+from app.utils.catalog_io import EXPORT_FORMATS
 
 fits_bp = Blueprint("fits", __name__, url_prefix="/fits")
 
@@ -61,6 +62,70 @@ def get_basic_fit():
     return jsonify({"success": True, "data": result}), 200
 
 
+@fits_bp.route("/bootstrap", methods=["GET"])
+@auth_required
+@handle_errors
+def get_fit_bootstrap():
+    user_id = session.get("user_id")
+    role = session.get("user_role")
+    size_id = request.args.get("size_id", type=int)
+    return jsonify(fit_service.get_fit_bootstrap(size_id, user_id, role)), 200
+
+
+@fits_bp.route("/compare", methods=["POST"])
+@auth_required
+@handle_errors
+def compare_fits():
+    user_id = session.get("user_id")
+    role = session.get("user_role")
+    data = request.json
+    validate_request_data(data, ["items"])
+    return jsonify(fit_service.compare_fits(user_id, data, role)), 200
+
+
+@fits_bp.route("/recommend", methods=["POST"])
+@auth_required
+@handle_errors
+def recommend_sizes():
+    user_id = session.get("user_id")
+    role = session.get("user_role")
+    data = request.json
+    validate_request_data(data, ["bike_model_id"])
+    result = fit_service.recommend_sizes(data.get("bike_model_id"), user_id, role)
+    if result.get("success"):
+        return jsonify(result), 200
+    if "errors" in result:
+        raise ValidationError(result["errors"])
+    return jsonify(result), 400
+
+
+@fits_bp.route("/search", methods=["GET"])
+@auth_required
+@handle_errors
+def search_sizes():
+    user_id = session.get("user_id")
+    result = fit_service.search_sizes(user_id, request.args)
+    if result.get("success"):
+        return jsonify(result), 200
+    if "errors" in result:
+        raise ValidationError(result["errors"])
+    return jsonify(result), 400
+
+
+@fits_bp.route("/export", methods=["GET"])
+@auth_required
+@handle_errors
+def export_user_fits():
+    user_id = session.get("user_id")
+    fmt = request.args.get("format", "ndjson")
+    chunks = fit_service.export_user_fits(user_id, fmt)
+    return Response(
+        stream_with_context(chunks),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f"attachment; filename=fits.{fmt}"},
+    )
+
+
 @fits_bp.route("/add_anthropometry", methods=["POST"])
 @auth_required
 @handle_errors
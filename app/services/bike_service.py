@@ -1,6 +1,24 @@
-from app.models import dao
-from app.validators.bike_validator import validate_bike_data
-from app.utils.error_handler import ValidationError
+from datetime import datetime
+
+from app.models import dao, catalog
+from app.validators.bike_validator import OPTIONAL_DEFAULTS, validate_bike_data, validate_bike_row, validate_list_params, validate_search_params
+from app.utils.pagination import keyset_page
+from app.utils.catalog_io import iter_rows, serialize_rows, IMPORT_FORMATS, EXPORT_FORMATS, CATALOG_EXPORT_COLUMNS
+from app.utils.error_handler import ValidationError, NotFoundError, ForbiddenError, DatabaseError
+
+SIMILAR_DEFAULT_K = 10
+SIMILAR_MAX_K = 50
+
+# Постраничные списки моделей: без limit/cursor/q списки отдаются целиком
+LIST_DEFAULT_LIMIT = 50
+LIST_MAX_LIMIT = 200
+_LIST_PARAMS = ("limit", "cursor", "q")
+
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 50
+
+# Сколько построчных ошибок импорта возвращать клиенту (остальные только считаются)
+IMPORT_MAX_REPORTED_ERRORS = 1000
 
 
 def add_user_bike(user_id, bikes):
@@ -8,29 +26,163 @@ def add_user_bike(user_id, bikes):
     if not validation.is_valid:
         raise ValidationError(validation.errors)
 
-    last_result = {"success": False, "error": "Нет данных для сохранения"}
+    by_model = {}
     for bike in validation.data:
-        result = dao.add_user_bike(user_id, bike)
-        if not result.get("success"):
-            return result
-        last_result = result
+        by_model.setdefault(bike.get("model"), []).append(bike)
+
+    if not by_model:
+        return {"success": False, "error": "Нет данных для сохранения"}
+    result = dao.add_user_bike_models(user_id, by_model)
+    if not result.get("success"):
+        return result
+    for bike_model_id in result["bike_model_ids"]:
+        catalog.model_changed(bike_model_id)
+
+    return {"success": True, "bike_model_id": result["bike_model_ids"][-1]}
+
+
+def import_bikes(user_id, stream, fmt):
+    if fmt not in IMPORT_FORMATS:
+        raise ValidationError([{"field": "format", "message": "Поддерживаются форматы csv и jsonl"}])
+
+    errors = []
+    counters = {"rows": 0, "errors": 0}
+
+    def reject(line, row_errors):
+        counters["errors"] += 1
+        if len(errors) < IMPORT_MAX_REPORTED_ERRORS:
+            errors.append({"line": line, "errors": row_errors})
+
+    def valid_rows():
+        for line, row, parse_error in iter_rows(stream, fmt):
+            counters["rows"] += 1
+            if parse_error:
+                reject(line, [{"field": "data", "message": parse_error}])
+                continue
+            validation = validate_bike_row(row)
+            if not validation.is_valid:
+                reject(line, validation.errors)
+                continue
+            yield line, validation.data
+
+    result = dao.import_bike_sizes(user_id, valid_rows(), OPTIONAL_DEFAULTS)
+    if not result.get("success"):
+        return result
+    catalog.invalidate()
+
+    return {
+        "success": True,
+        "data": {
+            "rows": counters["rows"],
+            "imported": result["sizes"],
+            "models": result["models"],
+            "rejected": counters["errors"],
+            "errors": errors,
+        },
+    }
+
+
+def export_catalog(user_id, fmt):
+    if fmt not in EXPORT_FORMATS:
+        raise ValidationError([{"field": "format", "message": "Поддерживаются форматы ndjson и csv"}])
+    return serialize_rows(dao.iter_catalog_export(user_id), CATALOG_EXPORT_COLUMNS, fmt)
+
+
+def _list_params(params):
+    """Параметры страницы или None, если клиент запросил список целиком."""
+    if not params or not any(params.get(k) for k in _LIST_PARAMS):
+        return None
+    validation = validate_list_params(params, LIST_DEFAULT_LIMIT, LIST_MAX_LIMIT)
+    if not validation.is_valid:
+        raise ValidationError(validation.errors)
+    return validation.data
 
-    return last_result
 
+def get_user_bike_models(user_id, params=None):
+    page = _list_params(params)
+    if page is None:
+        return {"success": True, "data": dao.get_user_bike_models(user_id)}
+    rows = dao.get_user_bike_models_page(user_id, page["cursor"], page["limit"] + 1, page["q"])
+    data, next_cursor = keyset_page(iter(rows), page["limit"], lambda m: (m["model"], m["id"]))
+    return {"success": True, "data": data, "next_cursor": next_cursor}
 
-def get_user_bike_models(user_id):
-    return {"success": True, "data": dao.get_user_bike_models(user_id)}
 
+def check_geometry_access(entry, user_id, role):
+    if entry is None:
+        raise NotFoundError("Размер велосипеда не найден")
+    if role != "moderator" and entry["model_status"] != "public" and entry["model_owner_id"] != user_id:
+        raise ForbiddenError("Доступ к данному велосипеду запрещён")
 
-def get_bike_geometry(size_id):
-    result = dao.get_bike_geometry(size_id)
-    if result:
-        return {"success": True, "data": result}
-    return {"success": False, "error": "Геометрия велосипеда не найдена"}
 
+def get_accessible_bike_geometry(size_id, user_id, role=None):
+    entry = catalog.geometry_cache.get(size_id)
+    check_geometry_access(entry, user_id, role)
+    return {"success": True, "data": entry["geometry"]}
+
+
+def get_versioned_bike_geometry(size_id, user_id, role=None):
+    """Геометрия размера, версия модели и публичная ли она — одним чтением
+    кэша геометрии (или одним запросом при промахе)."""
+    entry = catalog.geometry_cache.get(size_id)
+    check_geometry_access(entry, user_id, role)
+    return {"success": True, "data": entry["geometry"]}, entry["model_version"], entry["model_status"] == "public"
+
+
+def get_bike_geometry_version(size_id, user_id, role=None):
+    """(версия модели, публичная ли она) для ETag геометрии размера.
+
+    Берётся из кэша геометрии, а без него — лёгким запросом без строки размера.
+    Нужна только для перепроверки (If-None-Match), когда тело может не понадобиться."""
+    entry = catalog.geometry_cache.peek(size_id) or dao.get_bike_size_version(size_id)
+    check_geometry_access(entry, user_id, role)
+    return entry["model_version"], entry["model_status"] == "public"
 
-def get_visible_bike_models(user_id):
-    return {"success": True, "data": dao.get_visible_bike_models(user_id)}
+
+def get_bike_sizes_version(bike_model_id, user_id, role=None):
+    """(версия модели, публичная ли она) для ETag списка размеров."""
+    model = dao.get_bike_model_version(bike_model_id)
+    if model is None or (role != "moderator" and model["status"] != "public" and model["user_id"] != user_id):
+        raise NotFoundError("Модель велосипеда не найдена или недоступна")
+    return model["version"], model["status"] == "public"
+
+
+def get_geometry_cache_stats():
+    return catalog.geometry_cache.stats()
+
+
+def get_own_bike_models(user_id):
+    """Модели пользователя для /bikes/list: читаются один раз на запрос и
+    передаются и в версию списка, и в сам список."""
+    return dao.get_user_bike_models(user_id) if user_id else []
+
+
+def get_visible_bike_models_version(user_id, own=None):
+    """Версия списка /bikes/list для пользователя; None, если каталог не загрузился."""
+    public_version = catalog.public_catalog.version()
+    if public_version is None:
+        return None
+    if own is None:
+        own = get_own_bike_models(user_id)
+    return public_version + "".join(f";{m['id']}:{m['version']}" for m in own)
+
+
+def get_visible_bike_models(user_id, params=None, own=None):
+    page = _list_params(params)
+    if page is None:
+        return {"success": True, "data": catalog.public_catalog.visible_to(user_id, own)}
+    rows = catalog.public_catalog.iter_visible(user_id, page["cursor"], page["q"], own)
+    data, next_cursor = keyset_page(rows, page["limit"], catalog.model_sort_key)
+    return {"success": True, "data": data, "next_cursor": next_cursor}
+
+
+def search_bike_models(user_id, params):
+    validation = validate_search_params(params, SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT)
+    if not validation.is_valid:
+        raise ValidationError(validation.errors)
+    return {
+        "success": True,
+        "data": dao.search_bike_models(user_id, validation.data["q"], validation.data["limit"]),
+    }
 
 
 def get_bike_sizes(bike_model_id):
@@ -44,17 +196,60 @@ def get_bike_size_id(model, size):
     return {"success": False, "error": "Размер велосипеда не найден"}
 
 
-def get_pending_bikes():
-    return {"success": True, "data": dao.get_pending_bikes()}
+def get_pending_bikes(params=None):
+    page = _list_params(params)
+    if page is None:
+        return {"success": True, "data": dao.get_pending_bikes()}
+    after = page["cursor"]
+    if after is not None:
+        try:
+            after = (datetime.fromisoformat(after[0]), after[1])
+        except ValueError:
+            raise ValidationError([{"field": "cursor", "message": "Некорректный курсор"}])
+    rows = dao.get_pending_bikes_page(after, page["limit"] + 1, page["q"])
+    data, next_cursor = keyset_page(iter(rows), page["limit"], lambda m: (m["created_at"].isoformat(), m["id"]))
+    return {"success": True, "data": data, "next_cursor": next_cursor}
 
 
 def set_bike_visibility(bike_id, is_public):
-    return dao.set_bike_visibility(bike_id, is_public)
+    result = dao.set_bike_visibility(bike_id, is_public)
+    if result.get("success"):
+        catalog.model_status_changed(bike_id, "public" if is_public else "private")
+    return result
 
 
 def delete_user_bike(user_id, bike_id):
-    return dao.delete_user_bike(user_id, bike_id)
+    result = dao.delete_user_bike(user_id, bike_id)
+    if result.get("success"):
+        catalog.model_deleted(bike_id)
+    return result
 
 
 def set_bike_pending(bike_id, user_id):
-    return dao.set_bike_pending(bike_id, user_id)
+    result = dao.set_bike_pending(bike_id, user_id)
+    if result.get("success"):
+        catalog.model_changed(bike_id)
+    return result
+
+
+def get_similar_sizes(size_id, user_id, role=None, k=None):
+    if not isinstance(size_id, int) or size_id <= 0:
+        raise ValidationError([{"field": "size_id", "message": "ID размера велосипеда должен быть положительным числом"}])
+    if k is None:
+        k = SIMILAR_DEFAULT_K
+    if not isinstance(k, int) or k <= 0:
+        raise ValidationError([{"field": "k", "message": "Количество результатов должно быть положительным числом"}])
+    k = min(k, SIMILAR_MAX_K)
+
+    def visible(model):
+        return role == "moderator" or model["status"] == "public" or model["owner_id"] == user_id
+
+    if not catalog.similarity_index.ready():
+        raise DatabaseError()
+    origin = catalog.similarity_index.get(size_id)
+    if origin is None:
+        raise NotFoundError("Размер велосипеда не найден или не содержит stack/reach")
+    if not visible(origin):
+        raise ForbiddenError("Доступ к данному велосипеду запрещён")
+
+    return {"success": True, "data": catalog.similarity_index.nearest(size_id, k, visible)}
@@ -0,0 +1,459 @@
+import copy
+import hashlib
+import http.client
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from app.utils.bikeinsights_parser import parse_bikeinsights_html, BikeinsightsStreamParser
+from app.utils.cache import LRUCache
+from app.services import bike_service
+from app.models import dao
+from app.utils.error_handler import AppError, DatabaseError, NotFoundError, UpstreamError, ValidationError
+
+logger = logging.getLogger(__name__)
+
+FETCH_TIMEOUT = 10
+USER_AGENT = "Mozilla/5.0 (compatible; Bikefit/1.0)"
+SUPPORTED_HOST = "bikeinsights.com"
+MAX_PAGE_BYTES = int(os.environ.get("BIKEINSIGHTS_MAX_PAGE_BYTES", 8 * 1024 * 1024))
+STREAM_CHUNK_BYTES = 64 * 1024
+
+# Нормализованный URL -> sha256 загруженной страницы; хэш -> результат разбора,
+# общий для одинаковых страниц под разными URL.
+CACHE_SIZE = int(os.environ.get("BIKEINSIGHTS_CACHE_SIZE", 256))
+CACHE_TTL = int(os.environ.get("BIKEINSIGHTS_CACHE_TTL", 6 * 3600))
+
+url_cache = LRUCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL)
+parse_cache = LRUCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL)
+
+# Фоновый разбор: загрузка идёт в пуле потоков, а не в воркере WSGI.
+# Состояние заданий хранится в БД (parse_jobs), поэтому опрос задания
+# работает на любом воркере; в процессе, запустившем задание, ожидание
+# идёт по его future, в остальных — опросом БД. Одновременные задания на
+# один URL в одном процессе ждут одну и ту же загрузку.
+IMPORT_WORKERS = int(os.environ.get("BIKEINSIGHTS_IMPORT_WORKERS", 4))
+JOB_TTL = 15 * 60
+JOB_MAX_WAIT = 30
+JOB_POLL_INTERVAL = 0.25
+_FINISHED = ("done", "failed")
+
+_executor = ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix="bikeinsights")
+_futures = {}
+_inflight = {}
+_jobs_lock = threading.Lock()
+
+# Пакетный импорт: общий пул потоков ограничивает число одновременных
+# загрузок, соединения с хостом переиспользуются (keep-alive).
+BATCH_MAX_URLS = 50
+BATCH_CONCURRENCY = int(os.environ.get("BIKEINSIGHTS_BATCH_CONCURRENCY", 8))
+MAX_REDIRECTS = 3
+
+_batch_executor = ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix="bikeinsights-batch")
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url):
+    """Канонический вид URL для ключа кэша: регистр схемы и хоста, порт по
+    умолчанию, лишние слэши, порядок и utm-метки query, фрагмент."""
+    parts = urllib.parse.urlsplit(url.strip())
+    scheme = (parts.scheme or "https").lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    netloc = host if port in (None, _DEFAULT_PORTS.get(scheme)) else f"{host}:{port}"
+    path = "/".join(p for p in parts.path.split("/") if p)
+    query = urllib.parse.urlencode(sorted(
+        (k, v) for k, v in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_")
+    ))
+    return urllib.parse.urlunsplit((scheme, netloc, "/" + path, query, ""))
+
+
+def ensure_supported_url(url):
+    if not url:
+        raise AppError("URL не указан", status_code=400)
+    try:
+        parts = urllib.parse.urlparse(url)
+        hostname = parts.hostname or ""
+    except ValueError:
+        raise AppError("Некорректный URL", status_code=400)
+    if parts.scheme.lower() not in _DEFAULT_PORTS:
+        raise AppError("Некорректный URL", status_code=400)
+    if hostname != SUPPORTED_HOST and not hostname.endswith("." + SUPPORTED_HOST):
+        raise AppError("Поддерживаются только ссылки с bikeinsights.com", status_code=400)
+
+
+# Ошибки, после которых запрос на переиспользованном соединении повторяется
+_CONNECTION_DROPPED = (ConnectionResetError, BrokenPipeError, ConnectionAbortedError, http.client.RemoteDisconnected)
+
+
+def _redirect_target(url, location):
+    """Адрес перенаправления; переход на другой сайт не выполняется."""
+    target = urllib.parse.urljoin(url, location)
+    try:
+        ensure_supported_url(target)
+    except AppError:
+        raise UpstreamError("Страница перенаправляет на неподдерживаемый адрес")
+    return target
+
+
+class _SupportedRedirectHandler(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        _redirect_target(req.full_url, newurl)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+_opener = urllib.request.build_opener(_SupportedRedirectHandler)
+
+
+def _open(url):
+    req = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    return _opener.open(req, timeout=FETCH_TIMEOUT)
+
+
+def _upstream_error(e):
+    if isinstance(e, AppError):
+        return e
+    if isinstance(e, urllib.error.HTTPError):
+        return UpstreamError(f"Страница недоступна (HTTP {e.code})")
+    if isinstance(e, urllib.error.URLError):
+        return UpstreamError(f"Не удалось загрузить страницу: {e.reason}")
+    return UpstreamError(f"Ошибка при загрузке страницы: {str(e)}")
+
+
+def _too_large():
+    return AppError(f"Страница слишком большая (более {MAX_PAGE_BYTES // (1024 * 1024)} МБ).", status_code=422)
+
+
+def fetch_page(url):
+    """Загрузка страницы целиком (не больше MAX_PAGE_BYTES)."""
+    try:
+        with _open(url) as resp:
+            body = resp.read(MAX_PAGE_BYTES + 1)
+    except Exception as e:
+        raise _upstream_error(e)
+    if len(body) > MAX_PAGE_BYTES:
+        raise _too_large()
+    return body
+
+
+def stream_page(url):
+    """Загрузка с разбором по частям: чтение прекращается, как только
+    парсер собрал геометрию. Хэш считается по прочитанной части."""
+    parser = BikeinsightsStreamParser(max_bytes=MAX_PAGE_BYTES)
+    digest = hashlib.sha256()
+    error = None
+    try:
+        with _open(url) as resp:
+            while not parser.done:
+                chunk = resp.read(STREAM_CHUNK_BYTES)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                try:
+                    parser.feed(chunk)
+                except ValueError as e:
+                    error = str(e)
+                    break
+    except Exception as e:
+        raise _upstream_error(e)
+
+    if error is None:
+        try:
+            outcome = (parser.close(), None)
+        except ValueError as e:
+            outcome = (None, str(e))
+    else:
+        outcome = (None, error)
+    digest = digest.hexdigest()
+    parse_cache.set(digest, outcome)
+    return digest, outcome
+
+
+class KeepAliveConnections:
+    """Простые пулы HTTP(S)-соединений по (схема, хост, порт)."""
+
+    def __init__(self, max_idle_per_host=BATCH_CONCURRENCY):
+        self.max_idle_per_host = max_idle_per_host
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _acquire(self, key):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+        scheme, host, port = key
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return cls(host, port, timeout=FETCH_TIMEOUT), False
+
+    def _release(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def _request(self, url):
+        parts = urllib.parse.urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in _DEFAULT_PORTS or not parts.hostname:
+            raise UpstreamError("Некорректный URL")
+        key = (scheme, parts.hostname, parts.port or _DEFAULT_PORTS[scheme])
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+
+        while True:
+            conn, reused = self._acquire(key)
+            try:
+                conn.request("GET", target, headers={"User-Agent": USER_AGENT})
+                resp = conn.getresponse()
+                body = resp.read(MAX_PAGE_BYTES + 1)
+            except _CONNECTION_DROPPED:
+                conn.close()
+                # Сервер мог закрыть простаивавшее соединение — повторяем на
+                # новом; таймаут не повторяем, чтобы не ждать дважды
+                if reused:
+                    continue
+                raise
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                raise
+            if len(body) > MAX_PAGE_BYTES:
+                conn.close()
+                raise _too_large()
+            if resp.will_close:
+                conn.close()
+            else:
+                self._release(key, conn)
+            return resp.status, resp.getheader("Location"), body
+
+    def get(self, url):
+        for _ in range(MAX_REDIRECTS + 1):
+            try:
+                status, location, body = self._request(url)
+            except (http.client.HTTPException, OSError) as e:
+                raise UpstreamError(f"Не удалось загрузить страницу: {e}")
+            if status in (301, 302, 303, 307, 308) and location:
+                url = _redirect_target(url, location)
+                continue
+            if status >= 400:
+                raise UpstreamError(f"Страница недоступна (HTTP {status})")
+            return body
+        raise UpstreamError("Слишком много перенаправлений")
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+connections = KeepAliveConnections()
+
+
+def parse_page(body):
+    """Разбор страницы с кэшированием по хэшу содержимого.
+    Ошибка разбора тоже кэшируется: повторно ту же страницу не разбираем."""
+    digest = hashlib.sha256(body).hexdigest()
+    outcome = parse_cache.get(digest)
+    if outcome is None:
+        try:
+            outcome = (parse_bikeinsights_html(body.decode("utf-8", errors="replace")), None)
+        except ValueError as e:
+            outcome = (None, str(e))
+        parse_cache.set(digest, outcome)
+    return digest, outcome
+
+
+def _result(outcome):
+    parsed, error = outcome
+    if error is not None:
+        raise AppError(error, status_code=422)
+    return copy.deepcopy(parsed)
+
+
+def parse_bike_url(url, fetch=None):
+    """Разбор страницы по URL. Без fetch страница читается потоково
+    (stream_page); fetch(url) -> bytes загружает её целиком."""
+    key = normalize_url(url)
+    digest = url_cache.get(key)
+    if digest is not None:
+        outcome = parse_cache.get(digest)
+        if outcome is not None:
+            return _result(outcome)
+
+    if fetch is None:
+        digest, outcome = stream_page(url)
+    else:
+        digest, outcome = parse_page(fetch(url))
+    url_cache.set(key, digest)
+    return _result(outcome)
+
+
+def _bike_rows(parsed):
+    return [
+        {"model": parsed["model"], "size": size.get("label", ""),
+         **{k: v for k, v in size.items() if k != "label"}}
+        for size in parsed["sizes"]
+    ]
+
+
+def _import_one(user_id, url, save):
+    item = {"url": url}
+    try:
+        ensure_supported_url(url)
+        parsed = parse_bike_url(url, fetch=connections.get)
+        item.update(parsed)
+        if save:
+            saved = bike_service.add_user_bike(user_id, _bike_rows(parsed))
+            if not saved.get("success"):
+                item.update(saved)
+                return item
+            item["bike_model_id"] = saved["bike_model_id"]
+    except ValidationError as e:
+        item.update({"success": False, "errors": e.errors})
+        return item
+    except AppError as e:
+        item.update({"success": False, "error": e.message})
+        return item
+    except Exception:
+        logger.exception(f"Ошибка пакетного импорта {url}")
+        item.update({"success": False, "error": "Ошибка при разборе страницы"})
+        return item
+    item["success"] = True
+    return item
+
+
+def import_urls(user_id, urls, save=False):
+    """Загрузка и разбор списка страниц параллельно (до BATCH_CONCURRENCY
+    одновременно). Повторяющиеся URL обрабатываются один раз; ошибки
+    каждого URL возвращаются в его элементе results."""
+    if not isinstance(urls, list) or not urls:
+        raise ValidationError([{"field": "urls", "message": "Укажите список ссылок"}])
+    if len(urls) > BATCH_MAX_URLS:
+        raise ValidationError([{"field": "urls", "message": f"Не больше {BATCH_MAX_URLS} ссылок за один запрос"}])
+    if not all(isinstance(u, str) and u.strip() for u in urls):
+        raise ValidationError([{"field": "urls", "message": "Каждая ссылка должна быть непустой строкой"}])
+
+    unique = {}
+    for url in urls:
+        unique.setdefault(normalize_url(url), url.strip())
+    outcomes = dict(zip(
+        unique,
+        _batch_executor.map(lambda u: _import_one(user_id, u, save), unique.values()),
+    ))
+
+    results = [dict(outcomes[normalize_url(url)], url=url.strip()) for url in urls]
+    succeeded = sum(1 for r in results if r["success"])
+    return {
+        "success": True,
+        "results": results,
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+    }
+
+
+def _forget_inflight(key, future):
+    with _jobs_lock:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+
+
+def _outcome(future):
+    """(status, result, error) завершённого или ещё идущего разбора."""
+    if not future.done():
+        return ("running" if future.running() else "pending"), None, None
+    error = future.exception()
+    if error is None:
+        return "done", copy.deepcopy(future.result()), None
+    if isinstance(error, AppError):
+        return "failed", None, error.message
+    return "failed", None, "Ошибка при разборе страницы"
+
+
+def _store_job(job_id, future):
+    error = future.exception()
+    if error is not None and not isinstance(error, AppError):
+        logger.error(f"Ошибка фонового разбора страницы: {error}", exc_info=error)
+    status, result, message = _outcome(future)
+    if not dao.finish_parse_job(job_id, status, result, message):
+        logger.error(f"Не удалось сохранить результат задания {job_id}")
+    with _jobs_lock:
+        _futures.pop(job_id, None)
+
+
+def _job_status(job_id, status, result, error):
+    response = {"success": True, "job_id": job_id, "status": status}
+    if status == "done":
+        response["result"] = result
+    elif status == "failed":
+        response["error"] = error
+    return response
+
+
+def submit_parse_job(user_id, url):
+    key = normalize_url(url)
+    job_id = uuid.uuid4().hex
+    if not dao.create_parse_job(job_id, user_id, url, JOB_TTL):
+        raise DatabaseError()
+    submitted = None
+    with _jobs_lock:
+        future = _inflight.get(key)
+        if future is None:
+            future = submitted = _executor.submit(parse_bike_url, url)
+            _inflight[key] = future
+        _futures[job_id] = future
+    # Вне блокировки: для уже завершённой задачи колбэк вызывается сразу
+    if submitted is not None:
+        submitted.add_done_callback(lambda f: _forget_inflight(key, f))
+    future.add_done_callback(lambda f: _store_job(job_id, f))
+    return _job_status(job_id, *_outcome(future))
+
+
+def get_parse_job(user_id, job_id, wait_seconds=0):
+    job = dao.get_parse_job(job_id, user_id, JOB_TTL)
+    if job is None:
+        raise NotFoundError("Задание не найдено")
+    if job["status"] in _FINISHED:
+        return _job_status(job_id, job["status"], job["result"], job["error"])
+
+    timeout = min(max(wait_seconds, 0), JOB_MAX_WAIT)
+    with _jobs_lock:
+        future = _futures.get(job_id)
+    if future is not None:
+        # Задание запущено этим процессом: его future точнее, чем запись в БД
+        if timeout > 0 and not future.done():
+            wait([future], timeout=timeout)
+        return _job_status(job_id, *_outcome(future))
+
+    deadline = time.monotonic() + timeout
+    while job["status"] not in _FINISHED and time.monotonic() < deadline:
+        time.sleep(JOB_POLL_INTERVAL)
+        job = dao.get_parse_job(job_id, user_id, JOB_TTL)
+        if job is None:
+            raise NotFoundError("Задание не найдено")
+    return _job_status(job_id, job["status"], job["result"], job["error"])
+
+
+def clear_jobs():
+    with _jobs_lock:
+        _futures.clear()
+        _inflight.clear()
+
+
+def cache_stats():
+    return {"urls": url_cache.stats(), "pages": parse_cache.stats()}
+
+
+def clear_cache():
+    url_cache.clear()
+    parse_cache.clear()
@@ -1,13 +1,32 @@
 import logging
+from decimal import Decimal
+import numpy as np
 from app.models import dao
-from app.utils.geometry_calc import basic_fit
+from app.models.catalog import geometry_matrix, geometry_cache
+from app.services import bike_service
+from app.utils.error_handler import DatabaseError, NotFoundError, ValidationError
+from app.utils.catalog_io import serialize_rows, EXPORT_FORMATS, FIT_EXPORT_COLUMNS
+from app.utils.geometry_calc import (
+    FIT_GEOMETRY_FIELDS,
+    basic_fit,
+    basic_fit_batch,
+    contact_points,
+    fit_score_batch,
+    geometry_columns,
+)
 from app.validators.fit_validator import (
     validate_anthropometry_data,
     validate_fit_settings_data,
     validate_fit_request_data,
     validate_size_id,
+    validate_bike_model_id,
+    validate_pagination,
+    validate_compare_data,
+    BASIC_FIT,
 )
 
+FIT_FIELDS = ("seatHight", "stemHight", "saddleOffset", "torsoAngle", "shifterAngle")
+
 
 def add_user_anthropometry(user_id, data):
     validation = validate_anthropometry_data(data)
@@ -75,7 +94,8 @@ def get_basic_fit(size_id, user_id):
     if not validation.is_valid:
         return {"success": False, "errors": validation.errors}
 
-    bike_geo = dao.get_bike_geometry(validation.data["size_id"])
+    entry = geometry_cache.get(validation.data["size_id"])
+    bike_geo = entry["geometry"] if entry else None
     if not bike_geo:
         return {"success": False, "errors": [{"field": "size_id", "message": "Геометрия велосипеда не найдена"}]}
 
@@ -89,6 +109,229 @@ def get_basic_fit(size_id, user_id):
     return result
 
 
+def get_fit_bootstrap(size_id, user_id, role=None):
+    """Всё для открытия холста размера одним обращением к БД: геометрия
+    (из кэша, если есть), антропометрия, сохранённые посадки и базовая посадка."""
+    validation = validate_size_id({"size_id": size_id})
+    if not validation.is_valid:
+        raise ValidationError(validation.errors)
+    size_id = validation.data["size_id"]
+
+    entry = geometry_cache.peek(size_id)
+    data = dao.get_fit_bootstrap(size_id, user_id, with_geometry=entry is None)
+    if data is None:
+        raise DatabaseError()
+    entry = entry or data["geometry"]
+    bike_service.check_geometry_access(entry, user_id, role)
+
+    fit = basic_fit(entry["geometry"], data["anthropometry"])
+    return {
+        "success": True,
+        "data": {
+            "geometry": entry["geometry"],
+            "anthropometry": data["anthropometry"],
+            "fits": data["fits"],
+            "basic_fit": None if "error" in fit else fit,
+        },
+    }
+
+
+def _anthropometry_columns(anthro):
+    return {k: float(v) for k, v in anthro.items() if isinstance(v, (int, float, Decimal))}
+
+
+def _require_anthropometry(anthro):
+    if not anthro:
+        raise ValidationError([{
+            "field": "anthropometry",
+            "message": "Антропометрические данные не найдены. "
+                       "Заполните антропометрию перед расчётом посадки.",
+        }])
+    return anthro
+
+
+def _basic_fits(geometries, anthro, source):
+    """Базовые посадки для столбцов геометрии; ValidationError, если
+    антропометрии нет или её не хватает для расчёта."""
+    _require_anthropometry(anthro)
+    try:
+        return basic_fit_batch(geometries, _anthropometry_columns(anthro))
+    except KeyError as e:
+        logger.error(f"{source}: {e}", exc_info=True)
+        raise ValidationError([{
+            "field": "anthropometry",
+            "message": "Недостаточно антропометрических данных для расчёта посадки",
+        }])
+
+
+def _finite(value):
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def _compare_geometries(size_ids, user_id, role):
+    """Записи геометрии по size_id: из кэша, остальные — одним запросом."""
+    entries = {size_id: geometry_cache.peek(size_id) for size_id in size_ids}
+    missing = [size_id for size_id, entry in entries.items() if entry is None]
+    if missing:
+        loaded = dao.get_bike_geometries_with_model(missing)
+        if loaded is None:
+            raise DatabaseError()
+        entries.update(loaded)
+    for size_id in size_ids:
+        bike_service.check_geometry_access(entries.get(size_id), user_id, role)
+    return entries
+
+
+def _compare_fits(items, geometries, user_id):
+    """Столбцы параметров посадки для items: сохранённые посадки и базовые."""
+    named = [(item["size_id"], item["fit"]) for item in items if item["fit"] != BASIC_FIT]
+    saved = {(fs["bike_id"], fs["name"]): fs for fs in dao.get_user_fits_by_names(user_id, named)}
+    for size_id, name in named:
+        if (size_id, name) not in saved:
+            raise NotFoundError(f"Посадка «{name}» не найдена")
+
+    basic = None
+    if len(named) < len(items):
+        basic = _basic_fits(geometries, get_latest_user_anthropometry(user_id), "compare_fits")
+
+    columns = {key: np.full(len(items), np.nan) for key in FIT_FIELDS}
+    for i, item in enumerate(items):
+        for key in FIT_FIELDS:
+            if item["fit"] == BASIC_FIT:
+                value = basic[key][i] if basic["valid"][i] else np.nan
+            else:
+                value = saved[(item["size_id"], item["fit"])].get(key)
+            columns[key][i] = np.nan if value is None else float(value)
+    return columns
+
+
+def compare_fits(user_id, data, role=None):
+    """Несколько посадок рядом: геометрия, параметры посадки, точки контакта
+    и разница метрик каждой посадки с первой."""
+    validation = validate_compare_data(data)
+    if not validation.is_valid:
+        raise ValidationError(validation.errors)
+    items = validation.data
+
+    size_ids = list(dict.fromkeys(item["size_id"] for item in items))
+    entries = _compare_geometries(size_ids, user_id, role)
+    rows = [entries[item["size_id"]]["geometry"] for item in items]
+    geometries = geometry_columns(rows, FIT_GEOMETRY_FIELDS)
+    fits = _compare_fits(items, geometries, user_id)
+
+    with np.errstate(invalid="ignore"):
+        points = contact_points(
+            geometries,
+            fits["seatHight"], fits["stemHight"], fits["saddleOffset"], fits["shifterAngle"],
+        )
+        saddle_x, saddle_y = points["saddle"]
+        hands_x, hands_y = points["hands"]
+        metrics = {
+            # Перепад седло — руль (положителен, если руки ниже седла)
+            "saddleToBarDrop": saddle_y - hands_y,
+            # Горизонтальное расстояние от седла до рук на руле
+            "reach": hands_x - saddle_x,
+            "torsoAngle": fits["torsoAngle"],
+        }
+
+    results = []
+    for i, item in enumerate(items):
+        results.append({
+            "size_id": item["size_id"],
+            "fit": item["fit"],
+            "geometry": rows[i],
+            "fit_params": {key: _finite(fits[key][i]) for key in FIT_FIELDS},
+            "points": {
+                name: [_finite(x[i]), _finite(y[i])]
+                for name, (x, y) in points.items()
+            },
+            "metrics": {name: _finite(values[i]) for name, values in metrics.items()},
+            "delta": {name: _finite(values[i] - values[0]) for name, values in metrics.items()},
+        })
+    return {"success": True, "data": results}
+
+
+def recommend_sizes(bike_model_id, user_id, role=None):
+    validation = validate_bike_model_id({"bike_model_id": bike_model_id})
+    if not validation.is_valid:
+        return {"success": False, "errors": validation.errors}
+
+    data = dao.get_model_fit_data(
+        validation.data["bike_model_id"], user_id, check_access=role != "moderator",
+    )
+    if data is None:
+        raise DatabaseError()
+    anthro = _require_anthropometry(data["anthropometry"])
+    sizes = data["sizes"]
+    if not sizes:
+        raise NotFoundError("Модель велосипеда не найдена или недоступна")
+
+    geo = geometry_columns(sizes)
+    fits = _basic_fits(geo, anthro, "recommend_sizes")
+    scores = fit_score_batch(geo, fits)
+
+    ranked = []
+    for i in sorted(range(len(sizes)), key=lambda i: scores[i]):
+        valid = bool(fits["valid"][i])
+        ranked.append({
+            "size_id": sizes[i]["id"],
+            "size": sizes[i]["size"],
+            "score": float(scores[i]) if valid else None,
+            "fit": {key: float(fits[key][i]) for key in FIT_FIELDS} if valid else None,
+        })
+    return {"success": True, "data": ranked}
+
+
+def search_sizes(user_id, params):
+    validation = validate_pagination(params)
+    if not validation.is_valid:
+        return {"success": False, "errors": validation.errors}
+    limit, offset = validation.data["limit"], validation.data["offset"]
+
+    anthro = _require_anthropometry(get_latest_user_anthropometry(user_id))
+
+    snapshot = geometry_matrix.snapshot()
+    if snapshot is None:
+        raise DatabaseError()
+    fits = _basic_fits(snapshot["geometry"], anthro, "search_sizes")
+    scores = fit_score_batch(snapshot["geometry"], fits)
+    scores = np.where(geometry_matrix.visible_mask(snapshot, user_id), scores, np.inf)
+
+    total = int(np.isfinite(scores).sum())
+    end = min(offset + limit, total)
+    if offset >= end:
+        page = []
+    else:
+        top = np.argpartition(scores, end - 1)[:end]
+        top = top[np.lexsort((snapshot["size_id"][top], scores[top]))]
+        page = top[offset:end]
+
+    return {
+        "success": True,
+        "data": [
+            {
+                "size_id": int(snapshot["size_id"][i]),
+                "bike_model_id": int(snapshot["bike_model_id"][i]),
+                "model": snapshot["model"][i],
+                "size": snapshot["size"][i],
+                "score": float(scores[i]),
+                "fit": {key: float(fits[key][i]) for key in FIT_FIELDS},
+            }
+            for i in page
+        ],
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+    }
+
+
+def export_user_fits(user_id, fmt):
+    if fmt not in EXPORT_FORMATS:
+        raise ValidationError([{"field": "format", "message": "Поддерживаются форматы ndjson и csv"}])
+    return serialize_rows(dao.iter_user_fits_export(user_id), FIT_EXPORT_COLUMNS, fmt)
+
+
 def delete_fit(user_id, fit_name, size_id):
     validation = validate_fit_request_data({"fit_name": fit_name, "size_id": size_id})
     if not validation.is_valid:
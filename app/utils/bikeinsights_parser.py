@@ -1,5 +1,6 @@
 import re
 import json
+import codecs
 from typing import Optional
 
 
@@ -14,73 +15,127 @@ def _get_val(obj: dict, *keys) -> Optional[float]:
     return None
 
 
-def _parse_objects_by_typename(html: str, typename: str) -> list:
-    starts = [m.start() for m in re.finditer(
-        r'"__typename"\s*:\s*"' + re.escape(typename) + r'"', html
-    )]
-    results = []
-    for start in starts:
-        brace_start = -1
-        depth = 0
-        i = start - 1
-        while i >= 0:
-            ch = html[i]
-            if ch == '}':
-                depth += 1
-            elif ch == '{':
-                if depth == 0:
-                    brace_start = i
-                    break
-                depth -= 1
-            i -= 1
-        if brace_start == -1:
-            continue
-        depth = 0
-        i = brace_start
-        while i < len(html):
-            if html[i] == '{':
-                depth += 1
-            elif html[i] == '}':
-                depth -= 1
-                if depth == 0:
-                    break
-            i += 1
-        obj_str = html[brace_start:i + 1]
-        try:
-            obj = json.loads(obj_str)
-            results.append((start, obj))
-        except json.JSONDecodeError:
+# Значимые токены встроенного JSON: пара "__typename"/"size": "строка",
+# любая другая строка (чтобы пропускать скобки внутри неё), фигурная скобка
+# и закрывающий </script>, после которого незакрытые объекты сбрасываются.
+# Строка не может содержать сырой перевод строки или </script (внутри
+# <script> браузер закончил бы элемент) — так одиночная кавычка из HTML
+# или JS не «проглатывает» остаток страницы.
+_STRING_BODY = r'[^"\\\n<]*(?:(?:\\.|<(?!/(?i:script)))[^"\\\n<]*)*'
+_TOKEN_RE = re.compile(
+    r'"(__typename|size)"\s*:\s*"(' + _STRING_BODY + r')"'
+    r'|"' + _STRING_BODY + r'"'
+    r'|[{}]'
+    r'|(?i:</script)'
+)
+_SIZE_LOOKBEHIND = 600
+_TYPENAMES = ('BikeGeometryFrame', 'BikeGeometryBaseBuild')
+
+_H1_RE = re.compile(r'<h1[^>]*class="[^"]*header-title[^"]*"[^>]*>(.*?)</h1>', re.DOTALL)
+_TITLE_RE = re.compile(r'<title>([^<]+)</title>')
+
+
+def _json_string(raw: str) -> str:
+    try:
+        return json.loads(f'"{raw}"')
+    except json.JSONDecodeError:
+        return raw
+
+
+class _ObjectCollector:
+    """Общее ядро разбора объектов для полного и потокового парсеров.
+
+    Принимает значимые токены (_TOKEN_RE) и открывающие скобки, собирает
+    объекты с "__typename" из typenames: {typename: [(позиция __typename,
+    объект, метка размера), ...]}. Метка — ближайшее предшествующее значение
+    "size" не дальше _SIZE_LOOKBEHIND символов до "__typename".
+    """
+
+    def __init__(self, typenames):
+        self.results = {t: [] for t in typenames}
+        # [начало объекта, позиция __typename, typename, метка размера];
+        # начало None — текст объекта отброшен, и он не будет разобран
+        self.stack = []
+        self.last_size = None
+
+    def open(self, start: int) -> None:
+        self.stack.append([start, None, None, None])
+
+    def token(self, m, text: str, offset: int = 0) -> None:
+        """Обработка токена m, найденного в text; offset — позиция text[0]."""
+        token = m.group(0)
+        if token == "{":
+            self.open(offset + m.start())
+        elif token == "}":
+            start, type_pos, typename, label = self.stack.pop()
+            if typename in self.results and start is not None:
+                try:
+                    obj = json.loads(text[start - offset:m.end()])
+                    self.results[typename].append((type_pos, obj, label))
+                except json.JSONDecodeError:
+                    pass
+        elif m.group(1) == "__typename":
+            frame = self.stack[-1]
+            if frame[2] is None:
+                frame[1] = offset + m.start()
+                frame[2] = _json_string(m.group(2))
+                if self.last_size and self.last_size[0] >= offset + m.start() - _SIZE_LOOKBEHIND:
+                    frame[3] = self.last_size[1]
+        elif m.group(1) == "size":
+            self.last_size = (offset + m.start(), _json_string(m.group(2)))
+        elif token[0] == "<":
+            self.stack.clear()
+
+    def sorted_results(self) -> dict:
+        for found in self.results.values():
+            found.sort(key=lambda item: item[0])
+        return self.results
+
+
+def _parse_objects_by_typename(html: str, typenames) -> dict:
+    """Один проход по странице: все объекты с "__typename" из typenames
+    в порядке появления (см. _ObjectCollector)."""
+    collector = _ObjectCollector(typenames)
+    pos = 0
+    while True:
+        if not collector.stack:
+            pos = html.find("{", pos)
+            if pos == -1:
+                break
+            collector.open(pos)
+            pos += 1
             continue
-    return results
 
+        m = _TOKEN_RE.search(html, pos)
+        if m is None:
+            break
+        pos = m.end()
+        collector.token(m, html)
+
+    return collector.sorted_results()
 
-def parse_bikeinsights_html(html: str) -> dict:
-    model = None
-    h1_match = re.search(r'<h1[^>]*class="[^"]*header-title[^"]*"[^>]*>(.*?)</h1>', html, re.DOTALL)
-    if h1_match:
-        raw = h1_match.group(1)
-        model = re.sub(r'<[^>]+>', '', raw).strip()
-        model = re.sub(r'\s+', ' ', model)
-    if not model:
-        title_match = re.search(r'<title>([^<]+)</title>', html)
-        if title_match:
-            model = title_match.group(1).split(' - ')[0].strip()
 
-    frame_objects = _parse_objects_by_typename(html, 'BikeGeometryFrame')
+def _model_from_h1(raw: str) -> str:
+    model = re.sub(r'<[^>]+>', '', raw).strip()
+    return re.sub(r'\s+', ' ', model)
+
+
+def _model_from_title(raw: str) -> str:
+    return raw.split(' - ')[0].strip()
+
+
+def _build_result(model: str, objects: dict) -> dict:
+    frame_objects = objects['BikeGeometryFrame']
     if not frame_objects:
         raise ValueError(
             "Не найдены данные геометрии на странице. "
             "Убедитесь, что ссылка ведёт на страницу велосипеда bikeinsights.com."
         )
 
-    build_objects = _parse_objects_by_typename(html, 'BikeGeometryBaseBuild')
+    build_objects = objects['BikeGeometryBaseBuild']
 
     sizes = []
-    for idx, (start, geo) in enumerate(frame_objects):
-        context = html[max(0, start - 600):start]
-        size_match = re.search(r'"size"\s*:\s*"([^"]+)"', context)
-        size_label = size_match.group(1) if size_match else None
-
+    for idx, (_, geo, size_label) in enumerate(frame_objects):
         build = build_objects[idx][1] if idx < len(build_objects) else {}
 
         entry = {"label": size_label or ""}
@@ -154,6 +209,197 @@ def parse_bikeinsights_html(html: str) -> dict:
         raise ValueError("Не найдено ни одного размера на странице.")
 
     return {
-        "model": model or "",
+        "model": model,
         "sizes": sizes,
     }
+
+
+def parse_bikeinsights_html(html: str) -> dict:
+    h1_match = _H1_RE.search(html)
+    model = _model_from_h1(h1_match.group(1)) if h1_match else ""
+    if not model:
+        title_match = _TITLE_RE.search(html)
+        if title_match:
+            model = _model_from_title(title_match.group(1))
+    return _build_result(model, _parse_objects_by_typename(html, _TYPENAMES))
+
+
+_STRING_BODY_RE = re.compile(_STRING_BODY)
+# Остаток буфера после "size"/"__typename", который ещё может оказаться парой ключ/строка
+_PAIR_TAIL_RE = re.compile(r'\s*(?::\s*(?:"' + _STRING_BODY + r'\\?)?)?\Z')
+_SCRIPT_END_RE = re.compile(r'(?i)</script')
+
+
+class BikeinsightsStreamParser:
+    """Разбор страницы по частям по мере загрузки.
+
+    feed() принимает очередной кусок байт, close() возвращает то же, что
+    parse_bikeinsights_html для прочитанной части. В буфере хранится только
+    текст открытых объектов (не длиннее MAX_OBJECT_CHARS; более крупные
+    объекты пропускаются) и окно поиска заголовка. Когда скрипт с геометрией
+    закончился (</script> после найденных объектов) и заголовок найден,
+    done становится True и дальше читать не нужно.
+    При превышении max_bytes feed() бросает ValueError.
+    """
+
+    MAX_OBJECT_CHARS = 256 * 1024
+    TITLE_WINDOW = 4096
+    # Токен, заканчивающийся ближе к концу буфера, может быть неполным
+    _TAIL = 64
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.bytes_read = 0
+        self.done = False
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._buf = ""
+        self._offset = 0      # абсолютная позиция self._buf[0]
+        self._pos = 0         # абсолютная позиция разбора объектов
+        self._title_pos = 0   # абсолютная позиция поиска заголовка
+        self._h1 = None
+        self._title = None
+        self._objects = _ObjectCollector(_TYPENAMES)
+        self._string = None   # [начало, докуда проверено] строки, не закончившейся в буфере
+        self._blob_closed = False
+
+    def feed(self, chunk: bytes) -> None:
+        if self.done:
+            return
+        self.bytes_read += len(chunk)
+        if self.max_bytes is not None and self.bytes_read > self.max_bytes:
+            raise ValueError(
+                f"Страница слишком большая (более {self.max_bytes // (1024 * 1024)} МБ)."
+            )
+        self._buf += self._decoder.decode(chunk)
+        self._scan(final=False)
+
+    def close(self) -> dict:
+        if not self.done:
+            self._buf += self._decoder.decode(b"", final=True)
+            self._scan(final=True)
+        model = _model_from_h1(self._h1) if self._h1 is not None else ""
+        if not model and self._title is not None:
+            model = _model_from_title(self._title)
+        return _build_result(model, self._objects.sorted_results())
+
+    def _scan(self, final: bool) -> None:
+        self._scan_title()
+        self._scan_objects(final)
+        has_model = self._h1 is not None and (_model_from_h1(self._h1) or self._title is not None)
+        if self._blob_closed and has_model:
+            self.done = True
+            return
+        self._trim()
+
+    def _scan_title(self) -> None:
+        buf, start = self._buf, self._title_pos - self._offset
+        if self._h1 is None:
+            m = _H1_RE.search(buf, start)
+            if m:
+                self._h1 = m.group(1)
+        if self._title is None:
+            m = _TITLE_RE.search(buf, start)
+            if m:
+                self._title = m.group(1)
+        # Незакрытый заголовок длиннее окна не ищем
+        self._title_pos = max(self._title_pos, self._offset + len(buf) - self.TITLE_WINDOW)
+
+    @staticmethod
+    def _resume_point(buf: str, start: int, end: int) -> int:
+        """Позиция до end, с которой можно продолжить разбор тела строки:
+        не внутри экранирования и не внутри возможного </script."""
+        pos = max(start, end - len("</script"))
+        slashes = 0
+        while pos - slashes > start and buf[pos - slashes - 1] == "\\":
+            slashes += 1
+        return pos - (slashes % 2)
+
+    def _open_string(self, buf: str, pos: int, end: int, safe: int) -> int:
+        """Первая пропущенная регуляркой кавычка, чья строка доходит до конца буфера, или -1."""
+        q = buf.find('"', pos, end)
+        while q != -1:
+            if _STRING_BODY_RE.match(buf, q + 1).end() >= safe:
+                return q
+            q = buf.find('"', q + 1, end)
+        return -1
+
+    def _scan_objects(self, final: bool) -> None:
+        buf, off = self._buf, self._offset
+        safe = len(buf) if final else len(buf) - self._TAIL
+        pos = self._pos - off
+        stack = self._objects.stack
+        frames = self._objects.results['BikeGeometryFrame']
+        while pos < safe:
+            if self._string is not None:
+                start, checked = self._string
+                end = _STRING_BODY_RE.match(buf, checked - off).end()
+                if end >= safe and not final:
+                    self._string[1] = off + self._resume_point(buf, checked - off, end)
+                    break
+                self._string = None
+                if end < len(buf) and buf[end] == '"':
+                    pos = end + 1
+                elif start + 1 >= off:
+                    # Строка не закрылась: как и полный разбор, продолжаем со следующего символа
+                    pos = start + 1 - off
+                else:
+                    pos = end
+                continue
+
+            if not stack:
+                idx = buf.find("{", pos)
+                end = idx if idx != -1 else (len(buf) if final else safe)
+                if frames and _SCRIPT_END_RE.search(buf, pos, end):
+                    self._blob_closed = True
+                if idx == -1:
+                    pos = end
+                    break
+                self._objects.open(off + idx)
+                pos = idx + 1
+                continue
+
+            m = _TOKEN_RE.search(buf, pos)
+            if not final:
+                q = self._open_string(buf, pos, m.start() if m else len(buf), safe)
+                if q != -1:
+                    self._string = [off + q, off + q + 1]
+                    pos = q
+                    continue
+                if m is None:
+                    pos = safe
+                    break
+                if m.end() > safe or (
+                    m.group(0) in ('"size"', '"__typename"') and _PAIR_TAIL_RE.match(buf, m.end())
+                ):
+                    break
+            elif m is None:
+                pos = len(buf)
+                break
+            pos = m.end()
+            self._objects.token(m, buf, off)
+            if frames and m.group(0)[0] == "<":
+                self._blob_closed = True
+        self._pos = off + pos
+
+    def _trim(self) -> None:
+        # Позиция, с которой придётся перечитать буфер; строку длиннее
+        # MAX_OBJECT_CHARS перечитывать с начала не будем
+        anchor = self._pos
+        if self._string is not None:
+            start, checked = self._string
+            anchor = start if checked - start <= self.MAX_OBJECT_CHARS else checked
+        limit = anchor - self.MAX_OBJECT_CHARS
+        keep = anchor
+        for frame in self._objects.stack:
+            if frame[0] is None:
+                continue
+            if frame[0] < limit:
+                frame[0] = None
+            else:
+                keep = min(keep, frame[0])
+        if self._h1 is None or self._title is None:
+            keep = min(keep, self._title_pos)
+        cut = keep - self._offset
+        if cut > len(self._buf) // 2:
+            self._buf = self._buf[cut:]
+            self._offset = keep
@@ -0,0 +1,135 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import IO, Iterable, Iterator, Optional, Sequence, Tuple
+
+# (номер строки, данные строки или None, сообщение об ошибке разбора или None)
+ParsedRow = Tuple[int, Optional[dict], Optional[str]]
+
+IMPORT_FORMATS = ("csv", "jsonl")
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+GEOMETRY_COLUMNS = (
+    "seatTube", "seatAngle", "headTube", "headAngle", "bbdrop",
+    "chainstay", "wheelbase", "stack", "reach",
+    "rimD", "tyreW", "crankLen",
+    "stemLen", "stemAngle", "minStemHight", "maxStemHight",
+    "barReach", "barDrop", "shifterReach",
+    "saddleLen", "saddleRailLen", "saddleHeight",
+    "minseatpostLen", "maxseatpostLen",
+)
+# Колонки выгрузки каталога совпадают с форматом импорта (лишний status игнорируется)
+CATALOG_EXPORT_COLUMNS = ("model", "status", "size") + GEOMETRY_COLUMNS
+FIT_EXPORT_COLUMNS = (
+    "name", "model", "size", "seatHight", "stemHight", "saddleOffset",
+    "torsoAngle", "shifterAngle", "created_at",
+)
+
+
+def _text_stream(stream: IO) -> IO:
+    if isinstance(stream, io.TextIOBase):
+        return stream
+    return io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace", newline="")
+
+
+def _clean(row: dict) -> dict:
+    return {
+        k.strip(): (v.strip() if isinstance(v, str) else v)
+        for k, v in row.items()
+        if k and v is not None and v != ""
+    }
+
+
+def iter_csv_rows(stream: IO) -> Iterator[ParsedRow]:
+    """Построчно читает CSV с заголовком; пустые ячейки считаются незаполненными.
+
+    Строка, которую не удалось разобрать, возвращается с ошибкой, и чтение
+    продолжается со следующей; без разобранного заголовка читать нечего."""
+    reader = csv.DictReader(_text_stream(stream))
+    try:
+        if reader.fieldnames is None:
+            return
+    except csv.Error as e:
+        yield 1, None, f"Ошибка разбора заголовка CSV: {e}"
+        return
+    while True:
+        line = reader.line_num + 1
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield line, None, f"Ошибка разбора CSV: {e}"
+            continue
+        if None in row:
+            yield reader.line_num, None, "Лишние значения в строке"
+            continue
+        yield reader.line_num, _clean(row), None
+
+
+def iter_jsonl_rows(stream: IO) -> Iterator[ParsedRow]:
+    """Построчно читает JSON Lines: по одному объекту размера на строку."""
+    for line_no, line in enumerate(_text_stream(stream), start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, None, f"Некорректный JSON: {e.msg}"
+            continue
+        if not isinstance(row, dict):
+            yield line_no, None, "Строка должна содержать JSON-объект"
+            continue
+        yield line_no, _clean(row), None
+
+
+def iter_rows(stream: IO, fmt: str) -> Iterator[ParsedRow]:
+    if fmt == "csv":
+        return iter_csv_rows(stream)
+    if fmt == "jsonl":
+        return iter_jsonl_rows(stream)
+    raise ValueError(f"Неподдерживаемый формат: {fmt}")
+
+
+def json_default(value):
+    """Запасной сериализатор для json.dumps/msgpack: Decimal и даты из БД."""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def iter_ndjson(rows: Iterable[dict], columns: Sequence[str]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps({c: row.get(c) for c in columns}, ensure_ascii=False, default=json_default) + "\n"
+
+
+def iter_csv(rows: Iterable[dict], columns: Sequence[str]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    writer.writerow(columns)
+    yield flush()
+    for row in rows:
+        writer.writerow([
+            value.isoformat() if isinstance(value, (datetime, date)) else ("" if value is None else value)
+            for value in (row.get(c) for c in columns)
+        ])
+        yield flush()
+
+
+def serialize_rows(rows: Iterable[dict], columns: Sequence[str], fmt: str) -> Iterator[str]:
+    if fmt == "ndjson":
+        return iter_ndjson(rows, columns)
+    if fmt == "csv":
+        return iter_csv(rows, columns)
+    raise ValueError(f"Неподдерживаемый формат: {fmt}")
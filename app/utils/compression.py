@@ -0,0 +1,154 @@
+import os
+import zlib
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # необязательная зависимость
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # необязательная зависимость
+    zstandard = None
+
+# Ответы меньше порога не сжимаются: выигрыш меньше накладных расходов
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 1024))
+GZIP_LEVEL = int(os.environ.get("COMPRESS_GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("COMPRESS_BROTLI_QUALITY", 5))
+ZSTD_LEVEL = int(os.environ.get("COMPRESS_ZSTD_LEVEL", 3))
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/msgpack",
+    "application/vnd.bikefit.columnar+json",
+    "application/x-ndjson",
+    "text/csv",
+    "text/html",
+    "text/plain",
+}
+
+
+class _Gzip:
+    def __init__(self):
+        self._z = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self._z.compress(data)
+
+    def flush(self):
+        return self._z.flush()
+
+
+class _Brotli:
+    def __init__(self):
+        self._c = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data):
+        return self._c.process(data)
+
+    def flush(self):
+        return self._c.finish()
+
+
+class _Zstd:
+    def __init__(self):
+        self._c = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def compress(self, data):
+        return self._c.compress(data)
+
+    def flush(self):
+        return self._c.flush()
+
+
+# Content-Encoding -> фабрика компрессора с методами compress(bytes) и flush().
+# Порядок задаёт предпочтение сервера при равных q у клиента.
+CODECS = {}
+if brotli is not None:
+    CODECS["br"] = _Brotli
+if zstandard is not None:
+    CODECS["zstd"] = _Zstd
+CODECS["gzip"] = _Gzip
+
+
+def no_compression(view):
+    """Отключает сжатие ответов роута (например, уже сжатых данных).
+
+    Флаг переносится внешними декораторами через functools.wraps."""
+    view.no_compression = True
+    return view
+
+
+def negotiate_encoding(accept_encodings):
+    """Кодировка из CODECS, лучшая по Accept-Encoding; None — без сжатия."""
+    best = accept_encodings.best_match(list(CODECS))
+    return best if best and accept_encodings[best] > 0 else None
+
+
+def _compress_stream(chunks, codec, original):
+    compressor = codec()
+    try:
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        close = getattr(original, "close", None)
+        if close is not None:
+            close()
+
+
+def _weaken_etag(response):
+    # Сжатое представление побайтно отличается от исходного, поэтому его
+    # ETag слабый; conditional_json сравнивает ETag слабым сравнением
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+
+def _opted_out():
+    view = current_app.view_functions.get(request.endpoint)
+    return getattr(view, "no_compression", False)
+
+
+def compress_response(response):
+    if (
+        response.mimetype not in COMPRESSIBLE_MIMETYPES
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or _opted_out()
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+    if response.status_code == 304:
+        _weaken_etag(response)
+        return response
+    if request.method == "HEAD" or not 200 <= response.status_code < 300 or response.status_code == 204:
+        return response
+
+    codec = CODECS[encoding]
+    if response.is_streamed:
+        original = response.response
+        response.response = _compress_stream(response.iter_encoded(), codec, original)
+        response.headers.pop("Content-Length", None)
+    else:
+        body = response.get_data()
+        if len(body) < COMPRESS_MIN_SIZE:
+            return response
+        compressor = codec()
+        response.set_data(compressor.compress(body) + compressor.flush())
+
+    response.headers["Content-Encoding"] = encoding
+    _weaken_etag(response)
+    return response
+
+
+def init_compression(app):
+    app.after_request(compress_response)
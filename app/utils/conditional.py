@@ -0,0 +1,51 @@
+import hashlib
+import os
+
+from flask import Response, request
+
+from app.utils.response_formats import JSON, negotiate_format, render
+
+# Сколько секунд клиент и промежуточные кэши могут не перепроверять
+# ответы по публичным моделям
+PUBLIC_MAX_AGE = int(os.environ.get("PUBLIC_CACHE_MAX_AGE", 60))
+
+
+def make_etag(*parts) -> str:
+    """Сильный ETag (без кавычек) из частей версии ответа."""
+    raw = "\x1f".join(str(p) for p in parts)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def cache_control(public: bool) -> str:
+    if public:
+        return f"public, max-age={PUBLIC_MAX_AGE}"
+    return "private, no-cache"
+
+
+def is_revalidation() -> bool:
+    """GET/HEAD с If-None-Match: только на такой запрос может быть отдан 304."""
+    return request.method in ("GET", "HEAD") and bool(request.if_none_match)
+
+
+def conditional_json(etag, build, public: bool = False) -> Response:
+    """Ответ (в формате по Accept) с ETag; 304 без вызова build(), если
+    If-None-Match совпал.
+
+    Условные ответы отдаются только на GET и HEAD — на POST ETag
+    проставляется, но тело всегда строится. При etag=None версия ответа
+    неизвестна, и он отдаётся без ETag и без кэширования."""
+    fmt = negotiate_format()
+    if etag is None:
+        response = render(build(), fmt)
+        response.headers["Cache-Control"] = "no-store"
+        return response
+    if fmt != JSON:
+        etag = make_etag(etag, fmt)
+    if is_revalidation() and request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.vary.add("Accept")
+    else:
+        response = render(build(), fmt)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control(public)
+    return response
@@ -36,6 +36,11 @@ class ForbiddenError(AppError):
         super().__init__(message, status_code=403)
 
 
+class UpstreamError(AppError):
+    def __init__(self, message: str = "Внешний сервис недоступен"):
+        super().__init__(message, status_code=502)
+
+
 class DatabaseError(AppError):
     def __init__(self, message: str = "Ошибка при работе с базой данных"):
         super().__init__(message, status_code=500)
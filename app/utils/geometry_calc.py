@@ -1,24 +1,152 @@
-from math import sin, cos, radians, degrees, atan2, sqrt, acos
 from decimal import Decimal
 import logging
 
-logger = logging.getLogger(__name__)
-
-
-def _cos_th(a, b, alpha_deg):
-    return sqrt(a**2 + b**2 - 2*a*b*cos(radians(alpha_deg)))
-
-
-def _angle_by_sides(a, b, c):
-    denom = 2 * a * b
-    if denom == 0:
-        return None
-    cos_val = max(-1.0, min(1.0, (a**2 + b**2 - c**2) / denom))
-    return degrees(acos(cos_val))
+import numpy as np
 
+logger = logging.getLogger(__name__)
 
-def _dist(p1, p2):
-    return sqrt((p1[0]-p2[0])**2 + (p1[1]-p2[1])**2)
+# Поля геометрии и антропометрии, участвующие в расчёте базовой посадки
+FIT_GEOMETRY_FIELDS = (
+    "crankLen", "seatAngle", "saddleHeight", "saddleLen", "saddleRailLen",
+    "maxStemHight", "barDrop", "shifterReach", "headAngle", "stemAngle",
+    "stemLen", "reach", "stack", "barReach",
+)
+FIT_ANTHROPOMETRY_FIELDS = (
+    "hip", "lowerLeg", "heelToAnkle", "hipJointOffset", "upperarm", "forearm", "torsoMid",
+)
+
+# Дополнительные поля геометрии для оценки посадки
+SCORE_GEOMETRY_FIELDS = ("seatTube", "saddleHeight", "minseatpostLen", "maxseatpostLen")
+
+# Целевые окна для оценки посадки: угол туловища (градусы) и вылет
+# подседельного штыря берётся из minseatpostLen/maxseatpostLen размера.
+# Верх штыря — на высоте седла за вычетом высоты самого седла
+TORSO_ANGLE_WINDOW = (40.0, 50.0)
+# Вес отклонения штыря: 10 мм вне окна ≈ 1° отклонения туловища
+SEATPOST_SCORE_WEIGHT = 0.1
+
+_SHIFTER_ANGLE = 30
+
+
+def _as_columns(values, fields):
+    """Приводит столбцы (скаляры, списки, массивы) к float-массивам; None → NaN."""
+    return {f: np.asarray(values[f], dtype=float) for f in fields}
+
+
+def geometry_columns(rows, fields=FIT_GEOMETRY_FIELDS + SCORE_GEOMETRY_FIELDS):
+    """Собирает строки геометрии (словари из БД) в столбцы float; пропуски → NaN."""
+    return {
+        f: np.array([np.nan if row.get(f) is None else float(row[f]) for row in rows], dtype=float)
+        for f in fields
+    }
+
+
+def contact_points(g, seat_hight, stem_hight, saddle_offset, shifter_angle=_SHIFTER_ANGLE):
+    """Координаты седла, верха выноса и рук относительно каретки.
+
+    Все аргументы — массивы (или скаляры), совместимые по broadcasting.
+    """
+    seat_a = np.radians(g['seatAngle'])
+    saddle_x = -(seat_hight - g['saddleHeight']) * np.cos(seat_a) + saddle_offset
+    saddle_y = (seat_hight - g['saddleHeight']) * np.sin(seat_a) + g['saddleHeight']
+
+    curve_r1 = g['barDrop'] * 0.25
+    arc_r = curve_r1 + g['shifterReach']
+    ha = np.radians(g['headAngle'])
+    sa = np.radians(g['stemAngle'])
+    stem_tip_x = g['reach'] - stem_hight * np.cos(ha) + g['stemLen'] * np.sin(ha - sa)
+    stem_tip_y = g['stack'] + stem_hight * np.sin(ha) + g['stemLen'] * np.cos(ha - sa)
+    shifter_a = np.radians(shifter_angle)
+    hands_x = stem_tip_x + g['barReach'] - curve_r1 + arc_r * np.cos(shifter_a)
+    hands_y = stem_tip_y - curve_r1 + arc_r * np.sin(shifter_a)
+
+    return {
+        "saddle": (saddle_x, saddle_y),
+        "stemTip": (stem_tip_x, stem_tip_y),
+        "hands": (hands_x, hands_y),
+    }
+
+
+def basic_fit_batch(geometries, anthropometries):
+    """Векторизованный расчёт базовой посадки.
+
+    geometries и anthropometries — словари «поле → столбец значений»
+    (FIT_GEOMETRY_FIELDS и FIT_ANTHROPOMETRY_FIELDS). Столбцы совмещаются
+    по правилам broadcasting NumPy: например, геометрия формы (1, S) и
+    антропометрия формы (R, 1) дают результат (R, S) — все райдеры на всех
+    размерах. Отсутствующее поле вызывает KeyError.
+
+    Возвращает словарь массивов seatHight, stemHight, saddleOffset,
+    torsoAngle, shifterAngle и булеву маску valid: False там, где
+    геометрия вырождена или во входных данных есть NaN.
+    """
+    g = _as_columns(geometries, FIT_GEOMETRY_FIELDS)
+    a = _as_columns(anthropometries, FIT_ANTHROPOMETRY_FIELDS)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        seat_hight = a['hip'] + a['lowerLeg'] + a['heelToAnkle'] - g['crankLen']
+        stem_hight = g['maxStemHight']
+        saddle_offset = (
+            g['crankLen'] + seat_hight * np.cos(np.radians(g['seatAngle']))
+            - a['hip'] * np.cos(np.radians(35))
+        )
+
+        points = contact_points(g, seat_hight, stem_hight, saddle_offset)
+        saddle_x, saddle_y = points["saddle"]
+        hands_x, hands_y = points["hands"]
+        seat_x = saddle_x - g['saddleLen'] / 8
+        seat_y = saddle_y + a['hipJointOffset']
+
+        upperarm, forearm = a['upperarm'], a['forearm'] * 1.2
+        arms_len = np.sqrt(upperarm**2 + forearm**2 - 2*upperarm*forearm*np.cos(np.radians(155)))
+        torso_len = a['torsoMid']
+        d = np.hypot(seat_x - hands_x, seat_y - hands_y)
+
+        base_angle = np.degrees(np.arctan2(hands_y - seat_y, hands_x - seat_x))
+        denom = 2 * d * torso_len
+        cos_val = np.clip((d**2 + torso_len**2 - arms_len**2) / denom, -1.0, 1.0)
+        torso_angle = np.degrees(np.arccos(cos_val)) + base_angle
+
+    saddle_offset = np.minimum(saddle_offset, g['saddleRailLen'] / 2)
+    seat_hight, stem_hight, saddle_offset, torso_angle = np.broadcast_arrays(
+        seat_hight, stem_hight, saddle_offset, torso_angle,
+    )
+    valid = (
+        (denom != 0)
+        & np.isfinite(seat_hight) & np.isfinite(stem_hight)
+        & np.isfinite(saddle_offset) & np.isfinite(torso_angle)
+    )
+
+    return {
+        'seatHight':    seat_hight,
+        'stemHight':    stem_hight,
+        'saddleOffset': saddle_offset,
+        'torsoAngle':   torso_angle,
+        'shifterAngle': np.full(valid.shape, _SHIFTER_ANGLE),
+        'valid':        valid,
+    }
+
+
+def _window_distance(value, low, high):
+    return np.maximum(low - value, 0) + np.maximum(value - high, 0)
+
+
+def fit_score_batch(geometries, fits):
+    """Оценка посадки: расстояние угла туловища и вылета штыря от целевых окон.
+
+    fits — результат basic_fit_batch. Чем меньше оценка, тем лучше размер
+    подходит; 0 — обе величины внутри окон. Для невалидных посадок
+    возвращается inf; неизвестные пределы штыря не штрафуются.
+    """
+    g = _as_columns(geometries, SCORE_GEOMETRY_FIELDS)
+    torso_dev = _window_distance(fits['torsoAngle'], *TORSO_ANGLE_WINDOW)
+    seatpost_dev = _window_distance(
+        fits['seatHight'] - g['saddleHeight'] - g['seatTube'], g['minseatpostLen'], g['maxseatpostLen'],
+    )
+    # Размер без данных о штыре не штрафуется за вылет
+    seatpost_dev = np.where(np.isnan(seatpost_dev), 0, seatpost_dev)
+    score = torso_dev + SEATPOST_SCORE_WEIGHT * seatpost_dev
+    return np.where(fits['valid'] & np.isfinite(score), score, np.inf)
 
 
 def basic_fit(geometry, anthropometry):
@@ -30,48 +158,17 @@ def basic_fit(geometry, anthropometry):
         g = {k: float(v) for k, v in geometry.items() if isinstance(v, _numeric)}
         a = {k: float(v) for k, v in anthropometry.items() if isinstance(v, _numeric)}
 
-        seat_hight = a['hip'] + a['lowerLeg'] + a['heelToAnkle'] - g['crankLen']
-        stem_hight = g['maxStemHight']
-
-        saddle_offset = g['crankLen'] + seat_hight * cos(radians(g['seatAngle'])) - a['hip'] * cos(radians(35))
-
-        seat_a = radians(g['seatAngle'])
-        saddle_x = -(seat_hight - g['saddleHeight']) * cos(seat_a) + saddle_offset
-        saddle_y = (seat_hight - g['saddleHeight']) * sin(seat_a) + g['saddleHeight']
-
-        seat = [
-            saddle_x - g['saddleLen'] / 8,
-            saddle_y + a['hipJointOffset'],
-        ]
-
-        shifter_angle = 30
-        curve_r1 = g['barDrop'] * 0.25
-        arc_r = curve_r1 + g['shifterReach']
-        ha = radians(g['headAngle'])
-        sa = radians(g['stemAngle'])
-        stem_tip_x = g['reach'] - stem_hight * cos(ha) + g['stemLen'] * sin(ha - sa)
-        stem_tip_y = g['stack'] + stem_hight * sin(ha) + g['stemLen'] * cos(ha - sa)
-        hands = [
-            stem_tip_x + g['barReach'] - curve_r1 + arc_r * cos(radians(shifter_angle)),
-            stem_tip_y - curve_r1 + arc_r * sin(radians(shifter_angle)),
-        ]
-
-        arms_len = _cos_th(a['upperarm'], a['forearm'] * 1.2, 155)
-        torso_len = a['torsoMid']
-        d = _dist(seat, hands)
-
-        base_angle = degrees(atan2(hands[1] - seat[1], hands[0] - seat[0]))
-        angle = _angle_by_sides(d, torso_len, arms_len)
+        result = basic_fit_batch(g, a)
 
-        if angle is None:
+        if not result['valid']:
             return {"error": "Не удалось рассчитать угол посадки: вырожденная геометрия."}
 
         return {
-            'seatHight':    seat_hight,
-            'stemHight':    stem_hight,
-            'saddleOffset': min(saddle_offset, g['saddleRailLen'] / 2),
-            'torsoAngle':   angle + base_angle,
-            'shifterAngle': shifter_angle,
+            'seatHight':    float(result['seatHight']),
+            'stemHight':    float(result['stemHight']),
+            'saddleOffset': float(result['saddleOffset']),
+            'torsoAngle':   float(result['torsoAngle']),
+            'shifterAngle': _SHIFTER_ANGLE,
         }
 
     except (KeyError, TypeError, ValueError) as e:
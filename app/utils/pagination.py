@@ -0,0 +1,47 @@
+import base64
+import json
+from itertools import islice
+
+
+def encode_cursor(key) -> str:
+    """Непрозрачный курсор keyset-пагинации из ключа последней строки страницы."""
+    raw = json.dumps(list(key), ensure_ascii=False, separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    """Ключ из курсора; ValueError, если курсор повреждён."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key = json.loads(raw.decode("utf-8"))
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Некорректный курсор")
+    if not isinstance(key, list):
+        raise ValueError("Некорректный курсор")
+    return key
+
+
+def parse_int_param(data, field, default, minimum, result):
+    """Целый параметр страницы (limit, offset) из query или JSON; default,
+    если параметр не передан или некорректен. Ошибки добавляются в result."""
+    value = data.get(field)
+    if value is None or value == "":
+        return default
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        result.add_error(field, f"Параметр {field} должен быть целым числом")
+        return default
+    if value < minimum:
+        result.add_error(field, f"Параметр {field} должен быть не меньше {minimum}")
+    return value
+
+
+def keyset_page(rows, limit, key):
+    """Первые limit строк из rows (итератор, отсортированный по key) и курсор
+    следующей страницы. rows может содержать больше строк — лишние не читаются."""
+    page = list(islice(rows, limit + 1))
+    if len(page) <= limit:
+        return page, None
+    page = page[:limit]
+    return page, encode_cursor(key(page[-1]))
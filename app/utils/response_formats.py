@@ -0,0 +1,56 @@
+import json
+
+from flask import Response, jsonify, request
+
+from app.utils.catalog_io import json_default
+
+try:
+    import msgpack
+except ImportError:  # необязательная зависимость
+    msgpack = None
+
+JSON = "application/json"
+# Таблица вместо массива объектов: {"columns": [...], "rows": [[...], ...]}
+COLUMNAR_JSON = "application/vnd.bikefit.columnar+json"
+MSGPACK = "application/msgpack"
+
+# Порядок задаёт предпочтение при равных q: без явного запроса — обычный JSON
+FORMATS = [JSON, COLUMNAR_JSON] + ([MSGPACK] if msgpack is not None else [])
+
+
+def to_columnar(rows):
+    """Список словарей (или один словарь) -> {"columns", "rows"}."""
+    if isinstance(rows, dict):
+        rows = [rows]
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    return {"columns": columns, "rows": [[row.get(c) for c in columns] for row in rows]}
+
+
+def _compact(payload):
+    data = payload.get("data")
+    if isinstance(data, dict) or (isinstance(data, list) and all(isinstance(r, dict) for r in data)):
+        return {**payload, "data": to_columnar(data)}
+    return payload
+
+
+def negotiate_format():
+    """Формат ответа по заголовку Accept; JSON, если клиент не просил другого."""
+    best = request.accept_mimetypes.best_match(FORMATS, default=JSON)
+    return best or JSON
+
+
+def render(payload, fmt=None) -> Response:
+    """Ответ с payload в формате fmt (по умолчанию — по Accept).
+
+    Компактные форматы отдают data таблицей, Decimal — числами с плавающей
+    точкой, даты — строками ISO 8601."""
+    fmt = fmt or negotiate_format()
+    if fmt == JSON:
+        response = jsonify(payload)
+    elif fmt == COLUMNAR_JSON:
+        body = json.dumps(_compact(payload), ensure_ascii=False, separators=(",", ":"), default=json_default)
+        response = Response(body, mimetype=COLUMNAR_JSON)
+    else:
+        response = Response(msgpack.packb(_compact(payload), default=json_default), mimetype=MSGPACK)
+    response.vary.add("Accept")
+    return response
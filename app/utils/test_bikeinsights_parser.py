@@ -0,0 +1,129 @@
+import json
+
+import pytest
+
+from app.utils.bikeinsights_parser import (
+    BikeinsightsStreamParser, parse_bikeinsights_html, _parse_objects_by_typename,
+)
+
+
+def _frame(stack, reach):
+    return {"__typename": "BikeGeometryFrame", "stack": stack, "reach": reach,
+            "seat_tube_angle": 73.5, "head_tube_angle": 71, "note": "braces } { in \"text\""}
+
+
+def _build(crank):
+    return {"__typename": "BikeGeometryBaseBuild", "crank_length": crank, "stem_length": 100}
+
+
+def _page(sizes, title="Trek Domane SL 6"):
+    data = {"props": {"geometries": [
+        {"size": label, "frame": _frame(stack, reach), "build": _build(crank)}
+        for label, stack, reach, crank in sizes
+    ]}}
+    return (
+        "<html><head><title>" + title + " - Bike Insights</title>"
+        "<style>h1 { color: red; }</style></head><body>"
+        '<p>He said "hello</p>'
+        '<h1 class="x header-title y"><span>' + title + "</span></h1>"
+        "<script>var f = function() { return '\"'; };</script>"
+        '<script id="__NEXT_DATA__" type="application/json">' + json.dumps(data) + "</script>"
+        "</body></html>"
+    )
+
+
+class TestParseObjectsByTypename:
+    def test_collects_all_typenames_in_one_pass(self):
+        html = _page([("S", 530, 375, 170), ("M", 560, 390, 172.5)])
+        found = _parse_objects_by_typename(html, ("BikeGeometryFrame", "BikeGeometryBaseBuild"))
+        assert [obj["stack"] for _, obj, _ in found["BikeGeometryFrame"]] == [530, 560]
+        assert [label for _, _, label in found["BikeGeometryFrame"]] == ["S", "M"]
+        assert [obj["crank_length"] for _, obj, _ in found["BikeGeometryBaseBuild"]] == [170, 172.5]
+
+    def test_braces_inside_strings_ignored(self):
+        html = '{"a": "}}}", "b": {"__typename": "T", "v": "{"}}'
+        found = _parse_objects_by_typename(html, ("T",))
+        assert [obj for _, obj, _ in found["T"]] == [{"__typename": "T", "v": "{"}]
+
+    def test_unclosed_object_is_skipped(self):
+        found = _parse_objects_by_typename('{"__typename": "T", "x": 1', ("T",))
+        assert found["T"] == []
+
+    def test_size_label_too_far_is_not_used(self):
+        html = '{"size": "XL", "pad": "' + "x" * 700 + '", "f": {"__typename": "T"}}'
+        found = _parse_objects_by_typename(html, ("T",))
+        assert found["T"][0][2] is None
+
+
+class TestParseBikeinsightsHtml:
+    def test_parse_page(self):
+        result = parse_bikeinsights_html(_page([("54", 550, 380, 172.5)]))
+        assert result["model"] == "Trek Domane SL 6"
+        assert result["sizes"] == [{
+            "label": "54", "stack": 550.0, "reach": 380.0, "seatAngle": 73.5,
+            "headAngle": 71.0, "crankLen": 172.5, "stemLen": 100.0,
+        }]
+
+    def test_no_geometry(self):
+        with pytest.raises(ValueError):
+            parse_bikeinsights_html("<html><title>Nothing</title></html>")
+
+
+def _feed(parser, data, chunk):
+    for i in range(0, len(data), chunk):
+        if parser.done:
+            return i
+        parser.feed(data[i:i + chunk])
+    return len(data)
+
+
+class TestBikeinsightsStreamParser:
+    @pytest.mark.parametrize("chunk", [1, 3, 64, 4096])
+    def test_matches_full_parse(self, chunk):
+        html = _page([("S", 530, 375, 170), ("M / М", 560, 390, 172.5)], title="Трек Домане")
+        parser = BikeinsightsStreamParser()
+        _feed(parser, html.encode(), chunk)
+        assert parser.close() == parse_bikeinsights_html(html)
+
+    def test_stops_after_geometry_script(self):
+        html = _page([("M", 560, 390, 172.5)]) + "<script>" + "var x = {a: 1};\n" * 10000 + "</script>"
+        data = html.encode()
+        parser = BikeinsightsStreamParser()
+        consumed = _feed(parser, data, 1024)
+        assert parser.done
+        assert consumed < len(data) // 10
+        assert parser.close()["sizes"][0]["stack"] == 560
+
+    def test_buffer_bounded_by_object_size(self):
+        noise = json.dumps({"items": [{"text": "lorem } ipsum " * 10, "id": i} for i in range(5000)]})
+        html = _page([("M", 560, 390, 172.5)]).replace("<body>", "<body><script>var n = " + noise + ";</script>")
+        data = html.encode()
+        assert len(data) > 3 * BikeinsightsStreamParser.MAX_OBJECT_CHARS
+
+        parser = BikeinsightsStreamParser()
+        peak = 0
+        for i in range(0, len(data), 4096):
+            parser.feed(data[i:i + 4096])
+            peak = max(peak, len(parser._buf))
+        assert peak <= BikeinsightsStreamParser.MAX_OBJECT_CHARS + 2 * 4096
+        assert parser.close() == parse_bikeinsights_html(html)
+
+    def test_long_string_across_chunks(self):
+        html = _page([("M", 560, 390, 172.5)]).replace(
+            "<body>", '<body><script>var s = {"blob": "' + "A" * 500000 + '"};</script>'
+        )
+        parser = BikeinsightsStreamParser()
+        _feed(parser, html.encode(), 8192)
+        assert parser.close() == parse_bikeinsights_html(html)
+
+    def test_max_bytes(self):
+        parser = BikeinsightsStreamParser(max_bytes=100)
+        parser.feed(b"x" * 100)
+        with pytest.raises(ValueError):
+            parser.feed(b"x")
+
+    def test_no_geometry(self):
+        parser = BikeinsightsStreamParser()
+        parser.feed(b"<html><title>Nothing</title></html>")
+        with pytest.raises(ValueError):
+            parser.close()
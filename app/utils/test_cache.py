@@ -0,0 +1,52 @@
+from app.utils import cache as cache_module
+from app.utils.cache import LRUCache
+
+
+class TestLRUCache:
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        assert cache.get("a") == 1
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+    def test_ttl_expiry(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+        cache = LRUCache(maxsize=10, ttl=5)
+        cache.set("a", 1)
+        now[0] += 4
+        assert cache.get("a") == 1
+        now[0] += 2
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_stats_and_pop(self):
+        cache = LRUCache(maxsize=10)
+        cache.set("a", 1)
+        cache.get("a")
+        cache.get("missing")
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+        assert cache.pop("a") == 1
+        assert cache.pop("a", "gone") == "gone"
+
+    def test_peek_leaves_stats_and_order(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        assert cache.peek("a") == 1
+        assert cache.peek("missing", "none") == "none"
+        assert (cache.stats()["hits"], cache.stats()["misses"]) == (0, 0)
+        cache.set("c", 3)
+        assert cache.peek("a") is None
+
+    def test_discard_if(self):
+        cache = LRUCache(maxsize=10)
+        for i in range(5):
+            cache.set(i, {"model": i % 2})
+        assert cache.discard_if(lambda key, value: value["model"] == 1) == 2
+        assert sorted(k for k in range(5) if cache.get(k) is not None) == [0, 2, 4]
@@ -0,0 +1,68 @@
+import io
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from app.utils.catalog_io import iter_csv_rows, iter_jsonl_rows, iter_rows, serialize_rows
+
+
+class TestCatalogReaders:
+    def test_csv_rows_skip_empty_cells(self):
+        data = b"model,size,stack,reach\nTrek,56,560,\nTrek,58,580,395\n"
+        rows = list(iter_csv_rows(io.BytesIO(data)))
+        assert rows == [
+            (2, {"model": "Trek", "size": "56", "stack": "560"}, None),
+            (3, {"model": "Trek", "size": "58", "stack": "580", "reach": "395"}, None),
+        ]
+
+    def test_csv_extra_values_reported(self):
+        rows = list(iter_csv_rows(io.BytesIO(b"model,size\nTrek,56,oops\n")))
+        assert rows[0][1] is None
+        assert rows[0][2]
+
+    def test_csv_bad_line_reported_and_reading_continues(self):
+        data = b"model,size\nTrek,56\nTrek," + b"x" * 200_000 + b"\nTrek,58\n"
+        rows = list(iter_csv_rows(io.BytesIO(data)))
+        assert [(line, row) for line, row, _ in rows] == [
+            (2, {"model": "Trek", "size": "56"}),
+            (3, None),
+            (4, {"model": "Trek", "size": "58"}),
+        ]
+        assert rows[1][2]
+
+    def test_jsonl_rows_and_errors(self):
+        data = b'{"model": "Trek", "size": "56"}\n\nnot json\n[1, 2]\n'
+        rows = list(iter_jsonl_rows(io.BytesIO(data)))
+        assert rows[0] == (1, {"model": "Trek", "size": "56"}, None)
+        assert [(line, row) for line, row, _ in rows[1:]] == [(3, None), (4, None)]
+        assert all(error for _, _, error in rows[1:])
+
+    def test_iter_rows_unknown_format(self):
+        try:
+            iter_rows(io.BytesIO(b""), "xml")
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("ValueError expected")
+
+
+class TestCatalogWriters:
+    ROWS = [
+        {"model": "Trek", "size": "56", "stack": Decimal("560.50"), "reach": None,
+         "created_at": datetime(2024, 1, 2, 3, 4, 5)},
+    ]
+
+    def test_ndjson_converts_decimal_and_datetime(self):
+        lines = list(serialize_rows(self.ROWS, ("model", "stack", "reach", "created_at"), "ndjson"))
+        assert json.loads(lines[0]) == {
+            "model": "Trek", "stack": 560.5, "reach": None, "created_at": "2024-01-02T03:04:05",
+        }
+
+    def test_csv_header_then_one_chunk_per_row(self):
+        chunks = list(serialize_rows(self.ROWS, ("model", "size", "stack", "reach"), "csv"))
+        assert chunks == ["model,size,stack,reach\r\n", "Trek,56,560.50,\r\n"]
+
+    def test_export_round_trips_through_import(self):
+        csv_text = "".join(serialize_rows(self.ROWS, ("model", "size", "stack", "reach"), "csv"))
+        rows = list(iter_csv_rows(io.StringIO(csv_text)))
+        assert rows == [(2, {"model": "Trek", "size": "56", "stack": "560.50"}, None)]
@@ -0,0 +1,109 @@
+import gzip
+
+import pytest
+from flask import Flask, Response, jsonify
+
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+
+from app.utils import compression
+from app.utils.compression import init_compression, negotiate_encoding, no_compression
+
+BIG = {"rows": [{"minseatpostLen": 250, "saddleRailLen": 60} for _ in range(200)]}
+
+
+def _make_app():
+    app = Flask(__name__)
+    init_compression(app)
+
+    @app.route("/big")
+    def big():
+        return jsonify(BIG)
+
+    @app.route("/small")
+    def small():
+        return jsonify({"ok": True})
+
+    @app.route("/raw")
+    @no_compression
+    def raw():
+        return jsonify(BIG)
+
+    @app.route("/stream")
+    def stream():
+        def rows():
+            for i in range(1000):
+                yield f'{{"id": {i}, "model": "Trek Domane"}}\n'
+        return Response(rows(), mimetype="application/x-ndjson")
+
+    return app
+
+
+def jsonify_text(data):
+    with _make_app().app_context():
+        return jsonify(data).get_data(as_text=True)
+
+
+@pytest.fixture()
+def client():
+    return _make_app().test_client()
+
+
+class TestNegotiate:
+    def test_prefers_by_quality(self):
+        assert negotiate_encoding(parse_accept_header("gzip;q=0.5, identity", Accept)) == "gzip"
+        assert negotiate_encoding(parse_accept_header("gzip;q=0", Accept)) is None
+        assert negotiate_encoding(parse_accept_header("deflate", Accept)) is None
+        assert negotiate_encoding(parse_accept_header("*", Accept)) in compression.CODECS
+
+
+class TestCompressResponse:
+    def test_gzip_large_json(self, client):
+        rv = client.get("/big", headers={"Accept-Encoding": "gzip"})
+        assert rv.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in rv.headers["Vary"]
+        assert len(rv.data) * 4 < len(jsonify_text(BIG))
+        assert gzip.decompress(rv.data).decode() == jsonify_text(BIG)
+
+    def test_without_accept_encoding(self, client):
+        rv = client.get("/big")
+        assert "Content-Encoding" not in rv.headers
+        assert "Accept-Encoding" in rv.headers["Vary"]
+
+    def test_small_response_not_compressed(self, client):
+        rv = client.get("/small", headers={"Accept-Encoding": "gzip"})
+        assert "Content-Encoding" not in rv.headers
+
+    def test_route_opt_out(self, client):
+        rv = client.get("/raw", headers={"Accept-Encoding": "gzip"})
+        assert "Content-Encoding" not in rv.headers
+
+    def test_streamed_response(self, client):
+        rv = client.get("/stream", headers={"Accept-Encoding": "gzip"}, buffered=False)
+        assert rv.is_streamed
+        assert rv.headers["Content-Encoding"] == "gzip"
+        assert "Content-Length" not in rv.headers
+        lines = gzip.decompress(rv.get_data()).decode().splitlines()
+        assert len(lines) == 1000
+
+    def test_etag_weakened(self):
+        app = _make_app()
+
+        @app.route("/tagged")
+        def tagged():
+            response = jsonify(BIG)
+            response.set_etag("abc")
+            return response
+
+        rv = app.test_client().get("/tagged", headers={"Accept-Encoding": "gzip"})
+        assert rv.headers["ETag"] == 'W/"abc"'
+
+    def test_optional_codecs(self, client):
+        if "br" in compression.CODECS:
+            import brotli
+            rv = client.get("/big", headers={"Accept-Encoding": "br"})
+            assert brotli.decompress(rv.data).decode() == jsonify_text(BIG)
+        if "zstd" in compression.CODECS:
+            import zstandard
+            rv = client.get("/stream", headers={"Accept-Encoding": "zstd"})
+            assert len(zstandard.ZstdDecompressor().decompressobj().decompress(rv.data).splitlines()) == 1000
@@ -0,0 +1,42 @@
+from flask import Flask
+
+from app.utils.conditional import conditional_json, make_etag
+
+_app = Flask(__name__)
+
+
+def _build():
+    _build.calls += 1
+    return {"success": True}
+
+
+class TestConditionalJson:
+    def setup_method(self):
+        _build.calls = 0
+
+    def test_make_etag_depends_on_every_part(self):
+        assert make_etag("sizes", 1, 2) == make_etag("sizes", 1, 2)
+        assert make_etag("sizes", 1, 2) != make_etag("sizes", 12)
+
+    def test_matching_get_returns_304_without_building(self):
+        etag = make_etag("x")
+        with _app.test_request_context(headers={"If-None-Match": f'"{etag}"'}):
+            response = conditional_json(etag, _build)
+        assert response.status_code == 304
+        assert response.get_etag() == (etag, False)
+        assert _build.calls == 0
+
+    def test_post_always_builds(self):
+        etag = make_etag("x")
+        with _app.test_request_context(method="POST", headers={"If-None-Match": f'"{etag}"'}):
+            response = conditional_json(etag, _build, public=True)
+        assert response.status_code == 200
+        assert response.headers["Cache-Control"].startswith("public, max-age=")
+        assert _build.calls == 1
+
+    def test_unknown_version_is_not_cached(self):
+        with _app.test_request_context():
+            response = conditional_json(None, _build)
+        assert response.status_code == 200
+        assert "ETag" not in response.headers
+        assert response.headers["Cache-Control"] == "no-store"
@@ -1,5 +1,11 @@
+import math
+
+import numpy as np
 import pytest
-from app.utils.geometry_calc import basic_fit, _angle_by_sides, _cos_th, _dist
+from app.utils.geometry_calc import (
+    basic_fit, basic_fit_batch, contact_points, fit_score_batch, geometry_columns,
+    FIT_GEOMETRY_FIELDS, FIT_ANTHROPOMETRY_FIELDS,
+)
 
 VALID_BIKE = {
     "model": "Trek Domane SL 6",
@@ -51,22 +57,6 @@ FULL_ANTHRO = {
 
 
 class TestGeometryCalcUnit:
-    def test_angle_by_sides_normal(self):
-        angle = _angle_by_sides(1.0, 1.0, 1.0)
-        assert abs(angle - 60.0) < 0.01
-
-    def test_angle_by_sides_zero_denom(self):
-        assert _angle_by_sides(0, 1, 1) is None
-        assert _angle_by_sides(1, 0, 1) is None
-
-    def test_cos_th_pythagorean(self):
-        result = _cos_th(3, 4, 90)
-        assert abs(result - 5.0) < 0.01
-
-    def test_dist(self):
-        assert abs(_dist((0, 0), (3, 4)) - 5.0) < 0.01
-        assert abs(_dist((1, 1), (1, 1))) < 0.001
-
     def test_basic_fit_no_anthropometry(self):
         result = basic_fit(VALID_BIKE, None)
         assert "error" in result
@@ -105,3 +95,105 @@ class TestGeometryCalcUnit:
         result = basic_fit(geo, FULL_ANTHRO)
         if "error" not in result:
             assert result["saddleOffset"] <= 0.5
+
+
+class TestBasicFitBatch:
+    def _columns(self, rows, fields):
+        return {f: np.array([r[f] for r in rows], dtype=float) for f in fields}
+
+    def test_batch_matches_scalar(self):
+        bikes = [VALID_BIKE, {**VALID_BIKE, "seatAngle": 74.5, "reach": 400.0}]
+        geo = {k: v[np.newaxis, :] for k, v in self._columns(bikes, FIT_GEOMETRY_FIELDS).items()}
+        riders = [FULL_ANTHRO, {**FULL_ANTHRO, "hip": 480, "upperarm": 340}, {**FULL_ANTHRO, "torsoMid": 520}]
+        anthro = {k: v[:, np.newaxis] for k, v in self._columns(riders, FIT_ANTHROPOMETRY_FIELDS).items()}
+
+        result = basic_fit_batch(geo, anthro)
+        assert result["torsoAngle"].shape == (3, 2)
+        assert result["valid"].all()
+        for r, rider in enumerate(riders):
+            for s, bike in enumerate(bikes):
+                expected = basic_fit(bike, rider)
+                for key in ("seatHight", "stemHight", "saddleOffset", "torsoAngle", "shifterAngle"):
+                    assert abs(result[key][r, s] - expected[key]) < 1e-9
+
+    def test_batch_degenerate_geometry_masked(self):
+        geo = self._columns([VALID_BIKE, VALID_BIKE], FIT_GEOMETRY_FIELDS)
+        anthro = {k: float(v) for k, v in FULL_ANTHRO.items()}
+        anthro["torsoMid"] = np.array([490.0, 0.0])
+        result = basic_fit_batch(geo, anthro)
+        assert result["valid"].tolist() == [True, False]
+
+    def test_batch_nan_masked(self):
+        geo = self._columns([VALID_BIKE, VALID_BIKE], FIT_GEOMETRY_FIELDS)
+        geo["stemLen"] = np.array([100.0, np.nan])
+        result = basic_fit_batch(geo, FULL_ANTHRO)
+        assert result["valid"].tolist() == [True, False]
+
+    def test_batch_missing_field(self):
+        geo = {k: v for k, v in VALID_BIKE.items() if k != "crankLen"}
+        with pytest.raises(KeyError):
+            basic_fit_batch(geo, FULL_ANTHRO)
+
+    def test_batch_torso_angle_by_sides(self):
+        # Длинные полозья: смещение седла не упирается в ограничение
+        geo = {**VALID_BIKE, "saddleRailLen": 1000.0}
+        result = basic_fit_batch(geo, FULL_ANTHRO)
+        (saddle_x, saddle_y), (hands_x, hands_y) = [
+            contact_points(geo, result["seatHight"], result["stemHight"], result["saddleOffset"])[p]
+            for p in ("saddle", "hands")
+        ]
+        seat = (saddle_x - geo["saddleLen"] / 8, saddle_y + FULL_ANTHRO["hipJointOffset"])
+        hands = (hands_x, hands_y)
+
+        upperarm, forearm = FULL_ANTHRO["upperarm"], FULL_ANTHRO["forearm"] * 1.2
+        arms = math.sqrt(upperarm**2 + forearm**2 - 2 * upperarm * forearm * math.cos(math.radians(155)))
+        torso = FULL_ANTHRO["torsoMid"]
+        d = math.dist(seat, hands)
+        expected = (
+            math.degrees(math.acos((d**2 + torso**2 - arms**2) / (2 * d * torso)))
+            + math.degrees(math.atan2(hands[1] - seat[1], hands[0] - seat[0]))
+        )
+        assert result["valid"]
+        assert abs(result["torsoAngle"] - expected) < 1e-9
+
+    def test_batch_unreachable_triangle_clipped(self):
+        # Туловище длиннее рук и расстояния до руля вместе: косинус
+        # обрезается до 1, угол туловища совпадает с направлением на руль
+        short = basic_fit_batch(VALID_BIKE, {**FULL_ANTHRO, "torsoMid": 5000})
+        longer = basic_fit_batch(VALID_BIKE, {**FULL_ANTHRO, "torsoMid": 6000})
+        assert short["valid"] and longer["valid"]
+        assert abs(short["torsoAngle"] - longer["torsoAngle"]) < 1e-9
+
+    def test_basic_fit_degenerate(self):
+        result = basic_fit(VALID_BIKE, {**FULL_ANTHRO, "torsoMid": 0})
+        assert "error" in result
+
+    def test_score_zero_inside_windows_and_inf_when_invalid(self):
+        fits = {
+            "torsoAngle": np.array([45.0, 55.0, 45.0]),
+            "seatHight": np.array([700.0, 700.0, 700.0]),
+            "valid": np.array([True, True, False]),
+        }
+        geo = {"seatTube": 560.0, "saddleHeight": 50.0, "minseatpostLen": 50.0, "maxseatpostLen": 250.0}
+        scores = fit_score_batch(geo, fits)
+        assert scores[0] == 0
+        assert abs(scores[1] - 5.0) < 1e-9
+        assert np.isinf(scores[2])
+
+    def test_score_unknown_seatpost_limits_not_penalised(self):
+        fits = {"torsoAngle": np.array([45.0]), "seatHight": np.array([900.0]), "valid": np.array([True])}
+        geo = {"seatTube": 560.0, "saddleHeight": 50.0, "minseatpostLen": np.nan, "maxseatpostLen": np.nan}
+        assert fit_score_batch(geo, fits)[0] == 0
+
+    def test_score_seatpost_exposure_excludes_saddle_height(self):
+        # Вылет штыря: 900 - 50 (седло) - 560 = 290 мм, на 40 мм выше окна;
+        # туловище на 2° вне окна → 2 + 0.1 * 40
+        fits = {"torsoAngle": np.array([52.0]), "seatHight": np.array([900.0]), "valid": np.array([True])}
+        geo = {"seatTube": 560.0, "saddleHeight": 50.0, "minseatpostLen": 50.0, "maxseatpostLen": 250.0}
+        assert abs(fit_score_batch(geo, fits)[0] - 6.0) < 1e-9
+
+    def test_geometry_columns_missing_as_nan(self):
+        cols = geometry_columns([VALID_BIKE, {**VALID_BIKE, "stemLen": None}])
+        assert cols["stemLen"][0] == 100.0
+        assert np.isnan(cols["stemLen"][1])
+        assert np.isnan(cols["minseatpostLen"]).all()
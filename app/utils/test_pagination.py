@@ -0,0 +1,43 @@
+import pytest
+
+from app.utils.pagination import decode_cursor, encode_cursor, keyset_page, parse_int_param
+from app.validators.bike_validator import ValidationResult
+
+
+class TestCursor:
+    def test_roundtrip(self):
+        assert decode_cursor(encode_cursor(("трек domane", 42))) == ["трек domane", 42]
+
+    @pytest.mark.parametrize("cursor", ["%%%", "bm90IGpzb24", "eyJhIjogMX0"])
+    def test_invalid(self, cursor):
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
+
+
+class TestKeysetPage:
+    def test_next_cursor_points_to_last_row(self):
+        rows = iter([{"id": i} for i in range(1, 6)])
+        page, cursor = keyset_page(rows, 2, lambda r: ("", r["id"]))
+        assert [r["id"] for r in page] == [1, 2]
+        assert decode_cursor(cursor) == ["", 2]
+        assert next(rows)["id"] == 4
+
+    def test_last_page_has_no_cursor(self):
+        page, cursor = keyset_page(iter([{"id": 1}]), 2, lambda r: ("", r["id"]))
+        assert len(page) == 1
+        assert cursor is None
+
+
+class TestParseIntParam:
+    def test_default_and_value(self):
+        result = ValidationResult(True)
+        assert parse_int_param({}, "limit", 20, 1, result) == 20
+        assert parse_int_param({"limit": ""}, "limit", 20, 1, result) == 20
+        assert parse_int_param({"limit": "7"}, "limit", 20, 1, result) == 7
+        assert result.is_valid
+
+    @pytest.mark.parametrize("value", ["x", "0", -1])
+    def test_errors(self, value):
+        result = ValidationResult(True)
+        parse_int_param({"limit": value}, "limit", 20, 1, result)
+        assert [e["field"] for e in result.errors] == ["limit"]
@@ -0,0 +1,67 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from flask import Flask
+
+from app.utils import response_formats
+from app.utils.response_formats import COLUMNAR_JSON, JSON, MSGPACK, render, to_columnar
+
+_app = Flask(__name__)
+
+PAYLOAD = {
+    "success": True,
+    "data": [
+        {"id": 1, "size": "54", "stack": Decimal("550.50"), "created_at": datetime(2024, 5, 1, 12, 0)},
+        {"id": 2, "size": "56", "stack": Decimal("565.00"), "created_at": datetime(2024, 5, 2, 12, 0)},
+    ],
+}
+
+
+class TestToColumnar:
+    def test_rows(self):
+        assert to_columnar([{"a": 1, "b": 2}, {"b": 3, "c": 4}]) == {
+            "columns": ["a", "b", "c"],
+            "rows": [[1, 2, None], [None, 3, 4]],
+        }
+
+    def test_single_row(self):
+        assert to_columnar({"a": 1}) == {"columns": ["a"], "rows": [[1]]}
+
+
+class TestRender:
+    def test_default_is_json(self):
+        with _app.test_request_context(headers={"Accept": "application/json, text/plain, */*"}):
+            response = render({"success": True, "data": [{"id": 1}]})
+        assert response.mimetype == JSON
+        assert response.get_json() == {"success": True, "data": [{"id": 1}]}
+        assert "Accept" in response.headers["Vary"]
+
+    def test_columnar_json(self):
+        with _app.test_request_context(headers={"Accept": COLUMNAR_JSON}):
+            response = render(PAYLOAD)
+        assert response.mimetype == COLUMNAR_JSON
+        body = json.loads(response.get_data())
+        assert body["success"] is True
+        assert body["data"]["columns"] == ["id", "size", "stack", "created_at"]
+        assert body["data"]["rows"][0] == [1, "54", 550.5, "2024-05-01T12:00:00"]
+
+    def test_non_tabular_data_kept(self):
+        with _app.test_request_context(headers={"Accept": COLUMNAR_JSON}):
+            response = render({"success": True, "data": 42})
+        assert json.loads(response.get_data()) == {"success": True, "data": 42}
+
+    def test_msgpack(self):
+        msgpack = pytest.importorskip("msgpack")
+        with _app.test_request_context(headers={"Accept": MSGPACK}):
+            response = render(PAYLOAD)
+        assert response.mimetype == MSGPACK
+        body = msgpack.unpackb(response.get_data())
+        assert body["data"]["rows"][1][2] == 565.0
+
+    def test_msgpack_unavailable_falls_back_to_json(self, monkeypatch):
+        monkeypatch.setattr(response_formats, "FORMATS", [JSON, COLUMNAR_JSON])
+        with _app.test_request_context(headers={"Accept": MSGPACK}):
+            response = render({"success": True})
+        assert response.mimetype == JSON
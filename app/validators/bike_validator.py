@@ -1,5 +1,7 @@
 from typing import Dict, Any, Optional, List
 
+from app.utils.pagination import decode_cursor, parse_int_param
+
 
 class ValidationResult:
     def __init__(self, is_valid: bool, errors: Optional[list] = None, data: Optional[Dict[str, Any]] = None):
@@ -40,8 +42,11 @@ _PARAM_RANGES = {
     "maxseatpostLen": {"min": 100,  "max": 250,  "name": "Макс. высота установки подседельного штыря"},
 }
 
+# Максимальная длина текстовых полей (VARCHAR в bike_models и bike_sizes)
+_TEXT_MAX_LENGTHS = {"model": 255, "size": 50}
+
 # Параметры с дефолтными значениями (не обязательны к заполнению)
-_OPTIONAL_DEFAULTS = {
+OPTIONAL_DEFAULTS = {
     "minStemHight":   30,
     "maxStemHight":   70,
     "shifterReach":   70,
@@ -59,6 +64,48 @@ _SHARED_PARAMS = {
 }
 
 
+def _validate_bike(bike: Dict[str, Any], idx: int, result: ValidationResult, fill_defaults: bool = True) -> None:
+    size = str(bike.get("size") or "").strip()
+    size_label = f"размер '{size}'" if size else f"размер #{idx + 1}"
+
+    for param, limits in _PARAM_RANGES.items():
+        value = bike.get(param)
+
+        if (value is None or value == "") and param in OPTIONAL_DEFAULTS and fill_defaults:
+            bike[param] = OPTIONAL_DEFAULTS[param]
+            continue
+
+        if value is None or value == "":
+            continue
+
+        is_shared = param in _SHARED_PARAMS
+        field_name = param if is_shared else (f"{param}_{idx}" if idx > 0 else param)
+        context = "" if is_shared else f" для {size_label}"
+
+        try:
+            value = float(value)
+            bike[param] = value
+            if value < limits["min"]:
+                result.add_error(field_name, f"{limits['name']}{context} слишком мало (минимум {limits['min']})")
+            elif value > limits["max"]:
+                result.add_error(field_name, f"{limits['name']}{context} слишком велико (максимум {limits['max']})")
+        except (ValueError, TypeError):
+            result.add_error(field_name, f"{limits['name']}{context} должно быть числом")
+
+    # Логические проверки min/max (если одна из границ не задана — пропускаем)
+    try:
+        if float(bike.get("minStemHight")) > float(bike.get("maxStemHight")):
+            result.add_error("minStemHight", f"Для {size_label} минимальная высота выноса не может быть больше максимальной")
+    except (ValueError, TypeError):
+        pass
+
+    try:
+        if float(bike.get("minseatpostLen")) > float(bike.get("maxseatpostLen")):
+            result.add_error("minseatpostLen", f"Для {size_label} минимальная высота подседельного штыря не может быть больше максимальной")
+    except (ValueError, TypeError):
+        pass
+
+
 def validate_bike_data(bikes: List[Dict[str, Any]]) -> ValidationResult:
     result = ValidationResult(True)
 
@@ -67,47 +114,97 @@ def validate_bike_data(bikes: List[Dict[str, Any]]) -> ValidationResult:
         return result
 
     for idx, bike in enumerate(bikes):
-        size = bike.get("size", "").strip()
-        size_label = f"размер '{size}'" if size else f"размер #{idx + 1}"
-
-        for param, limits in _PARAM_RANGES.items():
-            value = bike.get(param)
-
-            if (value is None or value == "") and param in _OPTIONAL_DEFAULTS:
-                bike[param] = _OPTIONAL_DEFAULTS[param]
-                continue
-
-            if value is None or value == "":
-                continue
-
-            is_shared = param in _SHARED_PARAMS
-            field_name = param if is_shared else (f"{param}_{idx}" if idx > 0 else param)
-            context = "" if is_shared else f" для {size_label}"
-
-            try:
-                value = float(value)
-                bike[param] = value
-                if value < limits["min"]:
-                    result.add_error(field_name, f"{limits['name']}{context} слишком мало (минимум {limits['min']})")
-                elif value > limits["max"]:
-                    result.add_error(field_name, f"{limits['name']}{context} слишком велико (максимум {limits['max']})")
-            except (ValueError, TypeError):
-                result.add_error(field_name, f"{limits['name']}{context} должно быть числом")
-
-        # Логические проверки min/max
-        try:
-            if float(bike.get("minStemHight", 0)) > float(bike.get("maxStemHight", 0)):
-                result.add_error("minStemHight", f"Для {size_label} минимальная высота выноса не может быть больше максимальной")
-        except (ValueError, TypeError):
-            pass
+        _validate_bike(bike, idx, result)
+
+    if result.is_valid:
+        result.data = bikes
+
+    return result
+
+
+def validate_bike_row(bike: Dict[str, Any]) -> ValidationResult:
+    """Проверка одной строки массового импорта: модель, размер и диапазоны параметров.
+
+    Незаполненные необязательные параметры остаются пустыми: значения по
+    умолчанию (OPTIONAL_DEFAULTS) подставляются только при вставке нового размера."""
+    result = ValidationResult(True)
+
+    if not isinstance(bike, dict):
+        result.add_error("data", "Строка должна содержать объект с параметрами велосипеда")
+        return result
+
+    for field, name in (("model", "Модель"), ("size", "Размер")):
+        value = bike.get(field)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = str(value)
+        if not isinstance(value, str) or not value.strip():
+            result.add_error(field, f"Поле {name} обязательно")
+        elif len(value.strip()) > _TEXT_MAX_LENGTHS[field]:
+            result.add_error(field, f"Поле {name} не длиннее {_TEXT_MAX_LENGTHS[field]} символов")
+        else:
+            bike[field] = value.strip()
+
+    _validate_bike(bike, 0, result, fill_defaults=False)
+
+    if result.is_valid:
+        result.data = bike
+
+    return result
+
+
+SEARCH_MIN_LENGTH = 2
+SEARCH_MAX_LENGTH = 100
+
 
+def validate_list_params(data: Dict[str, Any], default_limit: int = 50, max_limit: int = 200) -> ValidationResult:
+    """Параметры постраничного списка моделей: limit, cursor и строка поиска q.
+
+    cursor декодируется в пару [ключ сортировки, id]."""
+    result = ValidationResult(True)
+    values = {
+        "limit": min(parse_int_param(data, "limit", default_limit, 1, result), max_limit),
+        "cursor": None,
+        "q": None,
+    }
+
+    cursor = data.get("cursor")
+    if cursor:
         try:
-            if float(bike.get("minseatpostLen", 0)) > float(bike.get("maxseatpostLen", 0)):
-                result.add_error("minseatpostLen", f"Для {size_label} минимальная высота подседельного штыря не может быть больше максимальной")
-        except (ValueError, TypeError):
-            pass
+            key = decode_cursor(cursor)
+        except ValueError as e:
+            result.add_error("cursor", str(e))
+        else:
+            if len(key) != 2 or not isinstance(key[0], str) or not isinstance(key[1], int):
+                result.add_error("cursor", "Некорректный курсор")
+            values["cursor"] = key
+
+    q = (data.get("q") or "").strip()
+    if len(q) > SEARCH_MAX_LENGTH:
+        result.add_error("q", f"Строка поиска не должна быть длиннее {SEARCH_MAX_LENGTH} символов")
+    values["q"] = q or None
 
     if result.is_valid:
-        result.data = bikes
+        result.data = values
+
+    return result
+
+
+def validate_search_params(data: Dict[str, Any], default_limit: int = 20, max_limit: int = 50) -> ValidationResult:
+    """Параметры нечёткого поиска моделей: обязательная строка q и limit."""
+    result = ValidationResult(True)
+    values = {
+        "limit": min(parse_int_param(data, "limit", default_limit, 1, result), max_limit),
+        "q": None,
+    }
+
+    q = (data.get("q") or "").strip()
+    if len(q) < SEARCH_MIN_LENGTH:
+        result.add_error("q", f"Строка поиска должна содержать не меньше {SEARCH_MIN_LENGTH} символов")
+    elif len(q) > SEARCH_MAX_LENGTH:
+        result.add_error("q", f"Строка поиска не должна быть длиннее {SEARCH_MAX_LENGTH} символов")
+    values["q"] = q
+
+    if result.is_valid:
+        result.data = values
 
     return result
@@ -1,5 +1,7 @@
 from typing import Dict, Any, Optional
 
+from app.utils.pagination import parse_int_param
+
 
 class ValidationResult:
     def __init__(self, is_valid: bool, errors: Optional[list] = None, data: Optional[Dict[str, Any]] = None):
@@ -181,3 +183,77 @@ def validate_size_id(data: Dict[str, Any]) -> ValidationResult:
         result.data = {"size_id": size_id}
 
     return result
+
+
+def validate_bike_model_id(data: Dict[str, Any]) -> ValidationResult:
+    result = ValidationResult(True)
+
+    if not data:
+        result.add_error("data", "Отсутствуют данные запроса")
+        return result
+
+    bike_model_id = data.get("bike_model_id")
+
+    if bike_model_id is None:
+        result.add_error("bike_model_id", "ID модели велосипеда обязателен")
+    elif not isinstance(bike_model_id, int) or bike_model_id <= 0:
+        result.add_error("bike_model_id", "ID модели велосипеда должен быть положительным числом")
+
+    if result.is_valid:
+        result.data = {"bike_model_id": bike_model_id}
+
+    return result
+
+
+COMPARE_MAX_ITEMS = 6
+# Вместо имени сохранённой посадки: базовая посадка по антропометрии
+BASIC_FIT = "basic"
+
+
+def validate_compare_data(data: Dict[str, Any]) -> ValidationResult:
+    """Список сравниваемых посадок: [{"size_id": int, "fit": имя | "basic"}]."""
+    result = ValidationResult(True)
+
+    if not data:
+        result.add_error("data", "Отсутствуют данные запроса")
+        return result
+
+    items = data.get("items")
+    if not isinstance(items, list) or len(items) < 2:
+        result.add_error("items", "Укажите не меньше двух посадок для сравнения")
+        return result
+    if len(items) > COMPARE_MAX_ITEMS:
+        result.add_error("items", f"Можно сравнить не больше {COMPARE_MAX_ITEMS} посадок")
+        return result
+
+    values = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            result.add_error(f"items[{i}]", "Элемент должен быть объектом")
+            continue
+        size_id = item.get("size_id")
+        fit = item.get("fit", BASIC_FIT)
+        if not isinstance(size_id, int) or isinstance(size_id, bool) or size_id <= 0:
+            result.add_error(f"items[{i}].size_id", "ID размера велосипеда должен быть положительным числом")
+        if not isinstance(fit, str) or not fit.strip():
+            result.add_error(f"items[{i}].fit", "Укажите имя посадки или basic")
+        else:
+            values.append({"size_id": size_id, "fit": fit.strip()})
+
+    if result.is_valid:
+        result.data = values
+
+    return result
+
+
+def validate_pagination(data: Dict[str, Any], default_limit: int = 20, max_limit: int = 100) -> ValidationResult:
+    result = ValidationResult(True)
+    values = {
+        "limit": min(parse_int_param(data, "limit", default_limit, 1, result), max_limit),
+        "offset": parse_int_param(data, "offset", 0, 0, result),
+    }
+
+    if result.is_valid:
+        result.data = values
+
+    return result
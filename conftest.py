@@ -39,10 +39,13 @@ _mock_db_spec.loader.exec_module(_mock_db_direct)
 
 _fake_db_mod = types.ModuleType('app.models.db')
 _fake_db_mod.get_conn = _mock_db_direct.get_conn
+_fake_db_mod.shared_connection = _mock_db_direct.shared_connection
 sys.modules['app.models.db'] = _fake_db_mod
 
 from app.models import mock_dao   # noqa: E402
 import app.models.dao as _dao_module  # noqa: E402
+from app.models import catalog as _catalog  # noqa: E402
+from app.services import bikeinsights_service as _bikeinsights  # noqa: E402
 
 
 @pytest.fixture(autouse=True)
@@ -53,6 +56,7 @@ def reset_mock_db():
         "bike_sizes": [],
         "anthropometry": [],
         "fit_settings": [],
+        "parse_jobs": [],
     }
     mock_dao._counters = {
         "users": 1,
@@ -61,6 +65,9 @@ def reset_mock_db():
         "anthropometry": 1,
         "fit_settings": 1,
     }
+    _catalog.invalidate()
+    _bikeinsights.clear_cache()
+    _bikeinsights.clear_jobs()
 
 
 @pytest.fixture()
@@ -27,12 +27,12 @@ export const bikesApi = {
   },
 
   getSizes: async (bikeModelId) => {
-    const res = await client.post('/bikes/sizes', { bike_model_id: bikeModelId });
+    const res = await client.get('/bikes/sizes', { params: { bike_model_id: bikeModelId } });
     return res.data.data ?? res.data;
   },
 
   getGeometry: async (sizeId) => {
-    const res = await client.post('/bikes/geometry', { size_id: sizeId });
+    const res = await client.get('/bikes/geometry', { params: { size_id: sizeId } });
     return res.data.data ?? res.data;
   },
 
@@ -21,6 +21,16 @@ export const fitsApi = {
     return res.data.data ?? res.data;
   },
 
+  getBootstrap: async (sizeId) => {
+    const res = await client.get('/fits/bootstrap', { params: { size_id: sizeId } });
+    return res.data.data ?? res.data;
+  },
+
+  compare: async (items) => {
+    const res = await client.post('/fits/compare', { items });
+    return res.data.data ?? res.data;
+  },
+
   deleteFit: async (fitName, sizeId) => {
     const res = await client.post('/fits/delete', { fit_name: fitName, size_id: sizeId });
     return res.data;
@@ -1,6 +1,14 @@
+import os
+
 from app import create_app
+from app.models.cache_listener import start_cache_listener
 
 app = create_app()
 
+# Каждый процесс gunicorn импортирует main сам (без --preload), поэтому
+# слушатель запускается в каждом воркере
+if os.environ.get("CACHE_LISTENER", "1") != "0":
+    start_cache_listener()
+
 if __name__ == "__main__":
     app.run(debug=True)
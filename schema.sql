@@ -108,3 +108,165 @@ CREATE INDEX idx_bike_sizes_bike_model_id ON bike_sizes(bike_model_id);
 CREATE INDEX idx_anthropometry_user_id ON anthropometry(user_id);
 CREATE INDEX idx_fit_settings_user_id ON fit_settings(user_id);
 CREATE INDEX idx_fit_settings_bike_id ON fit_settings(bike_id);
+
+-- Уведомления об изменениях каталога и антропометрии для сброса кэшей
+-- в процессах приложения (app/models/cache_listener.py слушает канал
+-- bikefit_cache). Триггеры уровня оператора отправляют одно уведомление на
+-- каждую затронутую модель (пользователя для антропометрии), а не на каждую
+-- строку; одинаковые уведомления в одной транзакции PostgreSQL схлопывает.
+-- Переходные таблицы нельзя объявить у триггера на несколько событий,
+-- поэтому на каждую таблицу по три триггера
+CREATE OR REPLACE FUNCTION notify_cache_invalidation() RETURNS trigger AS $$
+DECLARE
+    key_field TEXT;
+    key_column TEXT;
+    changed TEXT;
+    key_value INTEGER;
+BEGIN
+    IF TG_TABLE_NAME = 'bike_models' THEN
+        key_field := 'bike_model_id';
+        key_column := 'id';
+    ELSIF TG_TABLE_NAME = 'bike_sizes' THEN
+        key_field := 'bike_model_id';
+        key_column := 'bike_model_id';
+    ELSE
+        key_field := 'user_id';
+        key_column := 'user_id';
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        changed := format('SELECT %I FROM new_rows', key_column);
+    ELSIF TG_OP = 'DELETE' THEN
+        changed := format('SELECT %I FROM old_rows', key_column);
+    ELSE
+        changed := format('SELECT %1$I FROM new_rows UNION SELECT %1$I FROM old_rows', key_column);
+    END IF;
+
+    FOR key_value IN EXECUTE 'SELECT DISTINCT key FROM (' || changed || ') AS changed(key)' LOOP
+        PERFORM pg_notify(
+            'bikefit_cache',
+            json_build_object('table', TG_TABLE_NAME, key_field, key_value)::text
+        );
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER bike_models_insert_notify_cache
+    AFTER INSERT ON bike_models
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_cache_invalidation();
+
+CREATE TRIGGER bike_models_update_notify_cache
+    AFTER UPDATE ON bike_models
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_cache_invalidation();
+
+CREATE TRIGGER bike_models_delete_notify_cache
+    AFTER DELETE ON bike_models
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_cache_invalidation();
+
+CREATE TRIGGER bike_sizes_insert_notify_cache
+    AFTER INSERT ON bike_sizes
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_cache_invalidation();
+
+CREATE TRIGGER bike_sizes_update_notify_cache
+    AFTER UPDATE ON bike_sizes
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_cache_invalidation();
+
+CREATE TRIGGER bike_sizes_delete_notify_cache
+    AFTER DELETE ON bike_sizes
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_cache_invalidation();
+
+CREATE TRIGGER anthropometry_insert_notify_cache
+    AFTER INSERT ON anthropometry
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_cache_invalidation();
+
+CREATE TRIGGER anthropometry_update_notify_cache
+    AFTER UPDATE ON anthropometry
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_cache_invalidation();
+
+CREATE TRIGGER anthropometry_delete_notify_cache
+    AFTER DELETE ON anthropometry
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_cache_invalidation();
+
+-- Keyset-пагинация списков моделей: модели пользователя по (model, id),
+-- очередь модерации по (created_at, id)
+CREATE INDEX idx_bike_models_user_model_id ON bike_models(user_id, model, id);
+CREATE INDEX idx_bike_models_pending_created ON bike_models(created_at, id) WHERE status = 'pending';
+
+-- Нечёткий поиск по названию модели (/bikes/search): триграммный индекс
+-- обслуживает и оператор <% (word_similarity), и ILIKE '%...%'
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX idx_bike_models_model_trgm ON bike_models USING gin (model gin_trgm_ops);
+
+-- Версия модели для ETag (/bikes/list, /bikes/sizes, /bikes/geometry):
+-- растёт при любом изменении строки модели или её размеров
+ALTER TABLE bike_models ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+
+CREATE OR REPLACE FUNCTION bump_bike_model_version() RETURNS trigger AS $$
+BEGIN
+    IF NEW.version = OLD.version THEN
+        NEW.version := OLD.version + 1;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER bike_models_bump_version
+    BEFORE UPDATE ON bike_models
+    FOR EACH ROW EXECUTE FUNCTION bump_bike_model_version();
+
+-- Изменения размеров поднимают версию модели один раз на оператор: массовый
+-- импорт обновляет строку каждой затронутой модели однократно. Переходные
+-- таблицы нельзя объявить у триггера на несколько событий, поэтому триггеров три
+CREATE OR REPLACE FUNCTION bump_bike_sizes_model_version() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE bike_models SET version = version + 1
+        WHERE id IN (SELECT bike_model_id FROM new_rows);
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE bike_models SET version = version + 1
+        WHERE id IN (SELECT bike_model_id FROM old_rows);
+    ELSE
+        UPDATE bike_models SET version = version + 1
+        WHERE id IN (SELECT bike_model_id FROM new_rows UNION SELECT bike_model_id FROM old_rows);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER bike_sizes_insert_bump_version
+    AFTER INSERT ON bike_sizes
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_bike_sizes_model_version();
+
+CREATE TRIGGER bike_sizes_update_bump_version
+    AFTER UPDATE ON bike_sizes
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_bike_sizes_model_version();
+
+CREATE TRIGGER bike_sizes_delete_bump_version
+    AFTER DELETE ON bike_sizes
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_bike_sizes_model_version();
+
+-- Фоновые задания разбора bikeinsights (POST /bikes/parse_url с async):
+-- состояние в БД, чтобы опрос задания работал на любом воркере
+CREATE TABLE parse_jobs (
+    id VARCHAR(32) PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    url TEXT NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    result JSONB,
+    error TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX idx_parse_jobs_created_at ON parse_jobs(created_at);
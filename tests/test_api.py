@@ -238,6 +238,117 @@ class TestBikesList:
         rv = client.get('/bikes/list')
         assert rv.status_code == 200
 
+    def test_list_bikes_merges_own_and_public(self, app):
+        with app.test_client() as owner:
+            owner.post('/auth/register', json={
+                'username': 'owner', 'password': 'Password1!', 'confirm_password': 'Password1!'})
+            owner.post('/auth/login', json={'username': 'owner', 'password': 'Password1!'})
+            owner.post('/bikes/add', json=[{**VALID_BIKE, 'model': 'Zeta Road'}])
+            owner.post('/bikes/add', json=[{**VALID_BIKE, 'model': 'Argon Gallium'}])
+            bikes = {b['model']: b['id'] for b in owner.get('/bikes/user_bikes').get_json()['data']}
+
+        with app.test_client() as other:
+            other.post('/auth/register', json={
+                'username': 'other', 'password': 'Password1!', 'confirm_password': 'Password1!'})
+            other.post('/auth/login', json={'username': 'other', 'password': 'Password1!'})
+            other.post('/bikes/add', json=[{**VALID_BIKE, 'model': 'Merida Scultura'}])
+            assert [b['model'] for b in other.get('/bikes/list').get_json()['data']] == ['Merida Scultura']
+
+            from app.services import bike_service
+            bike_service.set_bike_visibility(bikes['Zeta Road'], True)
+            bike_service.set_bike_visibility(bikes['Argon Gallium'], True)
+            models = [b['model'] for b in other.get('/bikes/list').get_json()['data']]
+            assert models == ['Argon Gallium', 'Merida Scultura', 'Zeta Road']
+
+    def test_list_bikes_reads_own_models_once(self, auth_client, monkeypatch):
+        from app.models import dao
+        auth_client.post('/bikes/add', json=[VALID_BIKE])
+        calls = []
+        load = dao.get_user_bike_models
+        monkeypatch.setattr(dao, 'get_user_bike_models', lambda user_id: calls.append(user_id) or load(user_id))
+        for query in ('', '?limit=5'):
+            calls.clear()
+            rv = auth_client.get('/bikes/list' + query)
+            assert rv.status_code == 200
+            assert [b['model'] for b in rv.get_json()['data']] == [VALID_BIKE['model']]
+            assert len(calls) == 1
+
+    def test_list_bikes_keyset_pages(self, auth_client):
+        for name in ('Cervelo R5', 'argon Krypton', 'BMC Teammachine', 'Canyon Ultimate', 'Bianchi Oltre'):
+            auth_client.post('/bikes/add', json=[{**VALID_BIKE, 'model': name}])
+
+        for url, key in (('/bikes/list', str.casefold), ('/bikes/user_bikes', None)):
+            seen, cursor = [], None
+            while True:
+                rv = auth_client.get(url, query_string={'limit': 2, **({'cursor': cursor} if cursor else {})})
+                assert rv.status_code == 200
+                data = rv.get_json()
+                assert len(data['data']) <= 2
+                seen.extend(b['model'] for b in data['data'])
+                cursor = data['next_cursor']
+                if cursor is None:
+                    break
+            assert seen == sorted(seen, key=key)
+            assert len(seen) == 5 and len(set(seen)) == 5
+
+    def test_list_bikes_search(self, auth_client):
+        for name in ('Canyon Ultimate', 'Canyon Aeroad', 'Trek Madone'):
+            auth_client.post('/bikes/add', json=[{**VALID_BIKE, 'model': name}])
+        for url in ('/bikes/list', '/bikes/user_bikes'):
+            rv = auth_client.get(url, query_string={'q': 'canyon'})
+            models = [b['model'] for b in rv.get_json()['data']]
+            assert sorted(models) == ['Canyon Aeroad', 'Canyon Ultimate']
+            rv = auth_client.get(url, query_string={'q': '100%'})
+            assert rv.get_json()['data'] == []
+
+    def test_list_bikes_bad_params(self, auth_client):
+        for params in ({'limit': 'x'}, {'limit': 0}, {'cursor': '%%%'}, {'q': 'x' * 101}):
+            rv = auth_client.get('/bikes/list', query_string=params)
+            assert rv.status_code == 400
+
+    def test_list_bikes_conditional(self, auth_client):
+        auth_client.post('/bikes/add', json=[VALID_BIKE])
+        rv = auth_client.get('/bikes/list')
+        etag = rv.headers['ETag']
+        assert rv.headers['Cache-Control'] == 'private, no-cache'
+
+        rv = auth_client.get('/bikes/list', headers={'If-None-Match': etag})
+        assert rv.status_code == 304
+
+        auth_client.post('/bikes/add', json=[{**VALID_BIKE, 'size': '58'}])
+        rv = auth_client.get('/bikes/list', headers={'If-None-Match': etag})
+        assert rv.status_code == 200
+        assert rv.headers['ETag'] != etag
+
+    def test_list_bikes_gzip_revalidates(self, auth_client):
+        for i in range(30):
+            auth_client.post('/bikes/add', json=[{**VALID_BIKE, 'model': f'Model {i}'}])
+        rv = auth_client.get('/bikes/list', headers={'Accept-Encoding': 'gzip'})
+        assert rv.headers['Content-Encoding'] == 'gzip'
+        etag = rv.headers['ETag']
+        assert etag.startswith('W/')
+
+        rv = auth_client.get('/bikes/list', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        assert rv.status_code == 304
+
+    def test_search_bikes(self, auth_client):
+        for name in ('Specialized Tarmac SL7', 'Trek Madone'):
+            auth_client.post('/bikes/add', json=[{**VALID_BIKE, 'model': name}])
+        rv = auth_client.get('/bikes/search', query_string={'q': 'tarmak'})
+        assert rv.status_code == 200
+        assert [b['model'] for b in rv.get_json()['data']] == ['Specialized Tarmac SL7']
+
+    def test_search_bikes_hides_private_models(self, app, auth_client):
+        auth_client.post('/bikes/add', json=[{**VALID_BIKE, 'model': 'Trek Madone'}])
+        rv = app.test_client().get('/bikes/search', query_string={'q': 'madone'})
+        assert rv.status_code == 200
+        assert rv.get_json()['data'] == []
+
+    def test_search_bikes_bad_params(self, client):
+        for params in ({}, {'q': 'a'}, {'q': 'x' * 101}, {'q': 'trek', 'limit': 'x'}):
+            rv = client.get('/bikes/search', query_string=params)
+            assert rv.status_code == 400
+
     def test_user_bikes_unauthenticated(self, client):
         # @auth_required returns 401 for unauthenticated requests
         rv = client.get('/bikes/user_bikes')
@@ -262,6 +373,25 @@ class TestBikesSizes:
         assert len(data['data']) == 1
         assert data['data'][0]['size'] == VALID_BIKE['size']
 
+    def test_get_sizes_conditional(self, auth_client):
+        auth_client.post('/bikes/add', json=[VALID_BIKE])
+        bike_id = auth_client.get('/bikes/user_bikes').get_json()['data'][0]['id']
+
+        rv = auth_client.get('/bikes/sizes', query_string={'bike_model_id': bike_id})
+        assert rv.status_code == 200
+        assert rv.get_json()['data'][0]['size'] == VALID_BIKE['size']
+        etag = rv.headers['ETag']
+
+        rv = auth_client.get('/bikes/sizes', query_string={'bike_model_id': bike_id},
+                             headers={'If-None-Match': etag})
+        assert rv.status_code == 304
+
+        auth_client.post('/bikes/add', json=[{**VALID_BIKE, 'size': '58'}])
+        rv = auth_client.get('/bikes/sizes', query_string={'bike_model_id': bike_id},
+                             headers={'If-None-Match': etag})
+        assert rv.status_code == 200
+        assert len(rv.get_json()['data']) == 2
+
     def test_get_sizes_unauthenticated(self, client):
         rv = client.post('/bikes/sizes', json={'bike_model_id': 1})
         assert rv.status_code in (401, 403)
@@ -0,0 +1,105 @@
+from unittest.mock import patch
+
+from app.routes import batch as batch_routes
+
+VALID_BIKE = {
+    "model": "Trek Domane SL 6",
+    "size": "56",
+    "seatTube": 560.0,
+    "seatAngle": 73.0,
+    "headTube": 150.0,
+    "headAngle": 72.0,
+    "bbdrop": 70.0,
+    "chainstay": 410.0,
+    "wheelbase": 1010.0,
+    "stack": 560.0,
+    "reach": 390.0,
+    "rimD": 622.0,
+    "tyreW": 28.0,
+    "crankLen": 172.5,
+    "stemLen": 100.0,
+    "stemAngle": 6.0,
+    "barReach": 80.0,
+    "barDrop": 128.0,
+    "saddleLen": 270.0,
+    "saddleRailLen": 60.0,
+    "saddleHeight": 50.0,
+    "maxStemHight": 50.0,
+    "shifterReach": 70.0,
+}
+
+
+def _add_bike(auth_client):
+    auth_client.post("/bikes/add", json=[VALID_BIKE])
+    return auth_client.get("/bikes/user_bikes").get_json()["data"][0]["id"]
+
+
+class TestBatch:
+    def test_results_in_order(self, auth_client):
+        bike_id = _add_bike(auth_client)
+        size_id = auth_client.get("/bikes/sizes", query_string={"bike_model_id": bike_id}).get_json()["data"][0]["id"]
+
+        rv = auth_client.post("/batch", json={"requests": [
+            {"method": "POST", "path": "/bikes/sizes", "body": {"bike_model_id": bike_id}},
+            {"path": f"/bikes/geometry?size_id={size_id}"},
+            {"method": "POST", "path": "/fits/list", "body": {"size_id": size_id}},
+            {"path": "/fits/get_anthropometry"},
+        ]})
+        assert rv.status_code == 200
+        results = rv.get_json()["results"]
+        assert [r["status"] for r in results] == [200, 200, 200, 404]
+        assert results[0]["body"]["data"][0]["id"] == size_id
+        assert results[1]["body"]["data"]["stack"] == VALID_BIKE["stack"]
+        assert results[2]["body"]["data"] == []
+
+    def test_uses_one_shared_connection(self, auth_client):
+        entered = []
+
+        def shared_connection():
+            class _Ctx:
+                def __enter__(self):
+                    entered.append(1)
+
+                def __exit__(self, *exc):
+                    return False
+            return _Ctx()
+
+        with patch.object(batch_routes, "shared_connection", shared_connection):
+            auth_client.post("/batch", json={"requests": [{"path": "/bikes/list"}, {"path": "/bikes/user_bikes"}]})
+        assert entered == [1]
+
+    def test_session_loaded_once(self, app, auth_client):
+        interface = app.session_interface
+        opened = []
+        open_session = interface.open_session
+
+        def counting_open_session(*args):
+            opened.append(1)
+            return open_session(*args)
+
+        with patch.object(interface, "open_session", counting_open_session):
+            rv = auth_client.post("/batch", json={"requests": [
+                {"path": "/bikes/user_bikes"}, {"path": "/fits/get_anthropometry"}, {"path": "/bikes/list"},
+            ]})
+        assert [r["status"] for r in rv.get_json()["results"]][0] == 200
+        assert opened == [1]
+
+    def test_sub_requests_keep_access_checks(self, client):
+        rv = client.post("/batch", json={"requests": [
+            {"path": "/bikes/list"},
+            {"method": "POST", "path": "/bikes/sizes", "body": {"bike_model_id": 1}},
+        ]})
+        assert [r["status"] for r in rv.get_json()["results"]] == [200, 401]
+
+    def test_write_routes_rejected(self, auth_client):
+        rv = auth_client.post("/batch", json={"requests": [
+            {"method": "POST", "path": "/bikes/add", "body": [VALID_BIKE]},
+            {"path": "/no/such/route"},
+        ]})
+        assert [r["status"] for r in rv.get_json()["results"]] == [404, 404]
+        assert auth_client.get("/bikes/user_bikes").get_json()["data"] == []
+
+    def test_invalid_payload(self, auth_client):
+        for payload in ({}, {"requests": []}, {"requests": [{"path": "bikes/list"}]},
+                        {"requests": [{"path": "/bikes/list"}] * (batch_routes.BATCH_MAX_ITEMS + 1)}):
+            assert auth_client.post("/batch", json=payload).status_code == 400
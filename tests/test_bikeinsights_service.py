@@ -0,0 +1,344 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.services import bikeinsights_service
+from app.models import mock_dao
+from app.utils.error_handler import AppError, NotFoundError, UpstreamError, ValidationError
+from app.utils.test_bikeinsights_parser import _page
+
+
+@pytest.fixture()
+def stub_server():
+    """Локальный HTTP-сервер вместо bikeinsights.com: path -> (status, body[, gate]).
+    Если задан gate (threading.Event), ответ задерживается до его установки;
+    для статусов 3xx body — адрес перенаправления (Location)."""
+    pages = {}
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            hits.append(self.path)
+            status, body, *gate = pages.get(self.path.split("?")[0], (404, b"not found"))
+            if gate:
+                gate[0].wait(5)
+            self.send_response(status)
+            if 300 <= status < 400:
+                self.send_header("Location", body.decode())
+                body = b""
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    yield base, pages, hits
+    server.shutdown()
+    server.server_close()
+
+
+class TestNormalizeUrl:
+    def test_equivalent_urls(self):
+        a = bikeinsights_service.normalize_url("HTTPS://BikeInsights.com:443/bike//trek/?b=2&a=1#geo")
+        b = bikeinsights_service.normalize_url("https://bikeinsights.com/bike/trek?a=1&b=2&utm_source=x")
+        assert a == b == "https://bikeinsights.com/bike/trek?a=1&b=2"
+
+    def test_distinct_paths(self):
+        assert (bikeinsights_service.normalize_url("https://bikeinsights.com/bike/a")
+                != bikeinsights_service.normalize_url("https://bikeinsights.com/bike/b"))
+
+
+class TestEnsureSupportedUrl:
+    def test_rejects_foreign_host(self):
+        with pytest.raises(AppError) as exc:
+            bikeinsights_service.ensure_supported_url("https://evil.com/bikeinsights.com")
+        assert exc.value.status_code == 400
+
+    def test_accepts_subdomain(self):
+        bikeinsights_service.ensure_supported_url("https://www.bikeinsights.com/bike/trek")
+
+
+class TestParseBikeUrl:
+    def test_repeat_request_served_from_cache(self, stub_server):
+        base, pages, hits = stub_server
+        pages["/bike/trek"] = (200, _page([("54", 550, 380, 172.5)]).encode())
+
+        first = bikeinsights_service.parse_bike_url(base + "/bike/trek")
+        second = bikeinsights_service.parse_bike_url(base + "/bike/trek/?utm_source=mail")
+        assert first == second
+        assert first["sizes"][0]["stack"] == 550
+        assert hits == ["/bike/trek"]
+
+    def test_same_page_under_different_urls_parsed_once(self, stub_server, monkeypatch):
+        base, pages, hits = stub_server
+        body = _page([("M", 560, 390, 172.5)]).encode()
+        pages["/bike/trek"] = (200, body)
+        pages["/bike/trek-2024"] = (200, body)
+
+        calls = []
+        original = bikeinsights_service.parse_bikeinsights_html
+        monkeypatch.setattr(bikeinsights_service, "parse_bikeinsights_html",
+                            lambda html: calls.append(1) or original(html))
+
+        fetch = bikeinsights_service.fetch_page
+        bikeinsights_service.parse_bike_url(base + "/bike/trek", fetch=fetch)
+        bikeinsights_service.parse_bike_url(base + "/bike/trek-2024", fetch=fetch)
+        assert len(hits) == 2
+        assert len(calls) == 1
+
+    def test_result_is_not_shared_between_callers(self, stub_server):
+        base, pages, _ = stub_server
+        pages["/bike/trek"] = (200, _page([("M", 560, 390, 172.5)]).encode())
+        bikeinsights_service.parse_bike_url(base + "/bike/trek")["sizes"].clear()
+        assert bikeinsights_service.parse_bike_url(base + "/bike/trek")["sizes"]
+
+    def test_parse_error_cached(self, stub_server):
+        base, pages, hits = stub_server
+        pages["/bike/empty"] = (200, b"<html><body>nothing here</body></html>")
+        for _ in range(2):
+            with pytest.raises(AppError) as exc:
+                bikeinsights_service.parse_bike_url(base + "/bike/empty")
+            assert exc.value.status_code == 422
+        assert hits == ["/bike/empty"]
+
+    def test_oversized_page_rejected(self, stub_server, monkeypatch):
+        base, pages, _ = stub_server
+        monkeypatch.setattr(bikeinsights_service, "MAX_PAGE_BYTES", 1024)
+        monkeypatch.setattr(bikeinsights_service, "STREAM_CHUNK_BYTES", 256)
+        pages["/bike/huge"] = (200, b"<html>" + b"x" * 4096 + b"</html>")
+        for fetch in (None, bikeinsights_service.fetch_page):
+            bikeinsights_service.clear_cache()
+            with pytest.raises(AppError) as exc:
+                bikeinsights_service.parse_bike_url(base + "/bike/huge", fetch=fetch)
+            assert exc.value.status_code == 422
+            assert "слишком большая" in exc.value.message
+
+    def test_redirect_to_other_host_rejected(self, stub_server):
+        base, pages, hits = stub_server
+        pages["/bike/away"] = (302, "https://evil.com/bike/a".encode())
+        with pytest.raises(UpstreamError):
+            bikeinsights_service.parse_bike_url(base + "/bike/away")
+        assert hits == ["/bike/away"]
+
+    def test_http_error_not_cached(self, stub_server):
+        base, pages, hits = stub_server
+        with pytest.raises(UpstreamError):
+            bikeinsights_service.parse_bike_url(base + "/bike/missing")
+        pages["/bike/missing"] = (200, _page([("M", 560, 390, 172.5)]).encode())
+        assert bikeinsights_service.parse_bike_url(base + "/bike/missing")["sizes"]
+        assert len(hits) == 2
+
+    def test_evicted_page_refetched(self, stub_server):
+        base, pages, hits = stub_server
+        pages["/bike/trek"] = (200, _page([("M", 560, 390, 172.5)]).encode())
+        bikeinsights_service.parse_bike_url(base + "/bike/trek")
+        bikeinsights_service.parse_cache.clear()
+        assert bikeinsights_service.parse_bike_url(base + "/bike/trek")["sizes"]
+        assert len(hits) == 2
+
+
+class TestParseJobs:
+    @pytest.fixture(autouse=True)
+    def _job_store(self, app):
+        # app подменяет функции dao на mock_dao: задания хранятся в mock-БД
+        yield
+
+    def test_job_completes(self, stub_server):
+        base, pages, _ = stub_server
+        pages["/bike/trek"] = (200, _page([("M", 560, 390, 172.5)]).encode())
+        job = bikeinsights_service.submit_parse_job(1, base + "/bike/trek")
+        status = bikeinsights_service.get_parse_job(1, job["job_id"], wait_seconds=5)
+        assert status["status"] == "done"
+        assert status["result"]["sizes"][0]["stack"] == 560
+
+    def test_inflight_jobs_for_same_url_share_fetch(self, stub_server):
+        base, pages, hits = stub_server
+        gate = threading.Event()
+        pages["/bike/trek"] = (200, _page([("M", 560, 390, 172.5)]).encode(), gate)
+
+        first = bikeinsights_service.submit_parse_job(1, base + "/bike/trek")
+        second = bikeinsights_service.submit_parse_job(2, base + "/bike/trek/#sizes")
+        assert first["job_id"] != second["job_id"]
+        assert bikeinsights_service.get_parse_job(1, first["job_id"])["status"] in ("pending", "running")
+
+        gate.set()
+        assert bikeinsights_service.get_parse_job(1, first["job_id"], 5)["status"] == "done"
+        assert bikeinsights_service.get_parse_job(2, second["job_id"], 5)["status"] == "done"
+        assert hits == ["/bike/trek"]
+
+    def test_failed_job_reports_error(self, stub_server):
+        base, _, _ = stub_server
+        job = bikeinsights_service.submit_parse_job(1, base + "/bike/missing")
+        status = bikeinsights_service.get_parse_job(1, job["job_id"], 5)
+        assert status["status"] == "failed"
+        assert "404" in status["error"]
+
+    def test_finished_job_visible_to_other_worker(self, stub_server):
+        base, pages, _ = stub_server
+        pages["/bike/trek"] = (200, _page([("M", 560, 390, 172.5)]).encode())
+        job = bikeinsights_service.submit_parse_job(1, base + "/bike/trek")
+        assert bikeinsights_service.get_parse_job(1, job["job_id"], 5)["status"] == "done"
+
+        # Другой воркер не знает future задания и читает итог из БД
+        bikeinsights_service.clear_jobs()
+        status = bikeinsights_service.get_parse_job(1, job["job_id"])
+        assert status["status"] == "done"
+        assert status["result"]["sizes"][0]["stack"] == 560
+
+    def test_other_worker_waits_by_polling(self, stub_server, monkeypatch):
+        base, pages, _ = stub_server
+        gate = threading.Event()
+        pages["/bike/trek"] = (200, _page([("M", 560, 390, 172.5)]).encode(), gate)
+        monkeypatch.setattr(bikeinsights_service, "JOB_POLL_INTERVAL", 0.01)
+        job = bikeinsights_service.submit_parse_job(1, base + "/bike/trek")
+
+        with bikeinsights_service._jobs_lock:
+            bikeinsights_service._futures.clear()
+        assert bikeinsights_service.get_parse_job(1, job["job_id"])["status"] == "pending"
+        gate.set()
+        assert bikeinsights_service.get_parse_job(1, job["job_id"], 5)["status"] == "done"
+
+    def test_job_of_other_user_not_found(self, stub_server):
+        base, pages, _ = stub_server
+        pages["/bike/trek"] = (200, _page([("M", 560, 390, 172.5)]).encode())
+        job = bikeinsights_service.submit_parse_job(1, base + "/bike/trek")
+        with pytest.raises(NotFoundError):
+            bikeinsights_service.get_parse_job(2, job["job_id"])
+
+
+class TestImportUrls:
+    @pytest.fixture(autouse=True)
+    def _allow_stub_host(self, monkeypatch):
+        monkeypatch.setattr(bikeinsights_service, "SUPPORTED_HOST", "127.0.0.1")
+        yield
+        bikeinsights_service.connections.close()
+
+    def test_urls_fetched_concurrently(self, stub_server):
+        base, pages, hits = stub_server
+        gate = threading.Event()
+        for name in ("a", "b", "c"):
+            pages[f"/bike/{name}"] = (200, _page([("M", 560, 390, 172.5)], title=name).encode(), gate)
+
+        def release_when_all_arrived():
+            for _ in range(100):
+                if len(hits) == 3:
+                    break
+                threading.Event().wait(0.05)
+            gate.set()
+
+        releaser = threading.Thread(target=release_when_all_arrived)
+        releaser.start()
+        result = bikeinsights_service.import_urls(1, [base + f"/bike/{n}" for n in "abc"])
+        releaser.join()
+        assert sorted(hits) == ["/bike/a", "/bike/b", "/bike/c"]
+        assert [r["model"] for r in result["results"]] == ["a", "b", "c"]
+        assert result["succeeded"] == 3
+
+    def test_errors_reported_per_url(self, stub_server):
+        base, pages, _ = stub_server
+        pages["/bike/ok"] = (200, _page([("M", 560, 390, 172.5)]).encode())
+        pages["/bike/empty"] = (200, b"<html></html>")
+        urls = [base + "/bike/ok", base + "/bike/missing", base + "/bike/empty", "https://evil.com/x"]
+        result = bikeinsights_service.import_urls(1, urls)
+        assert [r["success"] for r in result["results"]] == [True, False, False, False]
+        assert "404" in result["results"][1]["error"]
+        assert "геометрии" in result["results"][2]["error"]
+        assert result["results"][3]["url"] == "https://evil.com/x"
+        assert (result["succeeded"], result["failed"]) == (1, 3)
+
+    def test_duplicate_urls_fetched_once(self, stub_server):
+        base, pages, hits = stub_server
+        pages["/bike/trek"] = (200, _page([("M", 560, 390, 172.5)]).encode())
+        result = bikeinsights_service.import_urls(1, [base + "/bike/trek", base + "/bike/trek/"])
+        assert hits == ["/bike/trek"]
+        assert [r["url"] for r in result["results"]] == [base + "/bike/trek", base + "/bike/trek/"]
+
+    def test_connection_reused(self, stub_server):
+        base, pages, _ = stub_server
+        pages["/bike/a"] = (200, _page([("M", 560, 390, 172.5)], title="a").encode())
+        pages["/bike/b"] = (200, _page([("M", 560, 390, 172.5)], title="b").encode())
+        connections = bikeinsights_service.connections
+        connections.get(base + "/bike/a")
+        (idle,) = connections._idle.values()
+        first = idle[0]
+        connections.get(base + "/bike/b")
+        assert idle == [first]
+
+    def test_redirect_to_other_host_not_followed(self, stub_server):
+        base, pages, hits = stub_server
+        pages["/bike/a"] = (200, _page([("M", 560, 390, 172.5)], title="a").encode())
+        pages["/bike/moved"] = (301, b"/bike/a")
+        pages["/bike/away"] = (302, (base.replace("127.0.0.1", "localhost") + "/bike/a").encode())
+        connections = bikeinsights_service.connections
+        assert connections.get(base + "/bike/moved")
+        with pytest.raises(UpstreamError):
+            connections.get(base + "/bike/away")
+        assert hits == ["/bike/moved", "/bike/a", "/bike/away"]
+
+    def test_timeout_on_reused_connection_not_retried(self, monkeypatch):
+        import socket
+
+        class Conn:
+            requests = 0
+
+            def request(self, *args, **kwargs):
+                Conn.requests += 1
+                raise socket.timeout("timed out")
+
+            def close(self):
+                pass
+
+        connections = bikeinsights_service.KeepAliveConnections()
+        monkeypatch.setattr(connections, "_acquire", lambda key: (Conn(), True))
+        with pytest.raises(UpstreamError):
+            connections.get("http://127.0.0.1/bike/a")
+        assert Conn.requests == 1
+
+    def test_reset_reused_connection_retried(self, stub_server, monkeypatch):
+        base, pages, _ = stub_server
+        pages["/bike/a"] = (200, _page([("M", 560, 390, 172.5)], title="a").encode())
+
+        class Dropped:
+            def request(self, *args, **kwargs):
+                raise ConnectionResetError("reset")
+
+            def close(self):
+                pass
+
+        connections = bikeinsights_service.KeepAliveConnections()
+        acquire = connections._acquire
+        stale = [Dropped()]
+        monkeypatch.setattr(connections, "_acquire", lambda key: (stale.pop(), True) if stale else acquire(key))
+        assert connections.get(base + "/bike/a")
+        connections.close()
+
+    def test_save_persists_models(self, app, stub_server):
+        base, pages, _ = stub_server
+        pages["/bike/trek"] = (200, _page([("S", 530, 375, 170), ("M", 560, 390, 172.5)]).encode())
+        result = bikeinsights_service.import_urls(1, [base + "/bike/trek"], save=True)
+        item = result["results"][0]
+        assert item["success"] is True
+        sizes = [s for s in mock_dao._mock_db["bike_sizes"] if s["bike_model_id"] == item["bike_model_id"]]
+        assert sorted(s["size"] for s in sizes) == ["M", "S"]
+
+    def test_invalid_geometry_not_saved(self, app, stub_server):
+        base, pages, _ = stub_server
+        pages["/bike/odd"] = (200, _page([("M", 900, 390, 172.5)]).encode())
+        item = bikeinsights_service.import_urls(1, [base + "/bike/odd"], save=True)["results"][0]
+        assert item["success"] is False
+        assert item["errors"][0]["field"] == "stack"
+        assert mock_dao._mock_db["bike_sizes"] == []
+
+    def test_rejects_too_many_urls(self):
+        urls = ["https://bikeinsights.com/bike/x"] * (bikeinsights_service.BATCH_MAX_URLS + 1)
+        with pytest.raises(ValidationError):
+            bikeinsights_service.import_urls(1, urls)
@@ -1,3 +1,5 @@
+import io
+import json
 import pytest
 from unittest.mock import patch, MagicMock
 
@@ -70,6 +72,66 @@ class TestBikesGeometry:
         rv = auth_client.post("/bikes/geometry", json={})
         assert rv.status_code == 400
 
+    def test_get_geometry_conditional(self, auth_client, monkeypatch):
+        from app.models import catalog
+        bike_id, size_id = _add_bike_get_size_id(auth_client)
+        rv = auth_client.get("/bikes/geometry", query_string={"size_id": size_id})
+        assert rv.status_code == 200
+        assert rv.headers["Cache-Control"] == "private, no-cache"
+        etag = rv.headers["ETag"]
+
+        # При неизменной версии строка геометрии не читается
+        catalog.geometry_cache.invalidate()
+        with patch.object(catalog.dao, "get_bike_geometry_with_model", side_effect=AssertionError):
+            rv = auth_client.get("/bikes/geometry", query_string={"size_id": size_id},
+                                 headers={"If-None-Match": etag})
+        assert rv.status_code == 304
+        assert rv.data == b""
+        assert rv.headers["ETag"] == etag
+
+        auth_client.post("/bikes/add", json=[{**VALID_BIKE, "size": "58"}])
+        rv = auth_client.get("/bikes/geometry", query_string={"size_id": size_id},
+                             headers={"If-None-Match": etag})
+        assert rv.status_code == 200
+        assert rv.headers["ETag"] != etag
+
+    def test_get_geometry_without_if_none_match_reads_once(self, auth_client):
+        from app.models import catalog, dao
+        _, size_id = _add_bike_get_size_id(auth_client)
+        catalog.geometry_cache.invalidate()
+        misses = catalog.geometry_cache.stats()["misses"]
+        with patch.object(dao, "get_bike_size_version", side_effect=AssertionError):
+            rv = auth_client.get("/bikes/geometry", query_string={"size_id": size_id})
+            assert rv.status_code == 200
+            rv = auth_client.post("/bikes/geometry", json={"size_id": size_id})
+            assert rv.status_code == 200
+        assert rv.headers["ETag"]
+        assert catalog.geometry_cache.stats()["misses"] == misses + 1
+
+    def test_get_geometry_columnar(self, auth_client):
+        _, size_id = _add_bike_get_size_id(auth_client)
+        json_etag = auth_client.get("/bikes/geometry", query_string={"size_id": size_id}).headers["ETag"]
+        rv = auth_client.get("/bikes/geometry", query_string={"size_id": size_id},
+                             headers={"Accept": "application/vnd.bikefit.columnar+json",
+                                      "If-None-Match": json_etag})
+        assert rv.status_code == 200
+        assert rv.headers["ETag"] != json_etag
+        data = json.loads(rv.get_data())["data"]
+        row = dict(zip(data["columns"], data["rows"][0]))
+        assert row["id"] == size_id
+        assert row["stack"] == VALID_BIKE["stack"]
+
+    def test_get_geometry_post_ignores_if_none_match(self, auth_client):
+        _, size_id = _add_bike_get_size_id(auth_client)
+        etag = auth_client.get("/bikes/geometry", query_string={"size_id": size_id}).headers["ETag"]
+        rv = auth_client.post("/bikes/geometry", json={"size_id": size_id}, headers={"If-None-Match": etag})
+        assert rv.status_code == 200
+        assert rv.get_json()["data"]["id"] == size_id
+
+    def test_get_geometry_invalid_size_id(self, auth_client):
+        rv = auth_client.get("/bikes/geometry", query_string={"size_id": "abc"})
+        assert rv.status_code == 400
+
     def test_get_geometry_other_user_bike_forbidden(self, app):
         with app.test_client() as c1:
             c1.post("/auth/register", json={
@@ -91,6 +153,95 @@ class TestBikesGeometry:
             assert rv.status_code in (403, 404)
 
 
+    def test_get_geometry_public_bike_of_other_user(self, app):
+        from app.models import mock_dao
+        with app.test_client() as c1:
+            c1.post("/auth/register", json={
+                "username": "user_a", "password": "Password1!", "confirm_password": "Password1!"
+            })
+            c1.post("/auth/login", json={"username": "user_a", "password": "Password1!"})
+            bike_id, size_id = _add_bike_get_size_id(c1)
+        mock_dao.set_bike_visibility(bike_id, True)
+
+        with app.test_client() as c2:
+            c2.post("/auth/register", json={
+                "username": "user_b", "password": "Password1!", "confirm_password": "Password1!"
+            })
+            c2.post("/auth/login", json={"username": "user_b", "password": "Password1!"})
+            rv = c2.post("/bikes/geometry", json={"size_id": size_id})
+            assert rv.status_code == 200
+            assert rv.get_json()["data"]["size"] == VALID_BIKE["size"]
+
+    def test_cached_geometry_get_counts_one_hit(self, auth_client):
+        from app.models.catalog import geometry_cache
+        _, size_id = _add_bike_get_size_id(auth_client)
+        assert auth_client.get("/bikes/geometry", query_string={"size_id": size_id}).status_code == 200
+        before = geometry_cache.stats()
+
+        rv = auth_client.get("/bikes/geometry", query_string={"size_id": size_id})
+        assert rv.status_code == 200
+        after = geometry_cache.stats()
+        assert (after["hits"] - before["hits"], after["misses"] - before["misses"]) == (1, 0)
+
+        rv = auth_client.get("/bikes/geometry", query_string={"size_id": size_id},
+                             headers={"If-None-Match": rv.headers["ETag"]})
+        assert rv.status_code == 304
+        assert geometry_cache.stats()["misses"] == after["misses"]
+
+    def test_get_geometry_reflects_visibility_change(self, app):
+        from app.models import mock_dao
+        with app.test_client() as c1:
+            c1.post("/auth/register", json={
+                "username": "user_a", "password": "Password1!", "confirm_password": "Password1!"
+            })
+            c1.post("/auth/login", json={"username": "user_a", "password": "Password1!"})
+            bike_id, size_id = _add_bike_get_size_id(c1)
+            assert c1.post("/bikes/geometry", json={"size_id": size_id}).status_code == 200
+
+        with app.test_client() as c2:
+            c2.post("/auth/register", json={
+                "username": "user_b", "password": "Password1!", "confirm_password": "Password1!"
+            })
+            c2.post("/auth/login", json={"username": "user_b", "password": "Password1!"})
+            assert c2.post("/bikes/geometry", json={"size_id": size_id}).status_code == 403
+
+        with app.test_client() as m:
+            _make_moderator(m)
+            m.patch("/bikes/set_visibility", json={"bike_id": bike_id, "is_public": True})
+            stats = m.get("/bikes/cache_stats").get_json()["data"]["geometry"]
+            assert stats["hits"] >= 1
+
+        with app.test_client() as c2:
+            c2.post("/auth/login", json={"username": "user_b", "password": "Password1!"})
+            assert c2.post("/bikes/geometry", json={"size_id": size_id}).status_code == 200
+
+    def test_public_geometry_is_cacheable(self, app):
+        with app.test_client() as c1:
+            c1.post("/auth/register", json={
+                "username": "owner_pub", "password": "Password1!", "confirm_password": "Password1!"
+            })
+            c1.post("/auth/login", json={"username": "owner_pub", "password": "Password1!"})
+            bike_id, size_id = _add_bike_get_size_id(c1)
+            private_etag = c1.get("/bikes/geometry", query_string={"size_id": size_id}).headers["ETag"]
+
+        with app.test_client() as mod:
+            _make_moderator(mod)
+            mod.patch("/bikes/set_visibility", json={"bike_id": bike_id, "is_public": True})
+
+        with app.test_client() as c1:
+            c1.post("/auth/login", json={"username": "owner_pub", "password": "Password1!"})
+            rv = c1.get("/bikes/geometry", query_string={"size_id": size_id},
+                        headers={"If-None-Match": private_etag})
+            assert rv.status_code == 200
+            assert rv.headers["Cache-Control"].startswith("public, max-age=")
+            rv = c1.get("/bikes/sizes", query_string={"bike_model_id": bike_id})
+            assert rv.headers["Cache-Control"].startswith("public, max-age=")
+
+    def test_cache_stats_requires_moderator(self, auth_client):
+        rv = auth_client.get("/bikes/cache_stats")
+        assert rv.status_code == 403
+
+
 class TestBikesSizeId:
     def test_get_size_id_success(self, auth_client):
         _add_bike_get_size_id(auth_client)
@@ -117,6 +268,196 @@ class TestBikesSizeId:
         assert rv.status_code == 400
 
 
+class TestBikesSimilar:
+    def test_similar_returns_own_sizes_by_distance(self, auth_client):
+        auth_client.post("/bikes/add", json=[
+            {**VALID_BIKE, "size": "52", "stack": 530.0, "reach": 375.0},
+            {**VALID_BIKE, "size": "54", "stack": 545.0, "reach": 382.0},
+            VALID_BIKE,
+        ])
+        bike_id = auth_client.get("/bikes/user_bikes").get_json()["data"][0]["id"]
+        sizes = auth_client.post("/bikes/sizes", json={"bike_model_id": bike_id}).get_json()["data"]
+        size_52 = next(s["id"] for s in sizes if s["size"] == "52")
+
+        rv = auth_client.post("/bikes/similar", json={"size_id": size_52, "k": 5})
+        assert rv.status_code == 200
+        data = rv.get_json()["data"]
+        assert [item["size"] for item in data] == ["54", "56"]
+        assert data[0]["distance"] < data[1]["distance"]
+
+    def test_similar_sees_new_bikes(self, auth_client):
+        _, size_id = _add_bike_get_size_id(auth_client)
+        assert auth_client.post("/bikes/similar", json={"size_id": size_id}).get_json()["data"] == []
+        auth_client.post("/bikes/add", json=[{**VALID_BIKE, "model": "Other", "stack": 565.0}])
+        data = auth_client.post("/bikes/similar", json={"size_id": size_id}).get_json()["data"]
+        assert [item["model"] for item in data] == ["Other"]
+
+    def test_similar_excludes_other_users_private(self, app):
+        with app.test_client() as c1:
+            c1.post("/auth/register", json={
+                "username": "user_a", "password": "Password1!", "confirm_password": "Password1!"
+            })
+            c1.post("/auth/login", json={"username": "user_a", "password": "Password1!"})
+            c1.post("/bikes/add", json=[{**VALID_BIKE, "model": "Private A"}])
+
+        with app.test_client() as c2:
+            c2.post("/auth/register", json={
+                "username": "user_b", "password": "Password1!", "confirm_password": "Password1!"
+            })
+            c2.post("/auth/login", json={"username": "user_b", "password": "Password1!"})
+            _, size_id = _add_bike_get_size_id(c2)
+            data = c2.post("/bikes/similar", json={"size_id": size_id}).get_json()["data"]
+            assert data == []
+
+    def test_similar_forbidden_for_other_users_size(self, app):
+        with app.test_client() as c1:
+            c1.post("/auth/register", json={
+                "username": "user_a", "password": "Password1!", "confirm_password": "Password1!"
+            })
+            c1.post("/auth/login", json={"username": "user_a", "password": "Password1!"})
+            _, size_id = _add_bike_get_size_id(c1)
+
+        with app.test_client() as c2:
+            c2.post("/auth/register", json={
+                "username": "user_b", "password": "Password1!", "confirm_password": "Password1!"
+            })
+            c2.post("/auth/login", json={"username": "user_b", "password": "Password1!"})
+            rv = c2.post("/bikes/similar", json={"size_id": size_id})
+            assert rv.status_code == 403
+
+    def test_similar_not_found(self, auth_client):
+        rv = auth_client.post("/bikes/similar", json={"size_id": 99999})
+        assert rv.status_code == 404
+
+    def test_similar_invalid_k(self, auth_client):
+        _, size_id = _add_bike_get_size_id(auth_client)
+        rv = auth_client.post("/bikes/similar", json={"size_id": size_id, "k": 0})
+        assert rv.status_code == 400
+
+
+class TestBikesImport:
+    def _post(self, auth_client, content, filename):
+        return auth_client.post(
+            "/bikes/import",
+            data={"file": (io.BytesIO(content), filename)},
+            content_type="multipart/form-data",
+        )
+
+    def test_import_csv_reports_row_errors(self, auth_client):
+        header = ",".join(k for k in VALID_BIKE)
+        good = ",".join(str(v) for v in VALID_BIKE.values())
+        other_size = ",".join(str({**VALID_BIKE, "size": "58"}[k]) for k in VALID_BIKE)
+        bad = ",".join(str({**VALID_BIKE, "size": "60", "stack": 9999}[k]) for k in VALID_BIKE)
+        content = "\n".join([header, good, bad, other_size]).encode()
+
+        rv = self._post(auth_client, content, "catalog.csv")
+        assert rv.status_code == 200
+        data = rv.get_json()["data"]
+        assert data["rows"] == 3
+        assert data["imported"] == 2
+        assert data["rejected"] == 1
+        assert data["errors"][0]["line"] == 3
+        assert data["errors"][0]["errors"][0]["field"] == "stack"
+
+        bike_id = auth_client.get("/bikes/user_bikes").get_json()["data"][0]["id"]
+        sizes = auth_client.post("/bikes/sizes", json={"bike_model_id": bike_id}).get_json()["data"]
+        assert {s["size"] for s in sizes} == {"56", "58"}
+
+    def test_import_rejects_over_long_size(self, auth_client):
+        lines = [
+            json.dumps(VALID_BIKE),
+            json.dumps({**VALID_BIKE, "size": "x" * 51}),
+        ]
+        rv = self._post(auth_client, "\n".join(lines).encode(), "catalog.jsonl")
+        assert rv.status_code == 200
+        data = rv.get_json()["data"]
+        assert (data["imported"], data["rejected"]) == (1, 1)
+        assert data["errors"][0]["line"] == 2
+        assert data["errors"][0]["errors"][0]["field"] == "size"
+
+    def test_reimport_keeps_missing_optional_params(self, auth_client):
+        self._post(auth_client, json.dumps({**VALID_BIKE, "saddleHeight": 40.0}).encode(), "catalog.jsonl")
+        partial = {k: v for k, v in VALID_BIKE.items() if k != "saddleHeight"}
+        lines = [json.dumps({**partial, "stack": 570.0}), json.dumps({**partial, "size": "58"})]
+        rv = self._post(auth_client, "\n".join(lines).encode(), "catalog.jsonl")
+        assert rv.get_json()["data"]["imported"] == 2
+
+        bike_id = auth_client.get("/bikes/user_bikes").get_json()["data"][0]["id"]
+        sizes = auth_client.post("/bikes/sizes", json={"bike_model_id": bike_id}).get_json()["data"]
+        by_size = {s["size"]: s for s in sizes}
+        size_56 = auth_client.get(f"/bikes/geometry?size_id={by_size['56']['id']}").get_json()["data"]
+        assert size_56["stack"] == 570.0
+        assert size_56["saddleHeight"] == 40.0
+        size_58 = auth_client.get(f"/bikes/geometry?size_id={by_size['58']['id']}").get_json()["data"]
+        assert size_58["saddleHeight"] == 50
+
+    def test_import_jsonl(self, auth_client):
+        lines = [
+            json.dumps({**VALID_BIKE, "model": "Model A"}),
+            json.dumps({**VALID_BIKE, "model": "Model B"}),
+            json.dumps({"size": "52"}),
+        ]
+        rv = self._post(auth_client, "\n".join(lines).encode(), "catalog.jsonl")
+        data = rv.get_json()["data"]
+        assert data["imported"] == 2
+        assert data["models"] == 2
+        assert data["errors"][0]["errors"][0]["field"] == "model"
+
+    def test_import_unknown_format(self, auth_client):
+        rv = self._post(auth_client, b"<xml/>", "catalog.xml")
+        assert rv.status_code == 400
+
+    def test_import_requires_file(self, auth_client):
+        rv = auth_client.post("/bikes/import", data={}, content_type="multipart/form-data")
+        assert rv.status_code == 400
+
+    def test_import_unauthenticated(self, client):
+        rv = client.post("/bikes/import", data={}, content_type="multipart/form-data")
+        assert rv.status_code in (401, 403)
+
+
+class TestBikesExport:
+    def test_export_ndjson(self, auth_client):
+        _add_bike_get_size_id(auth_client)
+        rv = auth_client.get("/bikes/export?format=ndjson")
+        assert rv.status_code == 200
+        assert rv.is_streamed
+        assert rv.mimetype == "application/x-ndjson"
+        rows = [json.loads(line) for line in rv.get_data(as_text=True).splitlines()]
+        assert len(rows) == 1
+        assert rows[0]["model"] == VALID_BIKE["model"]
+        assert rows[0]["stack"] == VALID_BIKE["stack"]
+
+    def test_export_gzip_stream(self, auth_client):
+        import gzip
+        _add_bike_get_size_id(auth_client)
+        rv = auth_client.get("/bikes/export?format=ndjson", headers={"Accept-Encoding": "gzip"})
+        assert rv.is_streamed
+        assert rv.headers["Content-Encoding"] == "gzip"
+        rows = [json.loads(line) for line in gzip.decompress(rv.get_data()).decode().splitlines()]
+        assert rows[0]["model"] == VALID_BIKE["model"]
+
+    def test_export_csv_can_be_reimported(self, auth_client):
+        _add_bike_get_size_id(auth_client)
+        rv = auth_client.get("/bikes/export?format=csv")
+        assert rv.mimetype == "text/csv"
+        body = rv.get_data().replace(VALID_BIKE["model"].encode(), b"Copy")
+        rv = auth_client.post(
+            "/bikes/import",
+            data={"file": (io.BytesIO(body), "catalog.csv")},
+            content_type="multipart/form-data",
+        )
+        assert rv.get_json()["data"]["imported"] == 1
+
+    def test_export_unknown_format(self, auth_client):
+        rv = auth_client.get("/bikes/export?format=xml")
+        assert rv.status_code == 400
+
+    def test_export_unauthenticated(self, client):
+        rv = client.get("/bikes/export")
+        assert rv.status_code in (401, 403)
+
+
 class TestBikesSetPending:
     def test_set_pending_success(self, auth_client):
         bike_id, _ = _add_bike_get_size_id(auth_client)
@@ -168,6 +509,27 @@ class TestModeratorRoutes:
             assert data["success"] is True
             assert any(b["id"] == bike_id for b in data["data"])
 
+    def test_pending_keyset_pages(self, app):
+        with app.test_client() as c:
+            c.post("/auth/register", json={
+                "username": "reg_user3", "password": "Password1!", "confirm_password": "Password1!"
+            })
+            c.post("/auth/login", json={"username": "reg_user3", "password": "Password1!"})
+            for name in ("Zeta", "Alpha", "Mid"):
+                c.post("/bikes/add", json=[{**VALID_BIKE, "model": name}])
+            for bike in c.get("/bikes/user_bikes").get_json()["data"]:
+                c.post("/bikes/set_pending", json={"bike_id": bike["id"]})
+
+        with app.test_client() as c:
+            _make_moderator(c)
+            first = c.get("/bikes/pending", query_string={"limit": 2}).get_json()
+            assert [b["model"] for b in first["data"]] == ["Zeta", "Alpha"]
+            second = c.get("/bikes/pending", query_string={"limit": 2, "cursor": first["next_cursor"]}).get_json()
+            assert [b["model"] for b in second["data"]] == ["Mid"]
+            assert second["next_cursor"] is None
+            found = c.get("/bikes/pending", query_string={"q": "alp"}).get_json()["data"]
+            assert [b["model"] for b in found] == ["Alpha"]
+
     def test_set_visibility_approve(self, app):
         with app.test_client() as c:
             c.post("/auth/register", json={
@@ -231,7 +593,7 @@ class TestParseUrl:
 
     def test_parse_url_network_error(self, auth_client):
         import urllib.error
-        with patch("app.routes.bikes.urllib.request.urlopen",
+        with patch("app.services.bikeinsights_service._opener.open",
                    side_effect=urllib.error.URLError("connection refused")):
             rv = auth_client.post("/bikes/parse_url",
                                   json={"url": "https://bikeinsights.com/bikes/trek"})
@@ -243,7 +605,7 @@ class TestParseUrl:
             url="https://bikeinsights.com/bikes/trek",
             code=404, msg="Not Found", hdrs=None, fp=None
         )
-        with patch("app.routes.bikes.urllib.request.urlopen", side_effect=err):
+        with patch("app.services.bikeinsights_service._opener.open", side_effect=err):
             rv = auth_client.post("/bikes/parse_url",
                                   json={"url": "https://bikeinsights.com/bikes/trek"})
         assert rv.status_code == 502
@@ -262,11 +624,47 @@ class TestParseUrl:
         </body></html>
         """
         mock_resp = MagicMock()
-        mock_resp.read.return_value = fake_html.encode("utf-8")
+        mock_resp.read = io.BytesIO(fake_html.encode("utf-8")).read
         mock_resp.__enter__ = lambda s: s
         mock_resp.__exit__ = MagicMock(return_value=False)
 
-        with patch("app.routes.bikes.urllib.request.urlopen", return_value=mock_resp):
+        with patch("app.services.bikeinsights_service._opener.open", return_value=mock_resp):
             rv = auth_client.post("/bikes/parse_url",
                                   json={"url": "https://bikeinsights.com/bikes/trek"})
         assert rv.status_code in (200, 422)
+
+    def test_parse_url_async_job(self, auth_client):
+        mock_resp = MagicMock()
+        mock_resp.read = io.BytesIO(b"<html><body>no geometry</body></html>").read
+        mock_resp.__enter__ = lambda s: s
+        mock_resp.__exit__ = MagicMock(return_value=False)
+
+        with patch("app.services.bikeinsights_service._opener.open", return_value=mock_resp):
+            rv = auth_client.post("/bikes/parse_url",
+                                  json={"url": "https://bikeinsights.com/bikes/trek", "async": True})
+            assert rv.status_code == 202
+            job_id = rv.get_json()["job_id"]
+            rv = auth_client.get(f"/bikes/parse_url/{job_id}?wait=5")
+        assert rv.status_code == 200
+        data = rv.get_json()
+        assert data["status"] == "failed"
+        assert data["error"]
+
+    def test_parse_url_job_not_found(self, auth_client):
+        rv = auth_client.get("/bikes/parse_url/unknown")
+        assert rv.status_code == 404
+
+    def test_parse_url_job_bad_wait(self, auth_client):
+        rv = auth_client.get("/bikes/parse_url/unknown?wait=abc")
+        assert rv.status_code == 400
+
+    def test_parse_urls_requires_list(self, auth_client):
+        rv = auth_client.post("/bikes/parse_urls", json={"urls": "https://bikeinsights.com/bikes/trek"})
+        assert rv.status_code == 400
+
+    def test_parse_urls_reports_each_url(self, auth_client):
+        rv = auth_client.post("/bikes/parse_urls", json={"urls": ["https://evil.com/a", "ftp://bikeinsights.com/b"]})
+        assert rv.status_code == 200
+        data = rv.get_json()
+        assert data["failed"] == 2
+        assert all(r["error"] for r in data["results"])
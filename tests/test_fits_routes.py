@@ -89,6 +89,116 @@ class TestFitsBasic:
         assert rv.status_code in (401, 403)
 
 
+class TestFitsBootstrap:
+    def test_bootstrap_matches_separate_calls(self, auth_client):
+        auth_client.post("/fits/add_anthropometry", json=VALID_ANTHRO)
+        bike_id, size_id = _add_bike_get_size_id(auth_client)
+        auth_client.post("/fits/save", json=_fit_payload(size_id))
+
+        rv = auth_client.get("/fits/bootstrap", query_string={"size_id": size_id})
+        assert rv.status_code == 200
+        data = rv.get_json()["data"]
+        assert data["geometry"] == auth_client.post("/bikes/geometry", json={"size_id": size_id}).get_json()["data"]
+        assert data["anthropometry"] == auth_client.get("/fits/get_anthropometry").get_json()["data"]
+        assert data["basic_fit"] == auth_client.post("/fits/basic", json={"size_id": size_id}).get_json()["data"]
+        assert [f["name"] for f in data["fits"]] == ["Test fit"]
+        assert data["fits"][0]["seatHight"] == 720.0
+
+    def test_bootstrap_single_dao_call(self, auth_client, monkeypatch):
+        from app.models import dao
+        auth_client.post("/fits/add_anthropometry", json=VALID_ANTHRO)
+        _, size_id = _add_bike_get_size_id(auth_client)
+        for name in ("get_bike_geometry_with_model", "get_latest_user_anthropometry", "get_user_fits"):
+            monkeypatch.setattr(dao, name, lambda *a, **kw: pytest.fail("separate read"))
+        calls = []
+        bootstrap = dao.get_fit_bootstrap
+        monkeypatch.setattr(dao, "get_fit_bootstrap", lambda *a, **kw: calls.append(kw) or bootstrap(*a, **kw))
+
+        rv = auth_client.get("/fits/bootstrap", query_string={"size_id": size_id})
+        assert rv.status_code == 200
+        assert rv.get_json()["data"]["basic_fit"] is not None
+        assert len(calls) == 1
+
+    def test_bootstrap_without_anthropometry(self, auth_client):
+        _, size_id = _add_bike_get_size_id(auth_client)
+        data = auth_client.get("/fits/bootstrap", query_string={"size_id": size_id}).get_json()["data"]
+        assert data["anthropometry"] is None
+        assert data["basic_fit"] is None
+        assert data["fits"] == []
+
+    def test_bootstrap_access_checked(self, app):
+        with app.test_client() as c1:
+            c1.post("/auth/register", json={
+                "username": "owner_b", "password": "Password1!", "confirm_password": "Password1!"
+            })
+            c1.post("/auth/login", json={"username": "owner_b", "password": "Password1!"})
+            _, size_id = _add_bike_get_size_id(c1)
+        with app.test_client() as c2:
+            c2.post("/auth/register", json={
+                "username": "other_b", "password": "Password1!", "confirm_password": "Password1!"
+            })
+            c2.post("/auth/login", json={"username": "other_b", "password": "Password1!"})
+            assert c2.get("/fits/bootstrap", query_string={"size_id": size_id}).status_code == 403
+            assert c2.get("/fits/bootstrap", query_string={"size_id": 99999}).status_code == 404
+            assert c2.get("/fits/bootstrap", query_string={"size_id": "x"}).status_code == 400
+
+
+class TestFitsCompare:
+    def test_compare_saved_and_basic(self, auth_client):
+        auth_client.post("/fits/add_anthropometry", json=VALID_ANTHRO)
+        _, size_id = _add_bike_get_size_id(auth_client)
+        auth_client.post("/fits/save", json=_fit_payload(size_id))
+
+        rv = auth_client.post("/fits/compare", json={"items": [
+            {"size_id": size_id, "fit": "basic"},
+            {"size_id": size_id, "fit": "Test fit"},
+        ]})
+        assert rv.status_code == 200
+        first, second = rv.get_json()["data"]
+        basic = auth_client.post("/fits/basic", json={"size_id": size_id}).get_json()["data"]
+        assert first["fit_params"]["seatHight"] == pytest.approx(basic["seatHight"])
+        assert second["fit_params"]["seatHight"] == 720.0
+        assert first["geometry"] == second["geometry"]
+        assert set(first["metrics"]) == {"saddleToBarDrop", "reach", "torsoAngle"}
+        assert all(v == 0 for v in first["delta"].values())
+        for name, value in second["metrics"].items():
+            assert second["delta"][name] == pytest.approx(value - first["metrics"][name])
+
+    def test_compare_loads_sizes_in_one_query(self, auth_client, monkeypatch):
+        from app.models import dao
+        from app.models.catalog import geometry_cache
+        auth_client.post("/fits/add_anthropometry", json=VALID_ANTHRO)
+        auth_client.post("/bikes/add", json=[VALID_BIKE, {**VALID_BIKE, "model": "Trek Emonda SL 6"}])
+        bikes = auth_client.get("/bikes/user_bikes").get_json()["data"]
+        size_a, size_b = (
+            auth_client.post("/bikes/sizes", json={"bike_model_id": b["id"]}).get_json()["data"][0]["id"]
+            for b in bikes
+        )
+        geometry_cache.invalidate()
+        monkeypatch.setattr(dao, "get_bike_geometry_with_model", lambda *a: pytest.fail("per-size read"))
+        calls = []
+        load = dao.get_bike_geometries_with_model
+        monkeypatch.setattr(dao, "get_bike_geometries_with_model", lambda ids: calls.append(ids) or load(ids))
+
+        rv = auth_client.post("/fits/compare", json={"items": [
+            {"size_id": size_a, "fit": "basic"},
+            {"size_id": size_b, "fit": "basic"},
+            {"size_id": size_a, "fit": "basic"},
+        ]})
+        assert rv.status_code == 200
+        assert len(calls) == 1 and sorted(calls[0]) == sorted([size_a, size_b])
+
+    def test_compare_errors(self, auth_client):
+        _, size_id = _add_bike_get_size_id(auth_client)
+        post = lambda items: auth_client.post("/fits/compare", json={"items": items})
+        assert post([{"size_id": size_id}]).status_code == 400
+        assert post([{"size_id": size_id}, {"size_id": "x"}]).status_code == 400
+        assert post([{"size_id": size_id, "fit": "Missing"}, {"size_id": size_id}]).status_code == 404
+        assert post([{"size_id": size_id}, {"size_id": 99999}]).status_code == 404
+        # без антропометрии базовую посадку не рассчитать
+        assert post([{"size_id": size_id}, {"size_id": size_id}]).status_code == 400
+
+
 class TestFitsGetAndDelete:
     def _setup(self, auth_client):
         auth_client.post("/fits/add_anthropometry", json=VALID_ANTHRO)
@@ -129,3 +239,124 @@ class TestFitsGetAndDelete:
     def test_delete_fit_missing_fields(self, auth_client):
         rv = auth_client.post("/fits/delete", json={"fit_name": "x"})
         assert rv.status_code == 400
+
+
+class TestFitsRecommend:
+    def _add_two_sizes(self, auth_client):
+        auth_client.post("/bikes/add", json=[
+            {**VALID_BIKE, "size": "52", "seatTube": 520.0, "stack": 540.0, "reach": 375.0},
+            {**VALID_BIKE, "size": "56"},
+        ])
+        return auth_client.get("/bikes/user_bikes").get_json()["data"][0]["id"]
+
+    def test_recommend_ranks_all_sizes(self, auth_client):
+        auth_client.post("/fits/add_anthropometry", json=VALID_ANTHRO)
+        bike_id = self._add_two_sizes(auth_client)
+        rv = auth_client.post("/fits/recommend", json={"bike_model_id": bike_id})
+        assert rv.status_code == 200
+        data = rv.get_json()["data"]
+        assert {item["size"] for item in data} == {"52", "56"}
+        scores = [item["score"] for item in data]
+        assert scores == sorted(scores)
+        assert all(item["fit"]["shifterAngle"] == 30 for item in data)
+
+    def test_recommend_single_dao_call(self, auth_client, monkeypatch):
+        from app.models import dao
+        auth_client.post("/fits/add_anthropometry", json=VALID_ANTHRO)
+        bike_id = self._add_two_sizes(auth_client)
+        monkeypatch.setattr(dao, "get_latest_user_anthropometry", lambda *a: pytest.fail("separate read"))
+        calls = []
+        load = dao.get_model_fit_data
+        monkeypatch.setattr(dao, "get_model_fit_data", lambda *a, **kw: calls.append(a) or load(*a, **kw))
+
+        rv = auth_client.post("/fits/recommend", json={"bike_model_id": bike_id})
+        assert rv.status_code == 200
+        assert len(calls) == 1
+
+    def test_recommend_no_anthropometry(self, auth_client):
+        bike_id = self._add_two_sizes(auth_client)
+        rv = auth_client.post("/fits/recommend", json={"bike_model_id": bike_id})
+        assert rv.status_code == 400
+
+    def test_recommend_unknown_model(self, auth_client):
+        auth_client.post("/fits/add_anthropometry", json=VALID_ANTHRO)
+        rv = auth_client.post("/fits/recommend", json={"bike_model_id": 99999})
+        assert rv.status_code == 404
+
+    def test_recommend_missing_model_id(self, auth_client):
+        rv = auth_client.post("/fits/recommend", json={"size_id": 1})
+        assert rv.status_code == 400
+
+    def test_recommend_unauthenticated(self, client):
+        rv = client.post("/fits/recommend", json={"bike_model_id": 1})
+        assert rv.status_code in (401, 403)
+
+
+class TestFitsSearch:
+    def _publish_other_user_bikes(self, app):
+        from app.models import mock_dao
+        with app.test_client() as other:
+            other.post("/auth/register", json={
+                "username": "owner", "password": "Password1!", "confirm_password": "Password1!"
+            })
+            other.post("/auth/login", json={"username": "owner", "password": "Password1!"})
+            other.post("/bikes/add", json=[
+                {**VALID_BIKE, "model": "Public Bike", "size": "S", "seatTube": 500.0, "stack": 520.0},
+                {**VALID_BIKE, "model": "Public Bike", "size": "L", "seatTube": 600.0, "stack": 600.0},
+            ])
+            other.post("/bikes/add", json=[{**VALID_BIKE, "model": "Hidden Bike"}])
+        public = next(bm for bm in mock_dao._mock_db["bike_models"] if bm["model"] == "Public Bike")
+        mock_dao.set_bike_visibility(public["id"], True)
+
+    def test_search_returns_visible_sizes_ranked(self, app, auth_client):
+        self._publish_other_user_bikes(app)
+        auth_client.post("/fits/add_anthropometry", json=VALID_ANTHRO)
+        _add_bike_get_size_id(auth_client)
+        rv = auth_client.get("/fits/search")
+        assert rv.status_code == 200
+        body = rv.get_json()
+        models = {item["model"] for item in body["data"]}
+        assert models == {"Public Bike", VALID_BIKE["model"]}
+        assert body["total"] == 3
+        scores = [item["score"] for item in body["data"]]
+        assert scores == sorted(scores)
+
+    def test_search_pagination(self, app, auth_client):
+        self._publish_other_user_bikes(app)
+        auth_client.post("/fits/add_anthropometry", json=VALID_ANTHRO)
+        _add_bike_get_size_id(auth_client)
+        full = auth_client.get("/fits/search?limit=10").get_json()["data"]
+        page = auth_client.get("/fits/search?limit=1&offset=1").get_json()
+        assert len(page["data"]) == 1
+        assert page["data"][0]["size_id"] == full[1]["size_id"]
+        past_end = auth_client.get("/fits/search?offset=10").get_json()
+        assert past_end["data"] == []
+
+    def test_search_sees_catalog_changes(self, auth_client):
+        auth_client.post("/fits/add_anthropometry", json=VALID_ANTHRO)
+        assert auth_client.get("/fits/search").get_json()["total"] == 0
+        _add_bike_get_size_id(auth_client)
+        assert auth_client.get("/fits/search").get_json()["total"] == 1
+
+    def test_search_invalid_limit(self, auth_client):
+        rv = auth_client.get("/fits/search?limit=abc")
+        assert rv.status_code == 400
+
+    def test_search_no_anthropometry(self, auth_client):
+        rv = auth_client.get("/fits/search")
+        assert rv.status_code == 400
+
+
+class TestFitsExport:
+    def test_export_user_fits(self, auth_client):
+        _, size_id = _add_bike_get_size_id(auth_client)
+        auth_client.post("/fits/save", json=_fit_payload(size_id))
+        rv = auth_client.get("/fits/export?format=csv")
+        assert rv.status_code == 200
+        lines = rv.get_data(as_text=True).splitlines()
+        assert lines[0].startswith("name,model,size,seatHight")
+        assert lines[1].startswith(f"Test fit,{VALID_BIKE['model']},56,720.0")
+
+    def test_export_unknown_format(self, auth_client):
+        rv = auth_client.get("/fits/export?format=xls")
+        assert rv.status_code == 400